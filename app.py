@@ -1,63 +1,139 @@
 """
 Flask application for searching and viewing indexed PDF documents.
 """
-from flask import Flask, render_template, request, redirect, jsonify
-from sqlalchemy import or_
+from flask import Flask, Request, Response, current_app, render_template, request, redirect, jsonify, url_for
+from sqlalchemy.orm import joinedload, scoped_session
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from pathlib import Path
 import urllib.parse
+import binascii
+import json
 import os
+import shutil
+import tempfile
 from werkzeug.utils import secure_filename
-from models import PDFDocument, Article, init_db, get_session
+from models import (PDFDocument, Article, Session, init_db, get_session, article_catalog_generation, article_count,
+                    keyset_page, lookup_articles_by_code, search_articles_query, fuzzy_search_articles)
+from jobs import ExtractionJobQueue
+from search_cache import SearchResultCache
+from suggest import ArticleSuggestIndex
+
+# Bytes copied per read when streaming an uploaded PDF to disk
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Most autocomplete suggestions returned per request
+MAX_SUGGESTIONS = 50
+
+# Largest page size accepted through ?per_page=
+MAX_PAGE_SIZE = 500
+
+# Most codes accepted by one /api/articles/lookup request
+MAX_LOOKUP_CODES = 50000
+
+# Rows fetched from the database cursor and written per chunk of an NDJSON search response
+NDJSON_BATCH_ROWS = 1000
+
+# Fields of an article in the JSON search API, selected as plain columns (no ORM objects)
+API_ARTICLE_COLUMNS = (
+    Article.id, Article.document_id, PDFDocument.filename, Article.fbet, Article.fben,
+    Article.artikel, Article.link, Article.image_url, Article.extracted_at
+)
+API_ARTICLE_FIELDS = ('id', 'document_id', 'document', 'fbet', 'fben', 'artikel', 'link', 'image_url', 'extracted_at')
+
+class AppRequest(Request):
+    """Request that allows larger bodies for PDF uploads than for image uploads."""
+    
+    @property
+    def max_content_length(self):
+        if self.endpoint == 'upload_document':
+            return current_app.config['MAX_PDF_CONTENT_LENGTH']
+        return super().max_content_length
 
 app = Flask(__name__)
+app.request_class = AppRequest
 app.config['SECRET_KEY'] = 'dev-secret-key-change-in-production'
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['PDF_FOLDER'] = 'pdfs'  # Same folder as extract_articles.py reads by default
+app.config['MAX_PDF_CONTENT_LENGTH'] = 512 * 1024 * 1024  # 512MB max PDF size
+app.config['EXTRACTION_WORKERS'] = 1  # Processes per uploaded document, as --workers
+app.config['ARTICLES_PER_PAGE'] = 50  # Default page size of article lists and search results
+app.config['DOCUMENT_ARTICLES_PER_PAGE'] = 20  # Default page size of the articles on a document page
+app.config['SEARCH_CACHE_SIZE'] = 1024  # Search result pages kept in memory
+app.config['SEARCH_CACHE_TTL'] = 600  # Seconds before a cached search result page is computed again
 
-# Ensure upload directory exists
+# Ensure upload directories exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+os.makedirs(app.config['PDF_FOLDER'], exist_ok=True)
+
+# Uploaded PDFs are extracted here in the background, one document at a time
+extraction_jobs = ExtractionJobQueue(workers=app.config['EXTRACTION_WORKERS'])
 
 # Initialize database on startup
 init_db()
 
+# One session per request, closed by remove_session() when the request ends
+db_session = scoped_session(Session)
+
+# Search result pages (article ids), dropped whenever articles change
+search_cache = SearchResultCache(app.config['SEARCH_CACHE_SIZE'], app.config['SEARCH_CACHE_TTL'])
+
+# Autocomplete index, rebuilt in the background when articles change
+article_suggestions = ArticleSuggestIndex()
+article_suggestions.build()
+
+@app.teardown_appcontext
+def remove_session(exception=None):
+    """Close the request's session, rolling back anything left uncommitted."""
+    db_session.remove()
+
 @app.route('/')
 def index():
     """Home page with article search form."""
-    session = get_session()
+    session = db_session()
     total_docs = session.query(PDFDocument).count()
-    total_articles = session.query(Article).count()
-    session.close()
+    total_articles = article_count(session)
     return render_template('index.html', total_docs=total_docs, total_articles=total_articles)
 
 # Dokumentsökning borttagen - endast artikelsökning används nu
 
 @app.route('/document/<int:doc_id>')
 def document_detail(doc_id):
-    """View details of a specific document."""
-    session = get_session()
+    """View details of a specific document and a page of its articles."""
+    after, total, offset = decode_cursor(request.args.get('after'), int)
+    session = db_session()
     doc = session.get(PDFDocument, doc_id)  # Uppdaterad syntax
     
     articles = []
+    page = None
     if doc:
-        articles = session.query(Article).filter_by(document_id=doc_id).all()
-    
-    session.close()
+        query = session.query(Article).filter_by(document_id=doc_id)
+        if total is None:
+            total = query.count()
+        articles, next_after = keyset_page(query, (Article.id,), after,
+                                           page_size(app.config['DOCUMENT_ARTICLES_PER_PAGE']))
+        page = page_links('document_detail', articles, next_after, total, offset, doc_id=doc_id)
     
     if not doc:
         return "Document not found", 404
     
-    return render_template('document_detail.html', doc=doc, articles=articles)
+    return render_template('document_detail.html', doc=doc, articles=articles, page=page)
 
 # Dokumentbläddring borttagen - endast artikelvy används nu
 
 @app.route('/articles')
 def articles():
-    """Browse all extracted articles."""
-    session = get_session()
-    from sqlalchemy.orm import joinedload
-    articles = session.query(Article).options(joinedload(Article.document)).order_by(Article.extracted_at.desc()).all()
-    session.close()
+    """Browse extracted articles, newest first, one page at a time."""
+    after, _, offset = decode_cursor(request.args.get('after'), datetime.fromisoformat, int)
+    session = db_session()
+    total = article_count(session)
+    query = session.query(Article).options(joinedload(Article.document))
+    articles, next_after = keyset_page(query, (Article.extracted_at, Article.id), after,
+                                       page_size(app.config['ARTICLES_PER_PAGE']), descending=True)
     
-    return render_template('articles.html', articles=articles)
+    return render_template('articles.html', articles=articles,
+                           page=page_links('articles', articles, next_after, total, offset))
 
 @app.route('/articles/search')
 def search_articles():
@@ -65,30 +141,172 @@ def search_articles():
     query = request.args.get('q', '').strip()
     
     if not query:
-        return render_template('article_search_results.html', results=[], query='')
+        return render_template('article_search_results.html', results=[], query='', page=None)
     
+    session = db_session()
+    result = search_page(session, query, request.args.get('after'), page_size(app.config['ARTICLES_PER_PAGE']))
+    
+    # Eagerly load the document relationship, so the template doesn't query it per row
+    found = {article.id: article for article in
+             session.query(Article).options(joinedload(Article.document)).filter(Article.id.in_(result['ids']))}
+    results = [found[article_id] for article_id in result['ids'] if article_id in found]
+    
+    page = page_links('search_articles', results, result['next_after'], result['total'], result['offset'], q=query)
+    return render_template('article_search_results.html', results=results, query=query,
+                           fuzzy=result['fuzzy'], page=page)
+
+def search_page(session, query, token, size):
+    """One page of search results as article ids, served from search_cache when possible.
+    
+    Ranked full-text search in FBET, FBEN, artikel fields, sorted by (rank, id),
+    or by id alone for the substring fallback. Returns a dict with the page's
+    'ids', 'next_after', 'total', 'offset' and whether the results are 'fuzzy'.
+    """
+    generation = article_catalog_generation(session)
+    key = (' '.join(query.casefold().split()), token or '', size)
+    result = search_cache.get(key, generation)
+    if result is not None:
+        return result
+    
+    matches, sort_key = search_articles_query(session, query)
+    key_types = (float, int) if len(sort_key) == 2 else (int,)
+    after, total, offset = decode_cursor(token, *key_types)
+    if total is None:
+        total = matches.count()
+    ids, next_after = keyset_page(matches.with_entities(Article.id), sort_key, after, size)
+    
+    # No exact matches: articles with similar names instead (typos, å/ä/ö typed as a/o)
+    fuzzy = False
+    if not ids and after is None:
+        ids = [article.id for article in fuzzy_search_articles(session, query)]
+        fuzzy = bool(ids)
+        total = len(ids)
+    
+    result = {'ids': ids, 'next_after': next_after, 'total': total, 'offset': offset, 'fuzzy': fuzzy}
+    search_cache.put(key, generation, result)
+    return result
+
+@app.route('/api/articles/search')
+def api_search_articles():
+    """Search articles as JSON, one keyset page at a time, or all matches as NDJSON.
+    
+    ?format=ndjson (or Accept: application/x-ndjson) streams every match, one
+    JSON object per line, straight from the database cursor.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Missing search query (q)'}), 400
+    
+    ndjson = (request.args.get('format') == 'ndjson' or
+              request.accept_mimetypes.best == 'application/x-ndjson')
+    if ndjson:
+        return Response(stream_search_ndjson(query), mimetype='application/x-ndjson')
+    
+    session = db_session()
+    result = search_page(session, query, request.args.get('after'), page_size(app.config['ARTICLES_PER_PAGE']))
+    found = {row[0]: row for row in
+             session.query(*API_ARTICLE_COLUMNS).join(Article.document).filter(Article.id.in_(result['ids']))}
+    rows = [found[article_id] for article_id in result['ids'] if article_id in found]
+    
+    page = page_links('api_search_articles', rows, result['next_after'], result['total'], result['offset'], q=query)
+    return jsonify({
+        'query': query,
+        'fuzzy': result['fuzzy'],
+        'total': result['total'],
+        'start': page['start'],
+        'end': page['end'],
+        'next': page['next_url'],
+        'articles': [api_article(row) for row in rows]
+    })
+
+def api_article(row):
+    """JSON object for a row of API_ARTICLE_COLUMNS."""
+    article = dict(zip(API_ARTICLE_FIELDS, row))
+    if article['extracted_at']:
+        article['extracted_at'] = article['extracted_at'].isoformat()
+    return article
+
+def stream_search_ndjson(query):
+    """Yield all exact matches of a search as NDJSON, NDJSON_BATCH_ROWS lines at a time.
+    
+    Rows are fetched from the cursor in batches as plain tuples, so memory use
+    does not grow with the number of matches. The response is streamed after
+    the request has ended, so this uses its own session rather than db_session.
+    """
     session = get_session()
+    try:
+        matches, sort_key = search_articles_query(session, query)
+        rows = (matches.join(Article.document).with_entities(*API_ARTICLE_COLUMNS)
+                .order_by(*sort_key).yield_per(NDJSON_BATCH_ROWS))
+        batch = []
+        for row in rows:
+            batch.append(json.dumps(api_article(row), ensure_ascii=False))
+            if len(batch) == NDJSON_BATCH_ROWS:
+                yield '\n'.join(batch) + '\n'
+                batch = []
+        if batch:
+            yield '\n'.join(batch) + '\n'
+    finally:
+        session.close()
+
+@app.route('/api/articles/lookup', methods=['POST'])
+def lookup_articles():
+    """Resolve a list of FBET/FBEN codes to articles in one request.
+    
+    Accepts JSON ({"codes": [...], "fields": ["fbet", "fben"]} or a plain list)
+    or text/plain with one code per line. Codes match exactly after trimming.
+    """
+    fields = ['fbet', 'fben']
+    if request.mimetype == 'text/plain':
+        codes = request.get_data(as_text=True).splitlines()
+    else:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            codes = data.get('codes')
+            fields = data.get('fields', fields)
+        else:
+            codes = data
     
-    # Search in FBET, FBEN, artikel fields
-    search_filter = or_(
-        Article.fbet.ilike(f'%{query}%'),
-        Article.fben.ilike(f'%{query}%'),
-        Article.artikel.ilike(f'%{query}%')
-    )
+    if not isinstance(codes, list) or not all(isinstance(code, str) for code in codes):
+        return jsonify({'error': 'Expected a list of codes as strings'}), 400
+    if (not isinstance(fields, list) or not fields
+            or not all(isinstance(field, str) and field in ('fbet', 'fben') for field in fields)):
+        return jsonify({'error': "fields must be a list of 'fbet' and/or 'fben'"}), 400
+    fields = list(dict.fromkeys(fields))
     
-    # Eagerly load the document relationship to avoid DetachedInstanceError
-    from sqlalchemy.orm import joinedload
-    results = session.query(Article).options(joinedload(Article.document)).filter(search_filter).all()
-    session.close()
+    codes = list(dict.fromkeys(code.strip() for code in codes if code.strip()))
+    if len(codes) > MAX_LOOKUP_CODES:
+        return jsonify({'error': f'At most {MAX_LOOKUP_CODES} codes per request'}), 413
     
-    return render_template('article_search_results.html', results=results, query=query)
+    matches = {}
+    requested = set(codes)
+    session = db_session()
+    query = session.query(*API_ARTICLE_COLUMNS).join(Article.document)
+    for row in lookup_articles_by_code(query, codes, fields):
+        article = api_article(row)
+        # An article whose FBET and FBEN fall in different chunks is returned once per chunk
+        for code in {article[field] for field in fields} & requested:
+            matches.setdefault(code, {})[article['id']] = article
+    
+    return jsonify({
+        'requested': len(codes),
+        'found': len(matches),
+        'matches': {code: list(matches[code].values()) for code in codes if code in matches},
+        'missing': [code for code in codes if code not in matches]
+    })
+
+@app.route('/api/articles/suggest')
+def suggest_articles():
+    """Autocomplete suggestions (FBET, FBEN, article names) for a search prefix."""
+    query = request.args.get('q', '')
+    limit = max(1, min(request.args.get('limit', 10, type=int), MAX_SUGGESTIONS))
+    return jsonify({'query': query, 'suggestions': article_suggestions.suggest(query, limit)})
 
 @app.route('/duckduckgo_search/<int:article_id>')
 def duckduckgo_search(article_id):
     """Redirect to DuckDuckGo search for a specific article."""
-    session = get_session()
+    session = db_session()
     article = session.get(Article, article_id)
-    session.close()
     
     if not article:
         return "Article not found", 404
@@ -116,7 +334,7 @@ def duckduckgo_search(article_id):
 @app.route('/api/article/<int:article_id>/image', methods=['POST'])
 def update_article_image(article_id):
     """Update article image via URL or file upload."""
-    session = get_session()
+    session = db_session()
     
     try:
         article = session.get(Article, article_id)
@@ -155,13 +373,11 @@ def update_article_image(article_id):
     except Exception as e:
         session.rollback()
         return jsonify({'error': str(e)}), 500
-    finally:
-        session.close()
 
 @app.route('/api/article/<int:article_id>/image', methods=['DELETE'])
 def delete_article_image(article_id):
     """Delete article image."""
-    session = get_session()
+    session = db_session()
     
     try:
         article = session.get(Article, article_id)
@@ -190,8 +406,117 @@ def delete_article_image(article_id):
     except Exception as e:
         session.rollback()
         return jsonify({'error': str(e)}), 500
-    finally:
-        session.close()
+
+@app.route('/api/documents', methods=['POST'])
+def upload_document():
+    """Upload a PDF and extract its articles in the background.
+    
+    Accepts a multipart form with a `file` field, or a raw `application/pdf` body
+    with the name in the `filename` query parameter. Returns 202 with the job,
+    whose progress can be followed at /api/jobs/<id>.
+    """
+    if request.mimetype == 'application/pdf':
+        filename = request.args.get('filename', '')
+        stream = request.stream
+    else:
+        file = request.files.get('file')
+        if not file:
+            return jsonify({'error': 'No PDF provided'}), 400
+        filename, stream = file.filename, file.stream
+    
+    filename = secure_filename(filename or '')
+    if not filename.lower().endswith('.pdf') or len(filename) <= len('.pdf'):
+        return jsonify({'error': 'Only PDF files are accepted'}), 400
+    filename = filename[:-len('.pdf')] + '.pdf'
+    
+    try:
+        pdf_path = save_uploaded_pdf(stream, filename)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    job = extraction_jobs.submit(pdf_path)
+    return jsonify(job.to_dict()), 202, {'Location': url_for('job_status', job_id=job.id)}
+
+@app.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    """Progress of a background extraction job (pages done, articles found)."""
+    job = extraction_jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+def save_uploaded_pdf(stream, filename):
+    """Stream an uploaded PDF into the PDF folder without holding it in memory.
+    
+    The file is written under a temporary name and moved into place when complete,
+    so a previous version is replaced atomically and folder watchers never see
+    a partial PDF. Raises ValueError if the data does not look like a PDF.
+    """
+    folder = app.config['PDF_FOLDER']
+    fd, temp_path = tempfile.mkstemp(dir=folder, prefix='.upload-', suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            header = b''
+            while len(header) < 5:
+                chunk = stream.read(5 - len(header))
+                if not chunk:
+                    break
+                header += chunk
+            if header != b'%PDF-':
+                raise ValueError('File is not a PDF')
+            f.write(header)
+            shutil.copyfileobj(stream, f, UPLOAD_CHUNK_SIZE)
+        
+        os.chmod(temp_path, 0o644)  # mkstemp creates files readable by the owner only
+        pdf_path = Path(folder) / filename
+        os.replace(temp_path, pdf_path)
+        return pdf_path
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def page_size(default):
+    """Page size from ?per_page=, limited to MAX_PAGE_SIZE."""
+    return max(1, min(request.args.get('per_page', default, type=int), MAX_PAGE_SIZE))
+
+def encode_cursor(after, total, offset):
+    """Opaque ?after= token: the sort key of the last row shown, the total and the rows shown so far."""
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in after]
+    state = json.dumps({'after': values, 'total': total, 'offset': offset}, separators=(',', ':'))
+    return urlsafe_b64encode(state.encode()).decode().rstrip('=')
+
+def decode_cursor(token, *types):
+    """Decode an ?after= token into (sort key, total, offset), converting the key with `types`.
+    
+    A missing, malformed or tampered token gives (None, None, 0): the first page.
+    """
+    if not token:
+        return None, None, 0
+    try:
+        state = json.loads(urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        if len(state['after']) != len(types):
+            raise ValueError("cursor does not match the sort key")
+        after = tuple(convert(value) for convert, value in zip(types, state['after']))
+        total, offset = int(state['total']), int(state['offset'])
+        if total < 0 or offset < 0:
+            raise ValueError("negative cursor position")
+        return after, total, offset
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        return None, None, 0
+
+def page_links(endpoint, items, next_after, total, offset, **args):
+    """Position and navigation links of a page for the templates."""
+    if 'per_page' in request.args:
+        args['per_page'] = request.args['per_page']
+    return {
+        'start': offset + 1 if items else 0,
+        'end': offset + len(items),
+        'total': total,
+        'next_url': url_for(endpoint, after=encode_cursor(next_after, total, offset + len(items)), **args)
+                    if next_after else None,
+        'first_url': url_for(endpoint, **args) if offset else None,
+    }
 
 def allowed_file(filename):
     """Check if file extension is allowed."""
@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Prestandamätningar för extraktions- och databasvägarna
+
+Exempel:
+    python benchmark.py insert --rows 50000
+    python benchmark.py parse --lines 200000
+    python benchmark.py memory --pages 50,100,200
+    python benchmark.py search --rows 10000,100000
+    python benchmark.py concurrency --readers 4
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from models import (Base, PDFDocument, Article, article_substring_filter, bulk_insert_articles,
+                    fuzzy_search_articles, init_db, keyset_page, search_articles_query, BULK_CHUNK_SIZE)
+from migrations import migrate_database
+from extract_articles import (ArticleDeltaWriter, configure_logging, extract_articles_from_text, extract_document_articles,
+                              index_pdf_document, save_articles, stream_document)
+
+# Sökningar för sökbenchmarken: artikelkod med och utan bindestreck, FBEN, ord i artikelnamnet, flera ord
+SEARCH_QUERIES = ['F8009-0012', 'F80090012', 'KARB', 'hjälm', 'klätterrep dynamiskt']
+
+# Felstavade sökningar: a för ä, omkastade bokstäver, en bokstav för lite
+FUZZY_SEARCH_QUERIES = ['hjalm', 'karbinhkae', 'klaterrep']
+
+def chapter_9_lines(count, seed=1):
+    """Skapar textrader som liknar tabellraderna i kapitel 9"""
+    rnd = random.Random(seed)
+    fbens = ['REP DYN 10,5MM', 'KARB HMS', 'HJÄLM STD', 'SELE PPE', 'BROMS AL', 'SLS 120 CM', 'BD']
+    names = ['Klätterrep dynamiskt', 'Karbinhake skruv', 'Hjälm', 'Sele komplett', 'Repbroms']
+    lines = []
+    for i in range(count):
+        if i % 10 == 9:
+            lines.append(f"Sida {i // 10} av {count // 10}")
+            continue
+        line = f"{rnd.choice('FGM')}{rnd.choice(['8009', '7773'])}-{i:06d} {rnd.choice(fbens)} {rnd.choice(names)}"
+        if i % 4 == 0:
+            line += ' Bruksanvisning'
+        if i % 7 == 0:
+            line += f" https://example.com/manual/{i}.pdf"
+        lines.append(line)
+    return lines
+
+def synthetic_articles(count, seed=1):
+    """Skapar artikelrader som liknar de som extraheras ur kapitel 9"""
+    rnd = random.Random(seed)
+    fbens = ['REP DYN 10,5MM', 'KARB HMS', 'HJÄLM STD', 'SELE PPE', 'BROMS AL', 'SLS 120 CM']
+    names = ['Klätterrep dynamiskt', 'Karbinhake skruv', 'Hjälm', 'Sele komplett', 'Repbroms']
+
+    return [
+        {
+            'fbet': f"{rnd.choice('FGM')}{rnd.choice(['8009', '7773'])}-{i:06d}",
+            'fben': rnd.choice(fbens),
+            'artikel': f"{rnd.choice(names)} {i}",
+            'link': None if i % 3 else f"https://example.com/manual/{i}.pdf"
+        }
+        for i in range(count)
+    ]
+
+def _pdf_string(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+def write_synthetic_pdf(path, table_pages, rows_per_page=40, filler_pages=10, seed=1, repeat_header=True):
+    """Skriver en minimal PDF med inledande textsidor följda av kapitel 9-tabellsidor
+    
+    Utan repeat_header har bara första tabellsidan ett tabellhuvud.
+    """
+    rnd = random.Random(seed)
+    fbens = ['REP DYN 10,5MM', 'KARB HMS', 'HJÄLM STD', 'SELE PPE', 'BROMS AL', 'SLS 120 CM']
+    names = ['Klätterrep dynamiskt', 'Karbinhake skruv', 'Hjälm', 'Sele komplett', 'Repbroms']
+    
+    pages = []
+    for i in range(filler_pages):
+        pages.append([[(50, f"Allmän text sida {i + 1} om utrustning och underhåll")]] * 30)
+    row = 0
+    for i in range(table_pages):
+        lines = [[(50, '9 Tillverkardokumentation')]] if i == 0 else []
+        if i == 0 or repeat_header:
+            lines.append([(50, 'FBET'), (150, 'FBEN'), (280, 'ARTIKEL'), (480, 'LÄNK')])
+        for _ in range(rows_per_page):
+            row += 1
+            lines.append([(50, f"{rnd.choice('FGM')}{rnd.choice(['8009', '7773'])}-{row:06d}"),
+                          (150, rnd.choice(fbens)), (280, f"{rnd.choice(names)} {row}"), (480, 'Bruksanvisning')])
+        pages.append(lines)
+    
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{4 + 2 * i} 0 R' for i in range(len(pages)))}] "
+        f"/Count {len(pages)} >>".encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    for i, lines in enumerate(pages):
+        content = ["BT /F1 9 Tf"]
+        for n, columns in enumerate(lines):
+            content.extend(f"1 0 0 1 {x} {800 - 14 * n} Tm ({_pdf_string(text)}) Tj" for x, text in columns)
+        content.append("ET")
+        stream = "\n".join(content).encode('cp1252')
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode())
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream")
+    
+    data = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += f"{number} 0 obj\n".encode() + obj + b"\nendobj\n"
+    xref = len(data)
+    data += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    data += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    data += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, 'wb') as f:
+        f.write(data)
+
+def _temp_session(directory, name):
+    """Skapar en tom databas i en temporär mapp och returnerar (session, engine)"""
+    engine = create_engine(f"sqlite:///{os.path.join(directory, name)}")
+    Base.metadata.create_all(engine)
+    # Samma index och triggrar som init_db, så att deras kostnad ingår i skrivtiderna
+    migrate_database(engine)
+    return sessionmaker(bind=engine)(), engine
+
+def _insert_orm(session, document_id, articles):
+    """Den gamla skrivvägen: ett ORM-objekt och session.add per rad"""
+    for article_data in articles:
+        session.add(Article(
+            document_id=document_id,
+            fbet=article_data.get('fbet'),
+            fben=article_data.get('fben'),
+            artikel=article_data.get('artikel'),
+            link=article_data.get('link')
+        ))
+
+def _insert_bulk(session, document_id, articles, chunk_size):
+    bulk_insert_articles(session, document_id, articles, chunk_size=chunk_size)
+
+def benchmark_insert(args):
+    """Jämför ORM-skrivning rad för rad med bulkskrivning i ett syntetiskt dokument"""
+    articles = synthetic_articles(args.rows)
+    methods = [
+        ('ORM session.add', lambda s, d: _insert_orm(s, d, articles)),
+        (f"bulk insert ({args.chunk_size}/chunk)", lambda s, d: _insert_bulk(s, d, articles, args.chunk_size)),
+    ]
+
+    print(f"Skriver {args.rows} artiklar till en tom SQLite-databas")
+    with tempfile.TemporaryDirectory() as directory:
+        for i, (label, insert_rows) in enumerate(methods):
+            session, engine = _temp_session(directory, f"bench_{i}.db")
+            try:
+                document = PDFDocument(filename='benchmark.pdf')
+                session.add(document)
+                session.commit()
+
+                started = time.perf_counter()
+                insert_rows(session, document.id)
+                session.commit()
+                elapsed = time.perf_counter() - started
+
+                stored = session.query(Article).count()
+                print(f"   {label:<28} {elapsed:7.2f} s  {stored / elapsed:10.0f} rader/s")
+            finally:
+                session.close()
+                engine.dispose()
+
+def benchmark_parse(args):
+    """Mäter textparserns genomströmning i rader per sekund (korrektheten testas i tests/test_text_parser.py)"""
+    text = '\n'.join(chapter_9_lines(args.lines))
+    best = None
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        articles = extract_articles_from_text(text)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    print(f"Tolkade {args.lines} rader ({len(articles)} artiklar) på {best:.3f} s: "
+          f"{args.lines / best:,.0f} rader/s (bästa av {args.repeat})")
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024  # byte på macOS, kB annars
+
+def _measure_extraction(pdf_path, stream, directory):
+    """Körs i en ny process: extraherar och sparar ett dokument och returnerar minnestoppen"""
+    os.chdir(directory)  # models.py använder pdf_index.db i arbetskatalogen
+    configure_logging(logging.WARNING)
+    init_db()
+    baseline = _peak_rss_mb()
+    
+    started = time.perf_counter()
+    if stream:
+        result, _, _ = stream_document(pdf_path, prefilter=True)
+        count = result['summary']['articles']
+    else:
+        articles = extract_document_articles(pdf_path, prefilter=True)
+        save_articles(index_pdf_document(pdf_path).id, articles)
+        count = len(articles)
+    return baseline, _peak_rss_mb(), count, time.perf_counter() - started
+
+def benchmark_memory(args):
+    """Jämför minnestoppen för vanlig och strömmande extraktion av allt större dokument"""
+    page_counts = [int(pages) for pages in args.pages.split(',')]
+    # Varje mätning i en ny process, eftersom minnestoppen aldrig sjunker inom en process
+    context = multiprocessing.get_context('spawn')
+    
+    print(f"Minnestopp (RSS) vid extraktion av syntetiska dokument med {args.rows} rader per tabellsida")
+    with tempfile.TemporaryDirectory() as directory:
+        for pages in page_counts:
+            pdf_path = Path(directory) / f"bench_{pages}.pdf"
+            write_synthetic_pdf(pdf_path, pages, args.rows)
+            
+            for label, stream in (('samlad', False), ('strömmande', True)):
+                run_directory = tempfile.mkdtemp(dir=directory)
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    baseline, peak, count, elapsed = executor.submit(
+                        _measure_extraction, pdf_path, stream, run_directory).result()
+                print(f"   {pages:5d} sidor  {label:<11} {count:7d} artiklar  {elapsed:7.2f} s  "
+                      f"topp {peak:7.1f} MB  (+{peak - baseline:.1f} MB efter import)")
+
+def _median_query_ms(run_query, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        hits = len(run_query())
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000, hits
+
+def benchmark_search(args):
+    """Jämför artikelsökning med FTS5-indexet och med LIKE-sökning för allt fler artiklar"""
+    row_counts = [int(rows) for rows in args.rows.split(',')]
+    
+    print(f"Söktid för artiklar, median av {args.repeat} körningar")
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in row_counts:
+            session, engine = _temp_session(directory, f"search_{rows}.db")
+            try:
+                document = PDFDocument(filename='benchmark.pdf')
+                session.add(document)
+                session.commit()
+                bulk_insert_articles(session, document.id, synthetic_articles(rows))
+                session.commit()
+                
+                print(f"   {rows} artiklar")
+                for query in SEARCH_QUERIES:
+                    fts_ms, fts_hits = _median_query_ms(
+                        lambda: keyset_page(*search_articles_query(session, query), page_size=args.limit)[0], args.repeat)
+                    like_ms, like_hits = _median_query_ms(
+                        lambda: session.query(Article).filter(article_substring_filter(query))
+                                       .limit(args.limit).all(), args.repeat)
+                    print(f"      {query!r:<24} FTS5 {fts_ms:8.2f} ms ({fts_hits:4d} träffar)   "
+                          f"LIKE {like_ms:8.2f} ms ({like_hits:4d} träffar)")
+                for query in FUZZY_SEARCH_QUERIES:
+                    fuzzy_ms, fuzzy_hits = _median_query_ms(
+                        lambda: fuzzy_search_articles(session, query, args.limit or 50), args.repeat)
+                    print(f"      {query!r:<24} trigram {fuzzy_ms:8.2f} ms ({fuzzy_hits:4d} liknande)")
+            finally:
+                session.close()
+                engine.dispose()
+
+def _search_reader(engine, stop, timings, errors):
+    """Söker tills stop sätts, med en ny session per sökning som en webbförfrågan"""
+    make_session = sessionmaker(bind=engine)
+    while not stop.is_set():
+        for query in SEARCH_QUERIES:
+            session = make_session()
+            started = time.perf_counter()
+            try:
+                keyset_page(*search_articles_query(session, query), page_size=50)
+                timings.append(time.perf_counter() - started)
+            except OperationalError as e:
+                errors.append(f"sökning {query!r}: {e.orig}")
+            finally:
+                session.close()
+
+def _extraction_writer(engine, extractions, rows, page_rows, errors):
+    """Extraherar samma dokument flera gånger med ändrat innehåll, med en commit per sida
+    som strömmande extraktion med checkpoints"""
+    session = sessionmaker(bind=engine)()
+    try:
+        document = PDFDocument(filename='concurrency.pdf')
+        session.add(document)
+        session.commit()
+        for seed in range(1, extractions + 1):
+            articles = synthetic_articles(rows, seed=seed)
+            writer = ArticleDeltaWriter(session, document.id)
+            for page_num, start in enumerate(range(0, rows, page_rows)):
+                writer.add(articles[start:start + page_rows])
+                writer.checkpoint(page_num)
+                session.commit()
+            writer.finish()
+            session.commit()
+    except OperationalError as e:
+        session.rollback()
+        errors.append(f"extraktion: {e.orig}")
+    finally:
+        session.close()
+
+def benchmark_concurrency(args):
+    """Söker från flera trådar medan en tråd skriver artiklar som extraktionen gör
+    
+    Avslutar med status 1 om någon sökning eller skrivning misslyckades, t.ex.
+    med "database is locked".
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        session, engine = _temp_session(directory, 'concurrency.db')
+        try:
+            document = PDFDocument(filename='benchmark.pdf')
+            session.add(document)
+            session.commit()
+            bulk_insert_articles(session, document.id, synthetic_articles(args.rows))
+            session.commit()
+            journal_mode = session.execute(text("PRAGMA journal_mode")).scalar()
+        finally:
+            session.close()
+        
+        print(f"{args.readers} söktrådar medan {args.extractions} extraktioner à {args.extraction_rows} artiklar "
+              f"skrivs ({args.rows} artiklar i databasen, journal_mode={journal_mode})")
+        stop = threading.Event()
+        timings, errors = [], []
+        readers = [threading.Thread(target=_search_reader, args=(engine, stop, timings, errors))
+                   for _ in range(args.readers)]
+        for reader in readers:
+            reader.start()
+        
+        started = time.perf_counter()
+        writer = threading.Thread(target=_extraction_writer,
+                                  args=(engine, args.extractions, args.extraction_rows, args.page_rows, errors))
+        writer.start()
+        writer.join()
+        elapsed = time.perf_counter() - started
+        stop.set()
+        for reader in readers:
+            reader.join()
+        engine.dispose()
+    
+    written = args.extractions * args.extraction_rows
+    print(f"   Extraktion       {elapsed:7.2f} s  {written / elapsed:10.0f} rader/s")
+    if timings:
+        timings.sort()
+        print(f"   Sökningar        {len(timings)} st, median {statistics.median(timings) * 1000:.1f} ms, "
+              f"95:e percentil {timings[int(len(timings) * 0.95)] * 1000:.1f} ms, "
+              f"max {timings[-1] * 1000:.1f} ms")
+    print(f"   Fel              {len(errors)}")
+    for error in errors[:10]:
+        print(f"      {error}")
+    if errors:
+        sys.exit(1)
+
+def parse_args():
+    """Läser kommandoradsargument"""
+    parser = argparse.ArgumentParser(description="Prestandamätningar för mtrl-search")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    insert_parser = subparsers.add_parser('insert', help="Skrivhastighet för extraherade artiklar")
+    insert_parser.add_argument('--rows', type=int, default=50000)
+    insert_parser.add_argument('--chunk-size', type=int, default=BULK_CHUNK_SIZE)
+    insert_parser.set_defaults(func=benchmark_insert)
+
+    parse_parser = subparsers.add_parser('parse', help="Textparserns hastighet")
+    parse_parser.add_argument('--lines', type=int, default=200000)
+    parse_parser.add_argument('--repeat', type=int, default=3)
+    parse_parser.set_defaults(func=benchmark_parse)
+
+    memory_parser = subparsers.add_parser('memory', help="Minnestopp vid extraktion av stora dokument")
+    memory_parser.add_argument('--pages', default='50,100,200',
+                               help="Kommaseparerat antal tabellsidor per dokument (standard: %(default)s)")
+    memory_parser.add_argument('--rows', type=int, default=40, help="Rader per tabellsida")
+    memory_parser.set_defaults(func=benchmark_memory)
+
+    search_parser = subparsers.add_parser('search', help="Söktid för artiklar med FTS5 och LIKE")
+    search_parser.add_argument('--rows', default='10000,100000',
+                               help="Kommaseparerat antal artiklar i databasen (standard: %(default)s)")
+    search_parser.add_argument('--limit', type=int, default=None,
+                               help="Max antal träffar per sökning (standard: alla; /articles/search hämtar 50 per sida)")
+    search_parser.add_argument('--repeat', type=int, default=5)
+    search_parser.set_defaults(func=benchmark_search)
+
+    concurrency_parser = subparsers.add_parser('concurrency', help="Sökningar under pågående extraktion")
+    concurrency_parser.add_argument('--rows', type=int, default=50000, help="Artiklar i databasen från början")
+    concurrency_parser.add_argument('--readers', type=int, default=4, help="Söktrådar")
+    concurrency_parser.add_argument('--extractions', type=int, default=3)
+    concurrency_parser.add_argument('--extraction-rows', type=int, default=5000, help="Artiklar per extraktion")
+    concurrency_parser.add_argument('--page-rows', type=int, default=500, help="Artiklar per commit")
+    concurrency_parser.set_defaults(func=benchmark_concurrency)
+
+    return parser.parse_args()
+
+def main():
+    """Huvudfunktion"""
+    args = parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
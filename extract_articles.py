@@ -3,78 +3,576 @@
 Skript för att indexera PDF-dokument och extrahera artikelinformation från kapitel 9 - Tillverkardokumentation
 """
 
+import argparse
+import bisect
+import hashlib
+import json
+import logging
 import pdfplumber
+import PyPDF2
 import re
 import os
+import queue
+import signal
+import socket
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from models import get_session, PDFDocument, Article, init_db
-from sqlalchemy import or_
+from page_cache import PageCache, DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES
+from models import (get_session, PDFDocument, Article, ExtractionClaim, init_db,
+                    bulk_insert_articles, bulk_update_articles, bulk_delete_articles, BULK_CHUNK_SIZE)
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
-def find_chapter_9_pages(pdf_path):
-    """Hitta sidorna som innehåller kapitel 9 - Tillverkardokumentation"""
-    pages_with_articles = []
+logger = logging.getLogger('extract_articles')
+
+# Indikatorer för tillverkardokumentation respektive artikeldata
+CHAPTER_INDICATORS = ('TILLVERKARDOKUMENTATION', 'KAPITEL 9', 'CHAPTER 9')
+ARTICLE_INDICATORS = (
+    'FBET',
+    'FBEN',
+    'F8009-', 'F7773-', 'G8009-', 'G7773-'  # Vanliga FBET-prefixer
+)
+FBET_PATTERN = re.compile(r'[FGM]\d{4}-\d{6}')
+
+# Förkompilerade mönster för den textbaserade extraktionen (extract_articles_from_text)
+TEXT_FBET_FIRST_CHARS = frozenset('FGM')
+TEXT_FBET_AT_START = re.compile(r'[FGM]\d{4}-\d{6}')
+TEXT_WORD_CLEAN = re.compile(r'[^\w\såäöüÅÄÖÜ\-\./]')
+TEXT_FBEN_WORD = re.compile(r'[A-ZÅÄÖÜ0-9\-\./,]+')
+TEXT_HAS_UPPER = re.compile(r'[A-ZÅÄÖÜ]')
+TEXT_NUMERIC_ONLY = re.compile(r'[\d\s\-\./,]+')
+TEXT_BRUKSANVISNING_SUFFIX = re.compile(r'\s*Bruksanvisning\s*$', re.IGNORECASE)
+TEXT_LINK = re.compile(r'https?://[^\s]+')
+
+# Tillstånd för ord i FBEN-delen av en textrad
+FBEN_WORD = 'fben'
+ARTIKEL_WORD = 'artikel'
+BLACK_DIAMOND = 'black_diamond'
+SKIP_WORD = 'skip'
+
+# Samma ord (mått, förkortningar, produkttyper) återkommer på nästan varje rad
+WORD_STATE_CACHE_SIZE = 8192
+
+# Version för sidlayouten som sparas i sidcachen. Höj den när text, ord eller
+# tabeller tas fram på ett annat sätt, så att gammal cachad layout inte används.
+EXTRACTOR_VERSION = 1
+
+# Kolumnrubriker i artikeltabellen och deras nycklar i artikeldata
+COLUMN_HEADERS = (
+    ('FBET', 'fbet'),
+    ('FBEN', 'fben'),
+    ('ARTIKEL', 'artikel'),
+    ('LÄNK', 'link'),
+    ('LINK', 'link'),
+)
+
+# Toleranser (i punkter) när ord grupperas till rader och kolumner
+LINE_TOLERANCE = 3
+COLUMN_TOLERANCE = 2
+
+# Antal sidintervall per arbetsprocess vid parallell extraktion, så att
+# långsamma intervall (t.ex. kapitel 9) inte blir kvar på en enda process
+SHARDS_PER_WORKER = 4
+
+# Blockstorlek vid hashning av PDF-filer
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Antal sidor med artikeldata mellan två checkpoints vid strömmande extraktion
+CHECKPOINT_PAGES = 20
+
+# Bevakning av PDF-mappen (--watch): hur ofta mappen läses och hur länge en fil
+# måste vara oförändrad innan den extraheras, så att halvkopierade filer inte tas
+WATCH_POLL_INTERVAL = 2.0
+WATCH_SETTLE_SECONDS = 5.0
+
+# Sekunder ett anspråk på ett dokument gäller utan att förnyas (se claim_document).
+# Så länge anspråket hålls förnyas det var CLAIM_RENEW_SECONDS:e sekund (se renewing_claims).
+CLAIM_LEASE_SECONDS = 15 * 60
+CLAIM_RENEW_SECONDS = CLAIM_LEASE_SECONDS / 3
+
+# Bilder som laddats upp via webbgränssnittet (se app.py)
+UPLOAD_URL_PREFIX = '/static/uploads/'
+
+class StageTimer:
+    """Summerar tidsåtgången per steg i extraktionen (öppning, klassificering, tabeller, ...)
     
-    with pdfplumber.open(pdf_path) as pdf:
-        total_pages = len(pdf.pages)
-        print(f"Analyserar {total_pages} sidor för att hitta artikeltabeller...")
+    Ett steg som startas inuti ett annat (t.ex. när PDF:en öppnas först när
+    första sidan klassificeras) räknas bara till det inre steget, så att
+    stegtiderna tillsammans inte blir mer än den uppmätta tiden.
+    Vid parallell extraktion slås arbetsprocessernas tider ihop med merge(),
+    så stegtiderna är då summan över alla processer.
+    """
+    
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self._nested = []  # Tid i inre steg för varje pågående steg, innerst sist
+    
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        self._nested.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.seconds[name] += elapsed - self._nested.pop()
+            if self._nested:
+                self._nested[-1] += elapsed
+    
+    def merge(self, seconds):
+        for name, elapsed in seconds.items():
+            self.seconds[name] += elapsed
+    
+    def as_dict(self):
+        return {name: round(elapsed, 4) for name, elapsed in sorted(self.seconds.items())}
+
+def is_article_page(text, page_num):
+    """Avgör utifrån sidans text om sidan innehåller artikeldata från kapitel 9"""
+    if not text:
+        return False
+    
+    text_upper = text.upper()
+    has_chapter = any(indicator in text_upper for indicator in CHAPTER_INDICATORS)
+    has_articles = any(indicator in text_upper for indicator in ARTICLE_INDICATORS)
+    
+    # Räkna antal potentiella artikelrader (rader med FBET/FBEN-mönster) - inkludera M-prefix
+    fbet_codes = FBET_PATTERN.findall(text)
+    fbet_matches = len(fbet_codes)
+    
+    if has_chapter or (has_articles and fbet_matches > 0):
+        logger.debug("✅ Hittade artikeldata på sida %d (%d FBET-koder)", page_num + 1, fbet_matches)
         
-        for page_num in range(total_pages):
-            try:
-                page = pdf.pages[page_num]
-                text = page.extract_text()
+        # Visa lite kontext
+        if fbet_matches > 0:
+            logger.debug("   Exempel på koder: %s", ', '.join(fbet_codes[:3]))
+        return True
+    
+    # Debug: visa sidor efter 135 som inte matchade
+    if page_num > 135:
+        logger.debug("❌ Sida %d: %d FBET-koder, has_articles=%s", page_num + 1, fbet_matches, has_articles)
+    return False
+
+def may_be_article_page(text):
+    """Billig och generös kontroll av en sidas text inför den fullständiga klassificeringen
+    
+    Allt som skulle kunna godkännas av is_article_page släpps igenom.
+    """
+    text_upper = text.upper()
+    return (any(indicator in text_upper for indicator in CHAPTER_INDICATORS)
+            or any(indicator in text_upper for indicator in ARTICLE_INDICATORS)
+            or FBET_PATTERN.search(text) is not None)
+
+def prefilter_candidate_pages(pdf_path):
+    """Sållar bort sidor som uppenbart inte innehåller artikeldata
+    
+    Använder PyPDF2:s textextraktion, som saknar pdfplumbers layoutanalys och är
+    mångdubbelt snabbare. Sidor där PyPDF2 inte får ut någon text (eller
+    misslyckas) behålls, så att pdfplumber får avgöra dem.
+    Sidor med en rad som innehåller både FBET och FBEN noteras som tabellhuvuden.
+    Returnerar (kandidatsidor, totalt antal sidor, sidor med tabellhuvud).
+    """
+    reader = PyPDF2.PdfReader(str(pdf_path))
+    total_pages = len(reader.pages)
+    candidates = []
+    header_pages = []
+    
+    for page_num, page in enumerate(reader.pages):
+        try:
+            text = page.extract_text()
+        except Exception:
+            candidates.append(page_num)
+            continue
+        
+        if not text or not text.strip() or may_be_article_page(text):
+            candidates.append(page_num)
+        
+        if text and any('FBET' in line and 'FBEN' in line for line in text.upper().split('\n')):
+            header_pages.append(page_num)
+    
+    logger.info("Förfiltrering: %d av %d sidor behöver analyseras", len(candidates), total_pages)
+    return candidates, total_pages, header_pages
+
+def _group_lines(words):
+    """Grupperar ord från extract_words() till rader uppifrån och ned"""
+    lines = []
+    for word in sorted(words, key=lambda w: (round(w['top']), w['x0'])):
+        if lines and abs(word['top'] - lines[-1][0]['top']) <= LINE_TOLERANCE:
+            lines[-1].append(word)
+        else:
+            lines.append([word])
+    return lines
+
+class ColumnModel:
+    """Kolumngränser i x-led för artikeltabellen, inlärda från en sida med tabellhuvud
+    
+    Kapitel 9-tabellerna har samma kolumnlayout över många sidor, så modellen kan
+    återanvändas på fortsättningssidor utan tabellhuvud. Varje sida behöver då bara
+    extract_words() i stället för den betydligt dyrare extract_tables().
+    """
+    
+    def __init__(self, columns, page_width):
+        # columns: [(nyckel, vänsterkant)] sorterade från vänster till höger
+        self.columns = columns
+        self.page_width = page_width
+    
+    def __repr__(self):
+        return f"<ColumnModel({', '.join(f'{key}@{x0:.0f}' for key, x0 in self.columns)})>"
+    
+    @classmethod
+    def from_words(cls, words, page_width):
+        """Letar efter en rubrikrad med FBET och minst en annan kolumn. Returnerar None om den saknas."""
+        for line in _group_lines(words):
+            columns = {}
+            for word in line:
+                text_upper = word['text'].upper()
+                for header, key in COLUMN_HEADERS:
+                    if header in text_upper and key not in columns:
+                        columns[key] = word['x0']
+                        break
+            
+            if 'fbet' in columns and len(columns) >= 2:
+                return cls(sorted(columns.items(), key=lambda c: c[1]), page_width)
+        
+        return None
+    
+    def fits(self, page_width):
+        """Sant om sidan har samma bredd som sidan modellen lärdes in från"""
+        return abs(page_width - self.page_width) <= COLUMN_TOLERANCE
+    
+    def column_for(self, x0):
+        """Nyckeln för kolumnen som ett ord som börjar vid x0 hör till"""
+        key = self.columns[0][0]
+        for column_key, column_x0 in self.columns:
+            if x0 >= column_x0 - COLUMN_TOLERANCE:
+                key = column_key
+            else:
+                break
+        return key
+    
+    def extract_articles(self, words):
+        """Delar upp sidans ord i artikelrader enligt kolumnmodellen
+        
+        En rad med en FBET-kod i FBET-kolumnen påbörjar en ny artikel. Rader direkt
+        under utan FBET-kod räknas som radbrytningar i föregående artikels celler.
+        En rad med tom FBET-cell men med FBEN eller artikelnamn längre ned blir en
+        egen artikel utan FBET-kod, som i extract_tables()-vägen, om den ligger
+        mellan två rader med kod. Text ovanför första och nedanför sista raden med
+        kod (sidhuvud, sidfot, rubriker) kan inte skiljas från tabellrader och tas
+        inte med.
+        """
+        articles = []
+        coded = []  # Index i articles för raderna med FBET-kod
+        current = None
+        previous_bottom = None
+        
+        for line in _group_lines(words):
+            cells = defaultdict(list)
+            for word in line:
+                cells[self.column_for(word['x0'])].append(word['text'])
+            
+            line_top = min(word['top'] for word in line)
+            line_height = max(word['bottom'] - word['top'] for word in line)
+            fbet_text = ' '.join(cells.get('fbet', []))
+            
+            if FBET_PATTERN.fullmatch(fbet_text):
+                current = {key: ' '.join(texts) for key, texts in cells.items()}
+                coded.append(len(articles))
+                articles.append(current)
+            elif (current is not None and not fbet_text and previous_bottom is not None
+                  and line_top - previous_bottom <= line_height):
+                for key, texts in cells.items():
+                    current[key] = ' '.join(filter(None, [current.get(key), *texts]))
+            elif not fbet_text and (cells.get('fben') or cells.get('artikel')):
+                current = {key: ' '.join(texts) for key, texts in cells.items()}
+                articles.append(current)
+            else:
+                current = None
+            
+            previous_bottom = max(word['bottom'] for word in line)
+        
+        return [
+            {key: (article.get(key) or '').strip() or None for key in ('fbet', 'fben', 'artikel', 'link')}
+            for article in (articles[coded[0]:coded[-1] + 1] if coded else [])
+        ]
+
+class PageLayout:
+    """Layoutdata för en sida med samma metoder som en pdfplumber-sida
+    
+    Text, ord och tabeller tas fram högst en gång vardera, antingen ur sparad
+    cachedata eller från pdfplumber-sidan, som hämtas först när den behövs.
+    """
+    
+    def __init__(self, data=None, load_page=None):
+        self.data = dict(data or {})
+        self.load_page = load_page
+        self.computed = False  # Sant om något har tagits fram som inte fanns i data
+        self._page = None
+    
+    def _get(self, key, compute):
+        if key not in self.data:
+            if self._page is None:
+                self._page = self.load_page()
+            self.data[key] = compute(self._page)
+            self.computed = True
+        return self.data[key]
+    
+    @property
+    def width(self):
+        return self._get('width', lambda page: page.width)
+    
+    def extract_text(self):
+        return self._get('text', lambda page: page.extract_text())
+    
+    def extract_words(self):
+        return self._get('words', lambda page: page.extract_words())
+    
+    def extract_tables(self):
+        return self._get('tables', lambda page: page.extract_tables())
+    
+    def release(self):
+        """Släpper pdfplumber-sidans tecken- och layoutcacher när sidan är färdigbehandlad
+        
+        pdfplumber behåller annars varje analyserad sidas tecken och layoutobjekt
+        så länge dokumentet är öppet, så minnet växer med antalet sidor.
+        """
+        if self._page is not None:
+            self._page.flush_cache()
+            self._page.get_textmap.cache_clear()
+            self._page = None
+
+def iter_article_pages(pdf_path, page_nums=None, cache=None, doc_hash=None, model_page=None, timer=None,
+                       seek_model=False):
+    """Går igenom PDF:en en gång och klassificerar och extraherar varje sida i samma besök.
+    
+    Dokumentet öppnas bara en gång och varje sidas layout analyseras bara en gång:
+    texten som används för klassificeringen återanvänds av extraktionen.
+    Ger (sidnummer, artiklar) för varje sida med artikeldata. Med page_nums
+    begränsas genomgången till de angivna sidorna.
+    
+    Kolumnlayouten lärs in från första sidan med tabellhuvud och används sedan
+    för att dela upp följande sidor (se ColumnModel).
+    
+    Med en PageCache och dokumentets innehållshash läses sidlayouten ur cachen när
+    den finns där; PDF:en öppnas då bara om någon sida saknas.
+    
+    model_page är en tidigare sida med tabellhuvud att lära in kolumnmodellen från,
+    för genomgångar som börjar mitt i en tabell (t.ex. vid parallell extraktion).
+    Med seek_model letas kolumnmodellen i stället upp bakåt från första sidan med
+    artikeldata när ingen modell är känd och sidan saknar eget tabellhuvud (se
+    find_preceding_model), eftersom PyPDF2 inte alltid hittar tabellhuvudena.
+    
+    Tidsåtgången per steg summeras i timer (en StageTimer).
+    """
+    timer = timer if timer is not None else StageTimer()
+    column_model = None
+    use_cache = cache is not None and doc_hash is not None
+    cache_hits = 0
+    
+    with ExitStack() as stack:
+        pages = None
+        
+        def open_pages():
+            nonlocal pages
+            if pages is None:
+                with timer.stage('open'):
+                    pdf = stack.enter_context(pdfplumber.open(pdf_path))
+                    # pdfplumber läser sidträdet först när pdf.pages används; gör det
+                    # här så att den tiden räknas till 'open'
+                    pages = pdf.pages
+            return pages
+        
+        def load_layout(page_num):
+            with timer.stage('cache'):
+                cached = cache.get(doc_hash, page_num) if use_cache else None
+            return cached, PageLayout(cached, load_page=lambda: open_pages()[page_num])
+        
+        def store_layout(page_num, layout):
+            if use_cache and layout.computed:
+                try:
+                    with timer.stage('cache'):
+                        cache.put(doc_hash, page_num, layout.data)
+                except OSError as e:
+                    logger.warning("Kunde inte spara sida %d i sidcachen: %s", page_num + 1, e)
+        
+        def find_preceding_model(page_num):
+            """Lär in kolumnmodellen från närmast föregående sida med tabellhuvud i samma tabell
+            
+            Sidorna före page_num läses bakåt med samma ord (eller sidcache) som
+            ColumnModel.from_words använder, tills ett tabellhuvud hittas eller en
+            sida utan artikeldata visar att tabellen började senare.
+            Returnerar (kolumnmodell eller None, sant om sidan före page_num har artikeldata).
+            """
+            mid_table = False
+            for previous in range(page_num - 1, -1, -1):
+                _, layout = load_layout(previous)
+                try:
+                    with timer.stage('column_model'):
+                        previous_model = ColumnModel.from_words(layout.extract_words(), layout.width)
+                        in_table = previous_model is None and is_article_page(layout.extract_text(), previous)
+                except Exception as e:
+                    logger.warning("Fel vid sökning efter tabellhuvud på sida %d: %s", previous + 1, e)
+                    return None, True
+                finally:
+                    layout.release()
+                    store_layout(previous, layout)
                 
-                if text:
-                    text_upper = text.upper()
-                    
-                    # Leta efter specifika indikatorer för tillverkardokumentation
-                    chapter_indicators = [
-                        'TILLVERKARDOKUMENTATION',
-                        'KAPITEL 9',
-                        'CHAPTER 9'
-                    ]
-                    
-                    # Leta efter artikelkoder och strukturerad data
-                    article_indicators = [
-                        'FBET',
-                        'FBEN', 
-                        'F8009-', 'F7773-', 'G8009-', 'G7773-'  # Vanliga FBET-prefixer
-                    ]
-                    
-                    has_chapter = any(indicator in text_upper for indicator in chapter_indicators)
-                    has_articles = any(indicator in text_upper for indicator in article_indicators)
-                    
-                    # Räkna antal potentiella artikelrader (rader med FBET/FBEN-mönster) - inkludera M-prefix
-                    fbet_matches = len(re.findall(r'[FGM]\d{4}-\d{6}', text))
-                    
-                    if has_chapter or (has_articles and fbet_matches > 0):
-                        pages_with_articles.append(page_num)
-                        print(f"✅ Hittade artikeldata på sida {page_num + 1} ({fbet_matches} FBET-koder)")
-                        
-                        # Visa lite kontext
-                        if fbet_matches > 0:
-                            sample_codes = re.findall(r'[FGM]\d{4}-\d{6}', text)[:3]
-                            print(f"   Exempel på koder: {', '.join(sample_codes)}")
-                    else:
-                        # Debug: visa sidor efter 135 som inte matchade
-                        if page_num > 135:
-                            print(f"❌ Sida {page_num + 1}: {fbet_matches} FBET-koder, has_articles={has_articles}")
-                            
+                if previous_model:
+                    logger.debug("Kolumnmodell för sida %d inlärd från sida %d", page_num + 1, previous + 1)
+                    return previous_model, True
+                if not in_table:
+                    return None, mid_table
+                mid_table = True
+            return None, mid_table
+        
+        if model_page is not None:
+            _, layout = load_layout(model_page)
+            try:
+                with timer.stage('column_model'):
+                    column_model = ColumnModel.from_words(layout.extract_words(), layout.width)
+            except Exception as e:
+                logger.warning("Fel vid inlärning av kolumnmodell från sida %d: %s", model_page + 1, e)
+            finally:
+                layout.release()
+        
+        if page_nums is None:
+            total_pages = len(open_pages())
+            page_nums = range(total_pages)
+            logger.info("Analyserar %d sidor för att hitta artikeltabeller...", total_pages)
+        
+        for page_num in page_nums:
+            cached, layout = load_layout(page_num)
+            if cached is not None:
+                cache_hits += 1
+            
+            try:
+                with timer.stage('classify'):
+                    text = layout.extract_text()
+                    article_page = is_article_page(text, page_num)
             except Exception as e:
-                print(f"Fel vid analys av sida {page_num + 1}: {e}")
+                logger.warning("Fel vid analys av sida %d: %s", page_num + 1, e)
+                layout.release()
                 continue
+            
+            page_articles = None
+            if article_page:
+                if seek_model and column_model is None:
+                    # Bara första sidan med artikeldata kan fortsätta en tabell från tidigare sidor
+                    seek_model = False
+                    try:
+                        with timer.stage('column_model'):
+                            has_header = ColumnModel.from_words(layout.extract_words(), layout.width) is not None
+                    except Exception:
+                        has_header = False
+                    if not has_header:
+                        column_model, mid_table = find_preceding_model(page_num)
+                        if column_model is None and mid_table:
+                            logger.warning("⚠️  Sida %d fortsätter en tabell vars tabellhuvud inte hittades, "
+                                           "raderna tolkas utan kolumnmodell", page_num + 1)
+                logger.debug("📄 Extraherar från sida %d...", page_num + 1)
+                # Bara det som tolkningen faktiskt behöver tas fram och sparas i cachen
+                page_articles, column_model = extract_articles_with_model(layout, column_model, text=text,
+                                                                          timer=timer)
+            layout.release()
+            store_layout(page_num, layout)
+            
+            if page_articles is not None:
+                yield page_num, page_articles
+    
+    if use_cache:
+        logger.info("Sidcache: %d av %d sidor lästes ur cachen", cache_hits, len(page_nums))
+
+def extract_articles_with_model(page, column_model, text=None, timer=None):
+    """Extraherar artiklar med kolumnmodellen och faller tillbaka på tabell-/textextraktion
     
-    return pages_with_articles
+    Har sidan ett eget tabellhuvud lärs modellen in på nytt från den.
+    Returnerar (artiklar, kolumnmodell att använda för nästa sida).
+    """
+    timer = timer if timer is not None else StageTimer()
+    try:
+        with timer.stage('column_model'):
+            words = page.extract_words()
+            page_model = ColumnModel.from_words(words, page.width)
+            if page_model:
+                if repr(page_model) != repr(column_model):
+                    logger.debug("Kolumnmodell inlärd: %s", page_model)
+                column_model = page_model
+            
+            articles = []
+            if column_model and column_model.fits(page.width):
+                articles = column_model.extract_articles(words)
+        
+        if articles:
+            logger.debug("Kolumnmodell: %d artiklar", len(articles))
+            return articles, column_model
+    except Exception as e:
+        logger.warning("Fel vid extraktion med kolumnmodell: %s", e)
+    
+    return extract_articles_from_page(page, text=text, timer=timer), column_model
 
-def extract_articles_from_page(page):
-    """Extraherar artikeldata från en enskild sida"""
+def _extract_pages(pdf_path, page_nums, cache=None, doc_hash=None, model_page=None, seek_model=False):
+    """Arbetsprocess: klassificerar och extraherar de angivna sidorna i ett eget PDF-handtag
+    
+    Returnerar (sidresultat, tid per steg).
+    """
+    timer = StageTimer()
+    pages = list(iter_article_pages(pdf_path, page_nums, cache, doc_hash, model_page, timer, seek_model))
+    return pages, dict(timer.seconds)
+
+def iter_article_pages_parallel(pdf_path, workers, header_pages, page_nums=None, cache=None, doc_hash=None,
+                                timer=None):
+    """Som iter_article_pages men fördelar sidintervall över flera processer.
+    
+    Varje process öppnar PDF:en själv. Resultaten ges tillbaka i sidordning.
+    Ett intervall som börjar mitt i en tabell lär in kolumnmodellen från närmast
+    föregående sida med tabellhuvud enligt förfiltreringen (header_pages), eller
+    letar upp den bakåt med pdfplumber när förfiltreringen inte hittade någon
+    (se iter_article_pages), precis som en sekventiell körning.
+    """
+    if page_nums is None:
+        with pdfplumber.open(pdf_path) as pdf:
+            page_nums = list(range(len(pdf.pages)))
+    
+    logger.info("Analyserar %d sidor med %d processer...", len(page_nums), workers)
+    
+    shard_size = max(1, -(-len(page_nums) // (workers * SHARDS_PER_WORKER)))
+    shards = [page_nums[i:i + shard_size] for i in range(0, len(page_nums), shard_size)]
+    model_pages = []
+    for shard in shards:
+        preceding = bisect.bisect_left(header_pages, shard[0])
+        model_pages.append(header_pages[preceding - 1] if preceding else None)
+    
+    with ProcessPoolExecutor(max_workers=workers, initializer=configure_logging,
+                             initargs=(logger.getEffectiveLevel(),)) as executor:
+        # map() behåller ordningen, så sidorna kommer tillbaka sorterade
+        for shard, seconds in executor.map(_extract_pages, [pdf_path] * len(shards), shards,
+                                           [cache] * len(shards), [doc_hash] * len(shards), model_pages,
+                                           [shard[0] > 0 for shard in shards]):
+            if timer is not None:
+                timer.merge(seconds)
+            yield from shard
+
+def extract_articles_from_page(page, text=None, timer=None):
+    """Extraherar artikeldata från en enskild sida
+    
+    Om sidans text redan har extraherats (t.ex. vid klassificeringen) kan den skickas
+    med som text så att textfallbacken inte behöver göra om layoutanalysen.
+    """
+    timer = timer if timer is not None else StageTimer()
     articles = []
     
     try:
         # Prova först att extrahera som tabell
-        tables = page.extract_tables()
+        with timer.stage('tables'):
+            tables = page.extract_tables()
         
         if tables:
-            print(f"Hittade {len(tables)} tabeller på sidan")
+            logger.debug("Hittade %d tabeller på sidan", len(tables))
             
             for table_idx, table in enumerate(tables):
                 if table and len(table) > 0:
@@ -89,7 +587,7 @@ def extract_articles_from_page(page):
                     
                     if header_row is not None:
                         headers = table[header_row]
-                        print(f"Tabell {table_idx + 1} headers: {headers}")
+                        logger.debug("Tabell %d headers: %s", table_idx + 1, headers)
                         
                         # Hitta kolumnindex
                         fbet_idx = fben_idx = artikel_idx = link_idx = None
@@ -106,18 +604,18 @@ def extract_articles_from_page(page):
                                 elif 'LÄNK' in header_upper or 'LINK' in header_upper:
                                     link_idx = i
                         
-                        print(f"Kolumnindex - FBET: {fbet_idx}, FBEN: {fben_idx}, ARTIKEL: {artikel_idx}, LÄNK: {link_idx}")
+                        logger.debug("Kolumnindex - FBET: %s, FBEN: %s, ARTIKEL: %s, LÄNK: %s", fbet_idx, fben_idx, artikel_idx, link_idx)
                         
                         # Extrahera data från raderna efter header
                         row_count = 0
                         for row_idx, row in enumerate(table[header_row + 1:], start=header_row + 1):
                             if row:
-                                print(f"  Rad {row_idx}: {row[:5]}...")  # Visa första 5 celler för debug
+                                logger.debug("  Rad %d: %s...", row_idx, row[:5])  # Visa första 5 celler för debug
                                 
                                 # Kontrollera om raden har tillräckligt med kolumner
                                 max_needed_idx = max(filter(None, [fbet_idx, fben_idx, artikel_idx, link_idx] or [0]))
                                 if len(row) <= max_needed_idx:
-                                    print(f"    Hoppar över rad - för få kolumner ({len(row)} <= {max_needed_idx})")
+                                    logger.debug("    Hoppar över rad - för få kolumner (%d <= %d)", len(row), max_needed_idx)
                                     continue
                                 
                                 # Extrahera värden
@@ -132,7 +630,7 @@ def extract_articles_from_page(page):
                                 artikel = artikel if artikel and artikel != 'None' and artikel.strip() != '' else None
                                 link = link if link and link != 'None' and link.strip() != '' else None
                                 
-                                print(f"    Extraherat - FBET: '{fbet}', FBEN: '{fben}', Artikel: '{artikel}', Länk: '{link}'")
+                                logger.debug("    Extraherat - FBET: '%s', FBEN: '%s', Artikel: '%s', Länk: '%s'", fbet, fben, artikel, link)
                                 
                                 # Kontrollera om raden har användbar data
                                 if any([fbet, fben, artikel, link]):
@@ -143,283 +641,1176 @@ def extract_articles_from_page(page):
                                         'link': link
                                     })
                                     row_count += 1
-                                    print(f"    ✅ Artikel {row_count} tillagd")
+                                    logger.debug("    ✅ Artikel %d tillagd", row_count)
                                 else:
-                                    print(f"    ❌ Tom rad, hoppar över")
+                                    logger.debug("    ❌ Tom rad, hoppar över")
                         
-                        print(f"Totalt {row_count} artiklar extraherade från tabell {table_idx + 1}")
+                        logger.debug("Totalt %d artiklar extraherade från tabell %d", row_count, table_idx + 1)
         
         # Om inga tabeller hittades, prova textbaserad extraktion
         if not articles:
-            text = page.extract_text()
-            if text:
-                articles.extend(extract_articles_from_text(text))
+            with timer.stage('text_fallback'):
+                if text is None:
+                    text = page.extract_text()
+                if text:
+                    articles.extend(extract_articles_from_text(text))
                 
     except Exception as e:
-        print(f"Fel vid extraktion från sida: {e}")
+        logger.warning("Fel vid extraktion från sida: %s", e)
     
     return articles
 
+@lru_cache(maxsize=WORD_STATE_CACHE_SIZE)
+def _classify_fben_word(word):
+    """Tillstånd för ett ord i FBEN-delen: FBEN_WORD, ARTIKEL_WORD, BLACK_DIAMOND eller SKIP_WORD"""
+    # Rensa bort specialtecken för analys (snabbväg för rena alfanumeriska ord)
+    word_clean = word if word.isalnum() else TEXT_WORD_CLEAN.sub('', word)
+    
+    if not word_clean:
+        # Ord med bara specialtecken hamnar i artikeln men avslutar inte FBEN-delen
+        return SKIP_WORD
+    # Specialhantering för "BD" - ska alltid till artikel som "Black Diamond"
+    if word_clean == 'BD':
+        return BLACK_DIAMOND
+    # Stora bokstäver, mått och förkortningar tillhör FBEN
+    if word_clean.isupper() or TEXT_FBEN_WORD.fullmatch(word_clean):
+        return FBEN_WORD
+    # Mixed case eller gemener påbörjar artikeldelen
+    return ARTIKEL_WORD
+
+def parse_article_line(line):
+    """Tolkar en textrad som börjar med en FBET-kod. Returnerar artikeldata eller None.
+    
+    Orden efter FBET-koden gås igenom som en tillståndsmaskin: först FBEN-delen
+    (versaler, mått, förkortningar) och från första ord i gemener eller
+    blandade versaler resten av raden som artikel.
+    """
+    fbet_match = TEXT_FBET_AT_START.match(line)
+    if not fbet_match:
+        return None
+    
+    fbet = fbet_match.group()
+    words = line[fbet_match.end():].split()
+    fben_words = []
+    artikel_words = []
+    
+    for i, word in enumerate(words):
+        state = _classify_fben_word(word)
+        if state == FBEN_WORD:
+            fben_words.append(word)
+        elif state == SKIP_WORD:
+            artikel_words.append(word)
+        else:
+            artikel_words.append('Black Diamond' if state == BLACK_DIAMOND else word)
+            # Resten av raden är artikel
+            artikel_words.extend(words[i + 1:])
+            break
+    
+    fben = ' '.join(fben_words) or None
+    artikel = ' '.join(artikel_words) or None
+    
+    if artikel:
+        # Ta bort "Bruksanvisning" från slutet
+        artikel = TEXT_BRUKSANVISNING_SUFFIX.sub('', artikel).strip()
+        # Om artikel-texten bara består av siffror och mått, sätt den till None
+        if not artikel or TEXT_NUMERIC_ONLY.fullmatch(artikel):
+            artikel = None
+    
+    # Validera FBEN - det ska vara rimligt som produkttyp
+    if fben and (len(fben) > 30 or not TEXT_HAS_UPPER.search(fben)):
+        fben = None
+    
+    # Skapa artikel om vi har FBET och minst FBEN
+    if not fben:
+        return None
+    
+    # Leta efter länkar (URL:er)
+    link_match = TEXT_LINK.search(line) if 'http' in line else None
+    
+    return {
+        'fbet': fbet,
+        'fben': fben,
+        'artikel': artikel,
+        'link': link_match.group() if link_match else None
+    }
+
 def extract_articles_from_text(text):
     """Försöker extrahera artikeldata från vanlig text"""
     articles = []
     
     try:
-        lines = text.split('\n')
-        print(f"Textbaserad extraktion: analyserar {len(lines)} rader")
-        
-        for line_num, line in enumerate(lines, 1):
+        for line in text.split('\n'):
+            # Bara rader som börjar med en FBET-kod (F, G eller M) kan vara artiklar
             line = line.strip()
-            if not line:
+            if line[:1] not in TEXT_FBET_FIRST_CHARS:
                 continue
-                
-            # Leta efter FBET-kod i början av raden
-            fbet_match = re.search(r'^([FGM]\d{4}-\d{6})', line)
             
-            if fbet_match:
-                fbet = fbet_match.group(1)
-                
-                # Ta bort FBET-koden från raden för att hitta resten
-                remaining_text = line[len(fbet):].strip()
-                
-                # Förbättrad FBEN-extraktion - samla alla stora bokstäver/ord i följd
-                words = remaining_text.split()
-                fben_words = []
-                artikel_words = []
-                in_fben = True  # Vi börjar i FBEN-sektionen
-                
-                for word in words:
-                    # Rensa bort specialtecken för analys men behåll originalet
-                    word_clean = re.sub(r'[^\w\såäöüÅÄÖÜ\-\./]', '', word)
-                    
-                    if in_fben and word_clean:
-                        # Specialhantering för "BD" - ska alltid till artikel som "Black Diamond"
-                        if word_clean == 'BD':
-                            in_fben = False
-                            artikel_words.append('Black Diamond')
-                        # Kolla om ordet tillhör FBEN (stora bokstäver, mått, förkortningar)
-                        elif (word_clean.isupper() or 
-                            re.match(r'^[A-ZÅÄÖÜ0-9\-\./,]+$', word_clean) or
-                            word_clean in ['PPE', 'STD', 'SV', 'AL', 'ST', 'DL', 'TL', 'TLS', 'SLS', 'CM', 'MM', 'M', 'L', 'KG', 'DB', 'NR']):
-                            fben_words.append(word)
-                        else:
-                            # När vi hittar mixed case eller lowercase, börja artikeldelen
-                            in_fben = False
-                            artikel_words.append(word)
-                    else:
-                        # Vi är redan i artikeldelen
-                        artikel_words.append(word)
-                
-                # Sätt ihop FBEN och artikel
-                fben = ' '.join(fben_words).strip() if fben_words else None
-                artikel = ' '.join(artikel_words).strip() if artikel_words else None
-                
-                # Rensa artikel-texten
-                if artikel:
-                    # Ta bort "Bruksanvisning" från slutet
-                    artikel = re.sub(r'\s*Bruksanvisning\s*$', '', artikel, flags=re.IGNORECASE)
-                    artikel = artikel.strip()
-                    
-                    # Om artikel-texten bara består av siffror och mått, sätt den till None
-                    # Men behåll viktiga produktnamn som "Black Diamond"
-                    if (not artikel or 
-                        (re.match(r'^[\d\s\-\./,]+$', artikel) and 
-                         artikel not in ['Black Diamond'])):
-                        artikel = None
-                
-                # Validera FBEN - det ska vara rimligt som produkttyp
-                if fben and (len(fben) > 30 or not re.search(r'[A-ZÅÄÖÜ]', fben)):
-                    fben = None
-                
-                # Leta efter länkar (URL:er)
-                link_match = re.search(r'(https?://[^\s]+)', line)
-                link = link_match.group(1) if link_match else None
-                
-                # Skapa artikel om vi har FBET och minst FBEN
-                if fbet and fben:
-                    articles.append({
-                        'fbet': fbet,
-                        'fben': fben,
-                        'artikel': artikel,
-                        'link': link
-                    })
-                    
-                    print(f"  Rad {line_num}: {line}")
-                    print(f"    FBET: '{fbet}', FBEN: '{fben}', Artikel: '{artikel}', Länk: '{link}'")
+            article = parse_article_line(line)
+            if article:
+                articles.append(article)
     
     except Exception as e:
-        print(f"Fel vid textbaserad extraktion: {e}")
+        logger.warning("Fel vid textbaserad extraktion: %s", e)
     
-    print(f"Textbaserad extraktion: hittade {len(articles)} artiklar")
+    logger.debug("Textbaserad extraktion: hittade %d artiklar", len(articles))
     return articles
 
-def extract_all_articles(pdf_path, document_id):
-    """Extraherar alla artiklar från PDF:en och sparar i databasen"""
+def iter_document_articles(pdf_path, workers=1, prefilter=True, cache=None, timer=None, start_page=0,
+                           content_hash=None):
+    """Extraherar artiklarna ur PDF:en sida för sida utan att röra databasen
     
-    # Hitta relevanta sidor
-    article_pages = find_chapter_9_pages(pdf_path)
+    Med workers > 1 fördelas sidorna över flera processer. Med prefilter
+    sållas irrelevanta sidor bort med PyPDF2 innan pdfplumber tar vid.
+    Med en PageCache återanvänds sidlayout från tidigare körningar. Cachen nycklas
+    på filens content_hash, som bara beräknas här om anroparen inte redan har den.
+    Med start_page hoppas sidorna före den över (när en avbruten extraktion
+    fortsätter); kolumnmodellen lärs då in från närmast föregående tabellhuvud.
+    Ger (sidnummer, artiklar) för varje sida med artikeldata, i sidordning.
+    """
+    timer = timer if timer is not None else StageTimer()
+    pages_found = 0
     
-    if not article_pages:
-        print("❌ Inga sidor med artikeldata hittades")
-        return []
+    doc_hash = None
+    if cache is not None:
+        doc_hash = content_hash
+        if doc_hash is None:
+            with timer.stage('hash'):
+                doc_hash = compute_content_hash(pdf_path)
     
-    all_articles = []
+    page_nums = header_pages = None
+    # Tabellhuvudena används också när sidorna delas upp på flera processer
+    if prefilter or start_page or workers > 1:
+        try:
+            with timer.stage('prefilter'):
+                candidates, total_pages, header_pages = prefilter_candidate_pages(pdf_path)
+            page_nums = candidates if prefilter else list(range(total_pages))
+        except Exception as e:
+            logger.warning("Förfiltreringen misslyckades, analyserar alla sidor: %s", e)
     
-    with pdfplumber.open(pdf_path) as pdf:
-        for page_num in article_pages:
-            print(f"\n📄 Extraherar från sida {page_num + 1}...")
-            page = pdf.pages[page_num]
-            
-            page_articles = extract_articles_from_page(page)
+    model_page = None
+    if start_page:
+        if page_nums is None:
+            with pdfplumber.open(pdf_path) as pdf:
+                page_nums = list(range(len(pdf.pages)))
+        page_nums = [page_num for page_num in page_nums if page_num >= start_page]
+        if header_pages:
+            preceding = bisect.bisect_left(header_pages, start_page)
+            model_page = header_pages[preceding - 1] if preceding else None
+        logger.info("⏯️  Fortsätter från sida %d", start_page + 1)
+    
+    # Klassificera och extrahera varje sida i ett enda pass över dokumentet. Intervall
+    # som börjar mitt i en tabell letar upp tabellhuvudet själva om förfiltreringen
+    # inte hittade det.
+    if workers > 1:
+        article_pages = iter_article_pages_parallel(pdf_path, workers, header_pages or [], page_nums, cache,
+                                                    doc_hash, timer)
+    else:
+        article_pages = iter_article_pages(pdf_path, page_nums, cache, doc_hash, model_page, timer,
+                                           seek_model=bool(start_page))
+    
+    for page_num, page_articles in article_pages:
+        pages_found += 1
+        
+        if page_articles:
+            logger.debug("   Hittade %d artiklar", len(page_articles))
             
-            if page_articles:
-                print(f"   Hittade {len(page_articles)} artiklar")
-                all_articles.extend(page_articles)
-                
-                # Visa alla artiklar på denna sida för debugging
+            # Visa alla artiklar på denna sida för debugging
+            if logger.isEnabledFor(logging.DEBUG):
                 for i, article in enumerate(page_articles):
                     if article:  # Kontrollera att article inte är None
-                        print(f"   {i+1}: FBET={article.get('fbet', 'N/A')}, FBEN={article.get('fben', 'N/A')}")
+                        logger.debug("   %d: FBET=%s, FBEN=%s", i + 1, article.get('fbet', 'N/A'), article.get('fben', 'N/A'))
                         if len(page_articles) <= 10:  # Om få artiklar, visa mer detalj
                             artikel_val = article.get('artikel', 'N/A') or 'N/A'
-                            print(f"      Artikel: {str(artikel_val)[:100]}...")
-            else:
-                print(f"   Inga artiklar hittades på denna sida")
+                            logger.debug("      Artikel: %.100s...", artikel_val)
+        else:
+            logger.debug("   Inga artiklar hittades på denna sida")
+        
+        yield page_num, page_articles
     
-    # Spara i databas
-    if all_articles:
-        session = get_session()
-        try:
-            # Ta bort gamla artiklar för detta dokument först
-            session.query(Article).filter_by(document_id=document_id).delete()
-            
-            # Lägg till nya artiklar
-            for article_data in all_articles:
-                article = Article(
-                    document_id=document_id,
-                    fbet=article_data.get('fbet'),
-                    fben=article_data.get('fben'),
-                    artikel=article_data.get('artikel'),
-                    link=article_data.get('link')
-                )
-                session.add(article)
+    if not pages_found:
+        logger.warning("❌ Inga sidor med artikeldata hittades i %s", pdf_path.name)
+    
+    if cache is not None:
+        with timer.stage('cache'):
+            cache.trim()
+
+def extract_document_articles(pdf_path, workers=1, prefilter=True, cache=None, timer=None, content_hash=None):
+    """Extraherar alla artiklar från PDF:en utan att röra databasen (se iter_document_articles)"""
+    all_articles = []
+    for _, page_articles in iter_document_articles(pdf_path, workers, prefilter, cache, timer,
+                                                   content_hash=content_hash):
+        all_articles.extend(page_articles)
+    return all_articles
+
+def tally_articles(articles, tally=None):
+    """Räknar artiklar och hur många som har FBET-kod, FBEN-kod och länk"""
+    tally = tally if tally is not None else {'articles': 0, 'with_fbet': 0, 'with_fben': 0, 'with_links': 0}
+    for article in articles:
+        tally['articles'] += 1
+        tally['with_fbet'] += bool(article.get('fbet'))
+        tally['with_fben'] += bool(article.get('fben'))
+        tally['with_links'] += bool(article.get('link'))
+    return tally
+
+def remove_uploaded_image(image_url):
+    """Tar bort en uppladdad bildfil som inte längre hör till någon artikel"""
+    if not image_url or not image_url.startswith(UPLOAD_URL_PREFIX):
+        return
+    
+    try:
+        full_path = os.path.join(os.getcwd(), image_url[1:])  # Ta bort inledande '/'
+        if os.path.exists(full_path):
+            os.remove(full_path)
+    except Exception as e:
+        logger.warning("Kunde inte ta bort filen %s: %s", image_url, e)
+
+class ArticleDeltaWriter:
+    """Jämför en ny extraktion med dokumentets lagrade artiklar och skriver skillnaden i omgångar
+    
+    De nya raderna matchas mot de befintliga (nyckel FBET/FBEN inom dokumentet)
+    och bara det som faktiskt har ändrats läggs till, uppdateras eller tas bort.
+    Oförändrade artiklar behåller därmed sitt ID och sin bild.
+    
+    Artiklarna lämnas med add() i dokumentordning och skrivs var chunk_size:e
+    ändring, så hela extraktionen behöver aldrig finnas i minnet. Av de befintliga
+    raderna hålls bara nyckel, ID och jämförda fält. Allt sker i anroparens
+    transaktion; anroparen committar efter checkpoint() och finish().
+    
+    state() och checkpoint() sparar jämförelsens läge i dokumentet, så att en
+    avbruten extraktion kan fortsätta med en ny skrivare (state=...) i stället
+    för att börja om. Rader som redan matchats eller lagts till räknas då inte
+    som befintliga en gång till.
+    """
+    
+    def __init__(self, session, document_id, chunk_size=BULK_CHUNK_SIZE, timer=None, state=None):
+        self.session = session
+        self.document_id = document_id
+        self.chunk_size = chunk_size
+        self.timer = timer if timer is not None else StageTimer()
+        state = state or {}
+        self.counts = dict(state.get('counts') or {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0})
+        self.received = state.get('received', 0)
+        self._matched_ids = list(state.get('matched_ids', []))
+        self._new_articles = []
+        self._changes = []
+        
+        # Befintliga artiklar per nyckel, äldst först så att dubbletter matchas i ordning
+        self._existing = defaultdict(deque)
+        with self.timer.stage('db_write'):
+            # Rader med högre ID än så har lagts till av den här extraktionen
+            self._first_new_id = state.get('first_new_id') or (session.query(func.max(Article.id)).scalar() or 0) + 1
+            claimed = set(self._matched_ids)
             
-            session.commit()
-            print(f"\n✅ Sparade {len(all_articles)} artiklar i databasen")
+            existing_rows = session.query(
+                Article.id, Article.fbet, Article.fben, Article.artikel, Article.link, Article.image_url
+            ).filter_by(document_id=document_id).order_by(Article.id)
+            for row in existing_rows:
+                if row.id in claimed or row.id >= self._first_new_id:
+                    continue
+                self._existing[(row.fbet, row.fben)].append(row)
+    
+    def add(self, articles):
+        """Jämför artiklar mot de befintliga och skriver när en hel omgång har samlats"""
+        for article_data in articles:
+            self.received += 1
+            key = (article_data.get('fbet'), article_data.get('fben'))
+            matches = self._existing.get(key)
             
-        except Exception as e:
-            session.rollback()
-            print(f"❌ Fel vid sparande i databas: {e}")
-        finally:
-            session.close()
+            if matches:
+                row = matches.popleft()
+                self._matched_ids.append(row.id)
+                artikel = article_data.get('artikel')
+                link = article_data.get('link')
+                if row.artikel != artikel or row.link != link:
+                    self._changes.append({'id': row.id, 'artikel': artikel, 'link': link})
+                else:
+                    self.counts['unchanged'] += 1
+            else:
+                self._new_articles.append(article_data)
+        
+        if len(self._new_articles) + len(self._changes) >= self.chunk_size:
+            self.flush()
     
-    return all_articles
+    def flush(self):
+        """Skriver insamlade nya och ändrade artiklar"""
+        with self.timer.stage('db_write'):
+            self.counts['inserted'] += bulk_insert_articles(self.session, self.document_id,
+                                                            self._new_articles, self.chunk_size)
+            self.counts['updated'] += bulk_update_articles(self.session, self._changes, self.chunk_size)
+        self._new_articles = []
+        self._changes = []
+    
+    def state(self):
+        """Jämförelsens läge, som JSON-bara data (se checkpoint)"""
+        return {
+            'counts': self.counts,
+            'received': self.received,
+            'matched_ids': self._matched_ids,
+            'first_new_id': self._first_new_id
+        }
+    
+    def checkpoint(self, page_num, extra=None):
+        """Skriver det som samlats och sparar läget efter sidan page_num i dokumentet"""
+        self.flush()
+        with self.timer.stage('db_write'):
+            self.session.execute(
+                update(PDFDocument).where(PDFDocument.id == self.document_id).values(
+                    checkpoint_page=page_num,
+                    checkpoint_state=json.dumps({**self.state(), **(extra or {})})
+                )
+            )
+    
+    def finish(self):
+        """Skriver det som återstår och tar bort artiklar som inte längre finns i dokumentet
+        
+        Tar också bort dokumentets checkpoint, eftersom extraktionen nu är komplett.
+        Returnerar (antal tillagda/uppdaterade/borttagna/oförändrade, bildadresser
+        som inte längre hör till någon artikel och kan tas bort efter commit).
+        """
+        self.flush()
+        
+        removed = []
+        # En tom extraktion ska inte tömma ett dokument som tidigare hade artiklar
+        if self.received:
+            # Det som inte matchades finns inte längre i dokumentet
+            removed = [row for matches in self._existing.values() for row in matches]
+            self._existing.clear()
+        
+        with self.timer.stage('db_write'):
+            self.counts['deleted'] += bulk_delete_articles(self.session, [row.id for row in removed],
+                                                           self.chunk_size)
+            self.session.execute(
+                update(PDFDocument).where(PDFDocument.id == self.document_id).values(
+                    checkpoint_page=None, checkpoint_state=None
+                )
+            )
+        return self.counts, [row.image_url for row in removed if row.image_url]
+
+def log_saved_counts(counts):
+    logger.info("✅ Sparade artiklar i databasen: %d nya, %d uppdaterade, %d borttagna, %d oförändrade",
+                counts['inserted'], counts['updated'], counts['deleted'], counts['unchanged'])
 
-def index_pdf_document(pdf_path):
-    """Indexerar ett PDF-dokument och sparar grundläggande information i databasen"""
+def save_articles(document_id, all_articles):
+    """Sparar extraherade artiklar för ett dokument i databasen (se ArticleDeltaWriter)
+    
+    Returnerar antal tillagda/uppdaterade/borttagna/oförändrade, eller None vid fel.
+    """
     session = get_session()
+    try:
+        writer = ArticleDeltaWriter(session, document_id)
+        writer.add(all_articles)
+        counts, orphaned_images = writer.finish()
+        session.commit()
+        
+        for image_url in orphaned_images:
+            remove_uploaded_image(image_url)
+        
+        log_saved_counts(counts)
+        return counts
+        
+    except Exception as e:
+        session.rollback()
+        logger.error("❌ Fel vid sparande i databas: %s", e)
+        return None
+    finally:
+        session.close()
+
+def read_pdf_metadata(pdf_path):
+    """Läser titel, författare, sidantal och förstasidans text ur en PDF"""
+    filename = pdf_path.name
+    
+    with pdfplumber.open(pdf_path) as pdf:
+        # Hämta metadata
+        metadata = pdf.metadata or {}
+        title = metadata.get('Title', '') or filename
+        author = metadata.get('Author', '') or metadata.get('Creator', '')
+        
+        # Extrahera text från första sidan för innehållsindexering
+        content = ""
+        try:
+            if len(pdf.pages) > 0:
+                first_page_text = pdf.pages[0].extract_text() or ""
+                content = first_page_text[:5000]  # Begränsa till första 5000 tecken
+        except Exception as e:
+            logger.warning("Kunde inte extrahera text från första sidan: %s", e)
+        
+        return {
+            'title': title,
+            'author': author,
+            'num_pages': len(pdf.pages),
+            'content': content
+        }
+
+def compute_content_hash(pdf_path):
+    """Beräknar SHA-256 av filens innehåll"""
+    digest = hashlib.sha256()
+    with open(pdf_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def check_document_changes(pdf_path):
+    """Avgör om ett dokument behöver extraheras på nytt
     
+    Storlek och ändringstid jämförs först, så oförändrade filer hashas inte ens.
+    Skiljer de sig hashas filen och jämförs med lagrad innehållshash. Ett omdöpt
+    men identiskt dokument känns igen på hashen och får bara nytt filnamn.
+    Ett dokument med en checkpoint kvar från en avbruten extraktion är aldrig klart.
+    Returnerar (status, fingeravtryck) där status är 'unchanged', 'changed',
+    'interrupted' eller 'new'.
+    """
+    stat = pdf_path.stat()
+    fingerprint = {'file_size': stat.st_size, 'file_mtime': stat.st_mtime, 'content_hash': None}
+    filename = pdf_path.name
+    
+    session = get_session()
     try:
-        # Kontrollera om dokumentet redan finns
-        filename = pdf_path.name
         existing_doc = session.query(PDFDocument).filter_by(filename=filename).first()
         
+        if existing_doc and existing_doc.checkpoint_page is not None:
+            fingerprint['content_hash'] = compute_content_hash(pdf_path)
+            return 'interrupted', fingerprint
+        
+        if (existing_doc and existing_doc.content_hash
+                and existing_doc.file_size == fingerprint['file_size']
+                and existing_doc.file_mtime == fingerprint['file_mtime']):
+            return 'unchanged', fingerprint
+        
+        fingerprint['content_hash'] = compute_content_hash(pdf_path)
+        
         if existing_doc:
-            print(f"📋 Dokumentet {filename} finns redan indexerat (ID: {existing_doc.id})")
-            return existing_doc
+            if existing_doc.content_hash == fingerprint['content_hash']:
+                # Bara tidsstämpeln har ändrats (t.ex. kopierad på nytt)
+                existing_doc.file_size = fingerprint['file_size']
+                existing_doc.file_mtime = fingerprint['file_mtime']
+                session.commit()
+                return 'unchanged', fingerprint
+            return 'changed', fingerprint
         
-        print(f"📝 Indexerar nytt dokument: {filename}")
+        # Samma innehåll under ett annat namn vars fil inte längre finns = omdöpt fil
+        for renamed_doc in session.query(PDFDocument).filter_by(content_hash=fingerprint['content_hash']):
+            if renamed_doc.file_path and os.path.exists(renamed_doc.file_path):
+                continue
+            logger.info("🔁 %s har döpts om till %s (ID: %d)", renamed_doc.filename, filename, renamed_doc.id)
+            renamed_doc.filename = filename
+            renamed_doc.file_path = str(pdf_path.absolute())
+            renamed_doc.file_size = fingerprint['file_size']
+            renamed_doc.file_mtime = fingerprint['file_mtime']
+            session.commit()
+            return 'unchanged', fingerprint
         
-        # Extrahera metadata från PDF
-        with pdfplumber.open(pdf_path) as pdf:
-            # Hämta metadata
-            metadata = pdf.metadata or {}
-            title = metadata.get('Title', '') or filename
-            author = metadata.get('Author', '') or metadata.get('Creator', '')
-            
-            # Extrahera text från första sidan för innehållsindexering
-            content = ""
-            try:
-                if len(pdf.pages) > 0:
-                    first_page_text = pdf.pages[0].extract_text() or ""
-                    content = first_page_text[:5000]  # Begränsa till första 5000 tecken
-            except Exception as e:
-                print(f"Varning: Kunde inte extrahera text från första sidan: {e}")
-            
-            # Skapa nytt dokument i databasen
-            document = PDFDocument(
-                filename=filename,
-                title=title,
-                author=author,
-                num_pages=len(pdf.pages),
-                content=content,
-                file_path=str(pdf_path.absolute())
-            )
-            
-            session.add(document)
+        return 'new', fingerprint
+        
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def _claim_owner():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+def _claim_is_stale(owner, claimed_at, now):
+    """Sant om anspråket har löpt ut eller processen bakom det inte längre körs
+    
+    Ett anspråk som inte har förnyats på CLAIM_LEASE_SECONDS sekunder är övergivet
+    oavsett värd och process, t.ex. från en annan värd eller en omstartad container
+    där samma PID används igen. En process på samma värd som inte finns kvar
+    behöver inte vänta ut tiden.
+    """
+    if claimed_at is None or (now - claimed_at).total_seconds() > CLAIM_LEASE_SECONDS:
+        return True
+    host, pid, _ = owner.rsplit(':', 2)
+    if host != socket.gethostname() or int(pid) == os.getpid():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass  # Processen finns men tillhör en annan användare
+    return False
+
+def claim_document(pdf_path):
+    """Gör anspråk på att extrahera dokumentet innan något skrivs
+    
+    Uppladdningsjobben i webbappen och --watch extraherar filer i samma mapp, och
+    två samtidiga extraktioner av samma dokument skulle spara artiklarna dubbelt.
+    Anspråket gäller i CLAIM_LEASE_SECONDS och förnyas med renew_claim(); ett
+    anspråk som har löpt ut eller kommer från en process som inte längre körs
+    tas över. Returnerar ägaren som ska lämnas till release_document(), eller
+    None om dokumentet redan extraheras av någon annan.
+    """
+    owner = _claim_owner()
+    session = get_session()
+    try:
+        current = session.execute(
+            select(ExtractionClaim.owner, ExtractionClaim.claimed_at)
+            .where(ExtractionClaim.filename == pdf_path.name)
+        ).one_or_none()
+        session.commit()
+        if current is not None:
+            if not _claim_is_stale(current.owner, current.claimed_at, datetime.utcnow()):
+                return None
+            logger.info("🔓 Tar över det övergivna anspråket på %s från %s", pdf_path.name, current.owner)
+            session.execute(delete(ExtractionClaim).where(ExtractionClaim.filename == pdf_path.name,
+                                                          ExtractionClaim.owner == current.owner))
             session.commit()
-            
-            print(f"✅ Dokument indexerat med ID: {document.id}")
-            print(f"   Titel: {title}")
-            print(f"   Författare: {author}")
-            print(f"   Antal sidor: {len(pdf.pages)}")
-            
+        
+        # Bara en av flera samtidiga anspråk får in sin rad
+        inserted = session.execute(
+            sqlite_insert(ExtractionClaim)
+            .values(filename=pdf_path.name, owner=owner, claimed_at=datetime.utcnow())
+            .on_conflict_do_nothing()
+        )
+        session.commit()
+        return owner if inserted.rowcount == 1 else None
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def renew_claim(session, pdf_path, owner):
+    """Förnyar anspråket från claim_document() i anroparens transaktion"""
+    session.execute(update(ExtractionClaim).where(ExtractionClaim.filename == pdf_path.name,
+                                                  ExtractionClaim.owner == owner)
+                    .values(claimed_at=datetime.utcnow()))
+
+def renew_claims(claims):
+    """Förnyar anspråken på dokument som extraheras eller väntar på sin tur (claims: sökväg -> ägare)"""
+    session = get_session()
+    try:
+        # Kopian gör att anroparen kan lägga till och släppa anspråk under tiden
+        for pdf_path, owner in dict(claims).items():
+            renew_claim(session, pdf_path, owner)
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        logger.error("❌ Kunde inte förnya anspråken: %s", e)
+    finally:
+        session.close()
+
+@contextmanager
+def renewing_claims(claims, interval=None):
+    """Förnyar anspråken i claims från en bakgrundstråd så länge blocket körs
+    
+    Ett dokument kan ta längre tid att extrahera än CLAIM_LEASE_SECONDS, och
+    dokument som väntar på sin tur ska inte heller se övergivna ut. claims får
+    ändras medan blocket körs; tråden förnyar de anspråk som finns vid varje varv.
+    """
+    interval = CLAIM_RENEW_SECONDS if interval is None else interval
+    stop = threading.Event()
+    
+    def heartbeat():
+        while not stop.wait(interval):
+            renew_claims(claims)
+    
+    thread = threading.Thread(target=heartbeat, name='claim-heartbeat', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+def release_document(pdf_path, owner):
+    """Släpper anspråket från claim_document() när extraktionen är klar eller har misslyckats"""
+    session = get_session()
+    try:
+        session.execute(delete(ExtractionClaim).where(ExtractionClaim.filename == pdf_path.name,
+                                                      ExtractionClaim.owner == owner))
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        logger.error("❌ Kunde inte släppa anspråket på %s: %s", pdf_path.name, e)
+    finally:
+        session.close()
+
+def record_fingerprint(document_id, fingerprint):
+    """Sparar filens fingeravtryck när dokumentets artiklar har skrivits klart"""
+    session = get_session()
+    try:
+        document = session.get(PDFDocument, document_id)
+        document.file_size = fingerprint['file_size']
+        document.file_mtime = fingerprint['file_mtime']
+        document.content_hash = fingerprint['content_hash'] or compute_content_hash(Path(document.file_path))
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        logger.error("❌ Kunde inte spara fingeravtryck för dokument %d: %s", document_id, e)
+    finally:
+        session.close()
+
+def index_pdf_document(pdf_path, metadata=None):
+    """Indexerar ett PDF-dokument och sparar grundläggande information i databasen
+    
+    metadata kan skickas med om den redan har lästs (t.ex. i en arbetsprocess),
+    annars läses den från filen. Finns dokumentet redan uppdateras dess metadata.
+    """
+    session = get_session()
+    
+    try:
+        # Kontrollera om dokumentet redan finns
+        filename = pdf_path.name
+        document = session.query(PDFDocument).filter_by(filename=filename).first()
+        
+        if document and metadata is None:
+            logger.info("📋 Dokumentet %s finns redan indexerat (ID: %d)", filename, document.id)
             return document
+        
+        # Extrahera metadata från PDF
+        if metadata is None:
+            metadata = read_pdf_metadata(pdf_path)
+        
+        if document:
+            logger.info("📝 Uppdaterar ändrat dokument: %s (ID: %d)", filename, document.id)
+        else:
+            logger.info("📝 Indexerar nytt dokument: %s", filename)
+            document = PDFDocument(filename=filename)
+            session.add(document)
+        
+        document.title = metadata['title']
+        document.author = metadata['author']
+        document.num_pages = metadata['num_pages']
+        document.content = metadata['content']
+        document.file_path = str(pdf_path.absolute())
+        session.commit()
+        
+        logger.info("✅ Dokument indexerat med ID: %d", document.id)
+        logger.debug("   Titel: %s", metadata['title'])
+        logger.debug("   Författare: %s", metadata['author'])
+        logger.debug("   Antal sidor: %s", metadata['num_pages'])
+        
+        return document
             
     except Exception as e:
         session.rollback()
-        print(f"❌ Fel vid indexering av dokument: {e}")
+        logger.error("❌ Fel vid indexering av dokument: %s", e)
         return None
     finally:
         session.close()
 
-def main():
-    """Huvudfunktion"""
-    # Initiera databas (skapa nya tabeller)
-    init_db()
+def ingest_document(pdf_path, workers=1, prefilter=True, cache=None, content_hash=None):
+    """Läser metadata och extraherar artiklar ur ett dokument (körs i arbetsprocesser)
     
-    # Hitta PDF-fil
-    pdf_dir = Path("./pdfs")
-    pdf_files = list(pdf_dir.glob("*.pdf"))
+    Databasen rörs inte här; resultatet skrivs av huvudprocessen så att bara
+    en process i taget skriver till SQLite. content_hash är filens hash om den
+    redan har beräknats (se check_document_changes).
+    """
+    started = time.perf_counter()
+    timer = StageTimer()
+    with timer.stage('metadata'):
+        metadata = read_pdf_metadata(pdf_path)
+    articles = extract_document_articles(pdf_path, workers, prefilter, cache, timer, content_hash)
     
-    if not pdf_files:
-        print("❌ Ingen PDF-fil hittades i pdfs-mappen")
-        return
+    return {
+        'path': pdf_path,
+        'metadata': metadata,
+        'articles': articles,
+        'summary': tally_articles(articles),
+        'extract_seconds': time.perf_counter() - started,
+        'stages': dict(timer.seconds)
+    }
+
+def load_checkpoint(session, document_id, content_hash):
+    """Hämtar checkpointen från en avbruten extraktion av dokumentet
+    
+    Den används bara om den gäller samma filinnehåll och extraktorversion.
+    Returnerar (sista färdiga sidan, läge att fortsätta från) eller (None, None).
+    """
+    document = session.get(PDFDocument, document_id)
+    if document.checkpoint_page is None:
+        return None, None
+    
+    try:
+        state = json.loads(document.checkpoint_state)
+    except (TypeError, ValueError):
+        state = {}
+    if state.get('content_hash') != content_hash or state.get('extractor_version') != EXTRACTOR_VERSION:
+        logger.info("🔄 Checkpointen för %s gäller ett annat innehåll, börjar om från början", document.filename)
+        return None, None
+    return document.checkpoint_page, state
+
+def stream_document(pdf_path, fingerprint=None, workers=1, prefilter=True, cache=None, timer=None,
+                    resume=False, checkpoint_pages=CHECKPOINT_PAGES, progress=None, owner=None):
+    """Extraherar och skriver ett dokument sida för sida i huvudprocessen
+    
+    Artiklarna skrivs i omgångar medan sidorna extraheras (se ArticleDeltaWriter),
+    så minnesåtgången beror inte på dokumentets storlek. Var checkpoint_pages:e
+    sida med artikeldata committas det som skrivits tillsammans med en checkpoint
+    i dokumentet. Med resume fortsätter en avbruten extraktion därifrån; annars
+    görs hela dokumentet om, vilket ger samma resultat eftersom skrivningen
+    bara ändrar det som skiljer. Fingeravtrycket sparas först när allt är klart.
+    progress anropas med (sidor klara, antal sidor, artiklar hittills) när
+    extraktionen börjar och efter varje sida med artikeldata. owner är anspråket
+    från claim_document(), som förnyas vid varje checkpoint.
+    Returnerar (resultat utan artikellista, dokument, antal ändrade rader);
+    dokument och antal är None vid fel.
+    """
+    started = time.perf_counter()
+    timer = timer if timer is not None else StageTimer()
+    with timer.stage('metadata'):
+        metadata = read_pdf_metadata(pdf_path)
+    result = {'path': pdf_path, 'metadata': metadata, 'articles': None, 'summary': tally_articles([])}
     
-    # Hitta motsvarande dokument i databasen
+    document = index_pdf_document(pdf_path, metadata=metadata)
+    if not document:
+        logger.error("❌ Kunde inte indexera dokumentet %s", pdf_path.name)
+        return result, None, None
+    
+    fingerprint = fingerprint or {'file_size': None, 'file_mtime': None, 'content_hash': None}
+    if not fingerprint['content_hash']:
+        with timer.stage('hash'):
+            fingerprint = {**fingerprint, 'content_hash': compute_content_hash(pdf_path)}
+    checkpoint_info = {'content_hash': fingerprint['content_hash'], 'extractor_version': EXTRACTOR_VERSION}
+    
+    logger.debug("📋 Sparar artiklar för dokument ID: %d", document.id)
     session = get_session()
+    try:
+        last_page = state = None
+        if resume:
+            last_page, state = load_checkpoint(session, document.id, fingerprint['content_hash'])
+        if state:
+            result['summary'] = state['summary']
+        start_page = last_page + 1 if last_page is not None else 0
+        if progress:
+            progress(start_page, metadata['num_pages'], result['summary']['articles'])
+        
+        writer = ArticleDeltaWriter(session, document.id, timer=timer, state=state)
+        pages_since_checkpoint = 0
+        for page_num, page_articles in iter_document_articles(pdf_path, workers, prefilter, cache, timer,
+                                                              start_page, fingerprint['content_hash']):
+            tally_articles(page_articles, result['summary'])
+            writer.add(page_articles)
+            if progress:
+                progress(page_num + 1, metadata['num_pages'], result['summary']['articles'])
+            
+            pages_since_checkpoint += 1
+            if pages_since_checkpoint >= checkpoint_pages:
+                writer.checkpoint(page_num, {**checkpoint_info, 'summary': result['summary']})
+                with timer.stage('db_write'):
+                    if owner is not None:
+                        renew_claim(session, pdf_path, owner)
+                    session.commit()
+                logger.debug("💾 Checkpoint efter sida %d", page_num + 1)
+                pages_since_checkpoint = 0
+        
+        counts, orphaned_images = writer.finish()
+        with timer.stage('db_write'):
+            session.commit()
+    except Exception as e:
+        session.rollback()
+        logger.error("❌ Fel vid strömmande extraktion av %s: %s", pdf_path.name, e)
+        return result, None, None
+    finally:
+        session.close()
+    
+    for image_url in orphaned_images:
+        remove_uploaded_image(image_url)
+    log_saved_counts(counts)
+    record_fingerprint(document.id, fingerprint)
     
+    result['extract_seconds'] = time.perf_counter() - started - timer.seconds['db_write']
+    return result, document, counts
+
+def iter_ingested_documents(pdf_files, jobs=1, workers=1, prefilter=True, cache=None, content_hashes=None):
+    """Extraherar dokumenten, flera åt gången om jobs > 1
+    
+    De största filerna startas först så att en stor manual inte blir sist kvar.
+    content_hashes är redan beräknade innehållshashar per fil.
+    Ger (pdf_path, resultat, fel) i den ordning dokumenten blir klara.
+    """
+    pdf_files = sorted(pdf_files, key=lambda f: f.stat().st_size, reverse=True)
+    content_hashes = content_hashes or {}
+    
+    if jobs <= 1:
+        for pdf_file in pdf_files:
+            try:
+                yield pdf_file, ingest_document(pdf_file, workers, prefilter, cache,
+                                                content_hashes.get(pdf_file)), None
+            except Exception as e:
+                yield pdf_file, None, e
+        return
+    
+    with ProcessPoolExecutor(max_workers=jobs, initializer=configure_logging,
+                             initargs=(logger.getEffectiveLevel(),)) as executor:
+        futures = {
+            executor.submit(ingest_document, pdf_file, 1, prefilter, cache, content_hashes.get(pdf_file)): pdf_file
+            for pdf_file in pdf_files
+        }
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
+
+def write_ingested_document(result, fingerprint=None):
+    """Skriver ett extraherat dokument och dess artiklar till databasen
+    
+    Fingeravtrycket sparas sist, så att ett avbrutet skrivande gör att
+    dokumentet extraheras igen vid nästa körning.
+    Returnerar (dokument, antal ändrade rader) eller (None, None) vid fel.
+    """
+    pdf_file = result['path']
+    
+    # Indexera dokumentet (skapar nytt eller hämtar befintligt)
+    document = index_pdf_document(pdf_file, metadata=result['metadata'])
+    
+    if not document:
+        logger.error("❌ Kunde inte indexera dokumentet %s", pdf_file.name)
+        return None, None
+    
+    logger.debug("📋 Sparar artiklar för dokument ID: %d", document.id)
+    counts = save_articles(document.id, result['articles'])
+    if counts:
+        record_fingerprint(document.id, fingerprint or {
+            'file_size': None, 'file_mtime': None, 'content_hash': None
+        })
+    return document, counts
+
+def log_document_banner(pdf_file):
+    logger.info("=" * 60)
+    logger.info("Bearbetar: %s", pdf_file.name)
+    logger.info("=" * 60)
+
+def iter_written_documents(pdf_files, fingerprints, timers, jobs=1, workers=1, prefilter=True, cache=None):
+    """Extraherar dokumenten (i arbetsprocesser om jobs > 1) och skriver dem ett i taget
+    
+    Arbetsprocesserna extraherar, huvudprocessen är ensam om att skriva till databasen.
+    Ger (resultat, antal ändrade rader, stegtider, skrivtid) för varje sparat dokument.
+    """
+    content_hashes = {pdf_file: fingerprint['content_hash'] for pdf_file, fingerprint in fingerprints.items()}
+    for pdf_file, result, error in iter_ingested_documents(pdf_files, jobs, workers, prefilter, cache,
+                                                           content_hashes):
+        log_document_banner(pdf_file)
+        
+        if error:
+            logger.error("❌ Fel vid extraktion av %s: %s", pdf_file.name, error)
+            continue
+        
+        timer = timers[pdf_file]
+        timer.merge(result['stages'])
+        write_started = time.perf_counter()
+        with timer.stage('db_write'):
+            document, counts = write_ingested_document(result, fingerprints[pdf_file])
+        if document:
+            yield result, counts, timer, time.perf_counter() - write_started
+
+def iter_streamed_documents(pdf_files, fingerprints, timers, workers=1, prefilter=True, cache=None, resume=False,
+                            claims=None):
+    """Som iter_written_documents, men varje dokument skrivs medan det extraheras (se stream_document)
+    
+    claims är anspråken per dokument (se claim_document), som förnyas vid varje checkpoint.
+    """
+    claims = claims or {}
     for pdf_file in pdf_files:
-        print(f"\n{'='*60}")
-        print(f"Bearbetar: {pdf_file.name}")
-        print(f"{'='*60}")
+        log_document_banner(pdf_file)
         
-        # Indexera dokumentet (skapar nytt eller hämtar befintligt)
-        document = index_pdf_document(pdf_file)
+        timer = timers[pdf_file]
+        try:
+            result, document, counts = stream_document(pdf_file, fingerprints[pdf_file], workers, prefilter,
+                                                       cache, timer, resume, owner=claims.get(pdf_file))
+        except Exception as e:
+            logger.error("❌ Fel vid extraktion av %s: %s", pdf_file.name, e)
+            continue
+        if document:
+            yield result, counts, timer, timer.seconds['db_write']
+
+def document_stats(result, counts, stages, write_seconds):
+    """Maskinläsbar sammanfattning av ett dokuments extraktion (en rad i --stats-file)"""
+    return {
+        'document': result['path'].name,
+        'finished_at': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'pages': result['metadata']['num_pages'],
+        **result['summary'],
+        'delta': counts,
+        'extract_seconds': round(result['extract_seconds'], 4),
+        'write_seconds': round(write_seconds, 4),
+        'stages': stages.as_dict()
+    }
+
+def log_timing_summary(all_stats):
+    """Skriver ut tidsåtgång per dokument och per steg"""
+    if not all_stats:
+        return
+    
+    logger.info("=" * 60)
+    logger.info("⏱️  Tidsåtgång per dokument")
+    logger.info("=" * 60)
+    
+    name_width = max(len(stats['document']) for stats in all_stats)
+    by_total = sorted(all_stats, key=lambda stats: stats['extract_seconds'] + stats['write_seconds'], reverse=True)
+    for stats in by_total:
+        logger.info("   %-*s  %5d sidor  %6d artiklar  extraktion %7.2f s  skrivning %6.2f s",
+                    name_width, stats['document'], stats['pages'], stats['articles'],
+                    stats['extract_seconds'], stats['write_seconds'])
+        logger.info("   %-*s  %s", name_width, '',
+                    '  '.join(f"{name} {seconds:.2f} s" for name, seconds in stats['stages'].items()))
+    
+    logger.info("   Total extraktionstid: %.2f s", sum(stats['extract_seconds'] for stats in all_stats))
+
+def configure_logging(level=logging.INFO):
+    """Loggar till stderr; bara det här skriptets logger följer vald nivå, inte pdfminers"""
+    logging.basicConfig(format='%(message)s', level=logging.WARNING, force=True)
+    logger.setLevel(level)
+
+def parse_args():
+    """Läser kommandoradsargument"""
+    parser = argparse.ArgumentParser(description="Indexera PDF-dokument och extrahera artiklar från kapitel 9")
+    parser.add_argument('pdf_dir', nargs='?', default='./pdfs',
+                        help="Mapp med PDF-filer (standard: ./pdfs)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Antal processer som delar på sidorna i ett dokument (standard: 1)")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="Antal dokument som extraheras samtidigt (standard: 1). "
+                             "Med --jobs > 1 extraheras varje dokument i en egen process och --workers ignoreras")
+    parser.add_argument('--no-prefilter', dest='prefilter', action='store_false',
+                        help="Låt pdfplumber analysera alla sidor i stället för bara de som klarar förfiltreringen")
+    parser.add_argument('--no-cache', dest='cache', action='store_false',
+                        help="Använd inte sidcachen med sparad layout från tidigare körningar")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f"Mapp för sidcachen (standard: {DEFAULT_CACHE_DIR})")
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="Största storlek på sidcachen i MB (standard: %(default)s)")
+    parser.add_argument('--force', action='store_true',
+                        help="Extrahera alla dokument även om de inte har ändrats sedan förra körningen")
+    parser.add_argument('--stream', action='store_true',
+                        help="Skriv artiklarna till databasen i omgångar medan sidorna extraheras, så att "
+                             "minnesåtgången inte växer med dokumentets storlek (ett dokument i taget). "
+                             "Framstegen sparas regelbundet som en checkpoint i dokumentet")
+    parser.add_argument('--resume', action='store_true',
+                        help="Fortsätt avbrutna extraktioner från senaste checkpoint i stället för att "
+                             "börja om (innebär --stream)")
+    parser.add_argument('--watch', action='store_true',
+                        help="Fortsätt köra och extrahera nya och ändrade PDF-filer i mappen när de dyker upp")
+    parser.add_argument('--poll-interval', type=float, default=WATCH_POLL_INTERVAL,
+                        help="Sekunder mellan varje genomläsning av mappen med --watch (standard: %(default)s)")
+    parser.add_argument('--settle', type=float, default=WATCH_SETTLE_SECONDS,
+                        help="Sekunder en fil måste vara oförändrad innan den extraheras med --watch "
+                             "(standard: %(default)s)")
+    parser.add_argument('--stats-file',
+                        help="Lägg till en JSON-rad per dokument med tider per steg i denna fil")
+    verbosity = parser.add_mutually_exclusive_group()
+    verbosity.add_argument('-v', '--verbose', action='store_const', dest='log_level', const=logging.DEBUG,
+                           default=logging.INFO, help="Visa detaljer för varje sida, tabellrad och artikel")
+    verbosity.add_argument('-q', '--quiet', action='store_const', dest='log_level', const=logging.WARNING,
+                           help="Visa bara varningar och fel")
+    return parser.parse_args()
+
+def process_documents(pdf_files, args, cache=None):
+    """Extraherar de dokument som är nya eller har ändrats sedan förra körningen
+    
+    Dokument som en annan process redan extraherar (se claim_document) hoppas över.
+    Returnerar statistiken (se document_stats) för varje dokument som sparades.
+    """
+    claims = {}
+    try:
+        with renewing_claims(claims):
+            return _process_claimed_documents(pdf_files, args, cache, claims)
+    finally:
+        for pdf_file, owner in claims.items():
+            release_document(pdf_file, owner)
+
+def _process_claimed_documents(pdf_files, args, cache, claims):
+    jobs = max(1, args.jobs)
+    workers = max(1, args.workers)
+    all_stats = []
+    
+    # Hoppa över dokument vars innehåll inte har ändrats sedan förra körningen
+    fingerprints = {}
+    check_timers = {}
+    changed_files = []
+    for pdf_file in pdf_files:
+        owner = claim_document(pdf_file)
+        if owner is None:
+            logger.info("🔒 %s extraheras redan av en annan process, hoppar över", pdf_file.name)
+            continue
+        claims[pdf_file] = owner
         
-        if not document:
-            print(f"❌ Kunde inte indexera dokumentet {pdf_file.name}")
+        timer = StageTimer()
+        with timer.stage('fingerprint'):
+            status, fingerprint = check_document_changes(pdf_file)
+        if status == 'unchanged' and not args.force:
+            release_document(pdf_file, claims.pop(pdf_file))
+            logger.info("⏭️  %s är oförändrad, hoppar över", pdf_file.name)
             continue
+        if status == 'interrupted':
+            logger.info("⏸️  Extraktionen av %s avbröts förra gången", pdf_file.name)
+        fingerprints[pdf_file] = fingerprint
+        check_timers[pdf_file] = timer
+        changed_files.append(pdf_file)
+    
+    if not changed_files:
+        logger.info("✅ Alla dokument är redan aktuella")
+        return all_stats
+    
+    if args.stream:
+        written = iter_streamed_documents(changed_files, fingerprints, check_timers, workers, args.prefilter, cache,
+                                          args.resume, claims)
+    else:
+        written = iter_written_documents(changed_files, fingerprints, check_timers, jobs, workers,
+                                         args.prefilter, cache)
+    
+    for result, counts, timer, write_seconds in written:
+        stats = document_stats(result, counts, timer, write_seconds)
+        all_stats.append(stats)
+        
+        logger.info("📊 Sammanfattning: %d artiklar (%d med FBET-kod, %d med FBEN-kod, %d med länkar)",
+                    stats['articles'], stats['with_fbet'], stats['with_fben'], stats['with_links'])
         
-        print(f"📋 Extraherar artiklar från dokument ID: {document.id}")
+        if args.stats_file:
+            with open(args.stats_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(stats, ensure_ascii=False) + '\n')
+    
+    return all_stats
+
+class FolderWatcher:
+    """Bevakar en mapp genom att jämföra storlek och ändringstid för dess PDF-filer
+    
+    En ny eller ändrad fil lämnas ut först när storlek och ändringstid har varit
+    oförändrade i settle_seconds, så att filer som fortfarande kopieras in inte
+    extraheras halvfärdiga. Varje version av en fil lämnas ut en gång.
+    """
+    
+    def __init__(self, directory, settle_seconds=WATCH_SETTLE_SECONDS):
+        self.directory = Path(directory)
+        self.settle_seconds = settle_seconds
+        self._pending = {}  # Sökväg -> ((storlek, ändringstid), när den sågs första gången)
+        self._delivered = {}  # Sökväg -> (storlek, ändringstid) när den lämnades ut
+    
+    def _scan(self):
+        signatures = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.pdf'):
+                    continue
+                try:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        signatures[Path(entry.path)] = (stat.st_size, stat.st_mtime)
+                except OSError:
+                    continue  # Filen togs bort medan mappen lästes
+        return signatures
+    
+    def poll(self, now=None):
+        """Läser mappen och returnerar de filer som är nya eller ändrade och har slutat ändras"""
+        now = time.monotonic() if now is None else now
+        signatures = self._scan()
         
-        # Extrahera artiklar
-        articles = extract_all_articles(pdf_file, document.id)
+        ready = []
+        for path, signature in signatures.items():
+            if self._delivered.get(path) == signature:
+                continue
+            pending = self._pending.get(path)
+            if pending is None or pending[0] != signature:
+                self._pending[path] = (signature, now)
+            elif now - pending[1] >= self.settle_seconds:
+                del self._pending[path]
+                self._delivered[path] = signature
+                ready.append(path)
         
-        print(f"\n📊 Sammanfattning:")
-        print(f"   Extraherade artiklar: {len(articles)}")
+        # Glöm filer som har tagits bort, så att de känns igen om de kommer tillbaka
+        for known in (self._pending, self._delivered):
+            for path in [path for path in known if path not in signatures]:
+                del known[path]
         
-        # Visa statistik
-        if articles:
-            with_fbet = sum(1 for a in articles if a.get('fbet'))
-            with_fben = sum(1 for a in articles if a.get('fben'))
-            with_links = sum(1 for a in articles if a.get('link'))
+        return sorted(ready)
+
+def _stop_watching(signum, frame):
+    raise KeyboardInterrupt
+
+def watch_folder(pdf_dir, args, cache=None):
+    """Bevakar pdf_dir och extraherar nya och ändrade dokument i bakgrunden tills programmet avbryts
+    
+    Mappen läses var poll_interval:e sekund i huvudtråden. Färdigkopierade filer
+    läggs i en kö som en bakgrundstråd tömmer, ett dokument i taget, så att
+    bara en tråd skriver till databasen. Dokument som ligger i kön samtidigt
+    bearbetas tillsammans (och med --jobs parallellt). SIGTERM avslutar som Ctrl-C.
+    """
+    signal.signal(signal.SIGTERM, _stop_watching)
+    pending = queue.Queue()
+    
+    def ingest_worker():
+        while True:
+            batch = [pending.get()]
+            while True:
+                try:
+                    batch.append(pending.get_nowait())
+                except queue.Empty:
+                    break
             
-            print(f"   Med FBET-kod: {with_fbet}")
-            print(f"   Med FBEN-kod: {with_fben}")
-            print(f"   Med länkar: {with_links}")
+            pdf_files = list(dict.fromkeys(pdf_file for pdf_file in batch if pdf_file is not None))
+            if pdf_files:
+                try:
+                    log_timing_summary(process_documents(pdf_files, args, cache))
+                except Exception:
+                    logger.exception("❌ Fel vid bearbetning av %s", ', '.join(f.name for f in pdf_files))
+            if None in batch:
+                return
+    
+    worker = threading.Thread(target=ingest_worker, name='ingest', daemon=True)
+    worker.start()
+    
+    watcher = FolderWatcher(pdf_dir, args.settle)
+    logger.info("👀 Bevakar %s (läses var %.1f s, filer väntar %.1f s efter senaste ändring)",
+                pdf_dir, args.poll_interval, args.settle)
+    try:
+        while worker.is_alive():
+            for pdf_file in watcher.poll():
+                logger.info("📥 %s läggs i kön", pdf_file.name)
+                pending.put(pdf_file)
+            time.sleep(args.poll_interval)
+    except KeyboardInterrupt:
+        logger.info("⏹️  Avslutar bevakningen när köade dokument är klara (avbryt igen för att avsluta direkt)")
+    finally:
+        pending.put(None)
+        worker.join()
+
+def main():
+    """Huvudfunktion"""
+    args = parse_args()
+    configure_logging(args.log_level)
+    
+    # Initiera databas (skapa nya tabeller)
+    init_db()
+    
+    pdf_dir = Path(args.pdf_dir)
+    
+    jobs = max(1, args.jobs)
+    workers = max(1, args.workers)
+    if args.resume:
+        args.stream = True
+    if args.stream and jobs > 1:
+        logger.warning("⚠️  --jobs ignoreras med --stream, dokumenten tas ett i taget")
+    elif jobs > 1 and workers > 1:
+        logger.warning("⚠️  --workers ignoreras när --jobs > 1")
+    
+    cache = None
+    if args.cache:
+        cache = PageCache(args.cache_dir, EXTRACTOR_VERSION, args.cache_size * 1024 * 1024)
+    
+    if args.watch:
+        if not pdf_dir.is_dir():
+            logger.error("❌ Mappen %s finns inte", pdf_dir)
+            return
+        watch_folder(pdf_dir, args, cache)
+        return
+    
+    # Hitta PDF-filer
+    pdf_files = list(pdf_dir.glob("*.pdf"))
+    
+    if not pdf_files:
+        logger.error("❌ Ingen PDF-fil hittades i %s", pdf_dir)
+        return
+    
+    started = time.perf_counter()
+    all_stats = process_documents(pdf_files, args, cache)
+    if not all_stats:
+        return
     
-    session.close()
+    log_timing_summary(all_stats)
+    logger.info("   Total väggklockstid: %.2f s", time.perf_counter() - started)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
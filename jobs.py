@@ -0,0 +1,157 @@
+"""
+Background extraction jobs for PDF documents uploaded through the web interface.
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from extract_articles import (CLAIM_LEASE_SECONDS, check_document_changes, claim_document, index_pdf_document,
+                              release_document, renewing_claims, stream_document)
+
+logger = logging.getLogger(__name__)
+
+# Finished jobs kept for the progress API before the oldest are forgotten
+MAX_FINISHED_JOBS = 200
+
+# Seconds between attempts to claim a document another process is extracting
+CLAIM_RETRY_SECONDS = 2.0
+
+# Seconds a job waits for a document another process is extracting before it
+# fails. A claim abandoned when the wait began has expired by then and is taken over.
+CLAIM_WAIT_SECONDS = CLAIM_LEASE_SECONDS + CLAIM_RETRY_SECONDS
+
+def _isoformat(value):
+    return value.isoformat(timespec='seconds') + 'Z' if value else None
+
+class ExtractionJob:
+    """Progress and outcome of extracting one uploaded document."""
+
+    def __init__(self, pdf_path):
+        self.id = uuid.uuid4().hex
+        self.pdf_path = pdf_path
+        self.status = 'queued'  # queued, running, done, unchanged or failed
+        self.created_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+        self.pages_done = 0
+        self.pages_total = None
+        self.articles_found = 0
+        self.document_id = None
+        self.counts = None
+        self.error = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            self.status = 'running'
+            self.started_at = datetime.utcnow()
+
+    def progress(self, pages_done, pages_total, articles_found):
+        """Progress callback for stream_document."""
+        with self._lock:
+            self.pages_done = pages_done
+            self.pages_total = pages_total
+            self.articles_found = articles_found
+
+    def finish(self, status, document_id=None, counts=None, error=None):
+        with self._lock:
+            self.status = status
+            self.document_id = document_id
+            self.counts = counts
+            self.error = error
+            self.finished_at = datetime.utcnow()
+            if status == 'done' and self.pages_total is not None:
+                self.pages_done = self.pages_total
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'id': self.id,
+                'filename': self.pdf_path.name,
+                'status': self.status,
+                'created_at': _isoformat(self.created_at),
+                'started_at': _isoformat(self.started_at),
+                'finished_at': _isoformat(self.finished_at),
+                'pages_done': self.pages_done,
+                'pages_total': self.pages_total,
+                'articles_found': self.articles_found,
+                'document_id': self.document_id,
+                'counts': self.counts,
+                'error': self.error
+            }
+
+class ExtractionJobQueue:
+    """Runs extraction jobs on background threads and keeps their progress in memory.
+
+    A single thread by default, so uploaded documents are written to SQLite one
+    at a time; each job can still spread its pages over `workers` processes.
+    Jobs only live in the process that accepted the upload.
+    """
+
+    def __init__(self, threads=1, workers=1, claim_wait=CLAIM_WAIT_SECONDS):
+        self.threads = threads
+        self.workers = workers
+        self.claim_wait = claim_wait
+        self._executor = None
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, pdf_path):
+        """Queue a saved PDF for extraction and return its job."""
+        job = ExtractionJob(pdf_path)
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='extract')
+            self._jobs[job.id] = job
+            self._forget_finished()
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished_at]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def _run(self, job):
+        owner = None
+        try:
+            # The folder watcher (extract_articles.py --watch) may already be extracting
+            # the same file; the job stays queued until it is done, for at most claim_wait
+            deadline = time.monotonic() + self.claim_wait
+            owner = claim_document(job.pdf_path)
+            while owner is None:
+                if time.monotonic() >= deadline:
+                    job.finish('failed', error=f"{job.pdf_path.name} is being extracted by another process, "
+                                               "try again later")
+                    return
+                time.sleep(CLAIM_RETRY_SECONDS)
+                owner = claim_document(job.pdf_path)
+
+            job.start()
+            with renewing_claims({job.pdf_path: owner}):
+                status, fingerprint = check_document_changes(job.pdf_path)
+                if status == 'unchanged':
+                    document = index_pdf_document(job.pdf_path)
+                    job.finish('unchanged', document_id=document.id if document else None)
+                    return
+
+                _, document, counts = stream_document(job.pdf_path, fingerprint, workers=self.workers,
+                                                      resume=True, progress=job.progress, owner=owner)
+            if not document:
+                job.finish('failed', error='Extraction failed, see the server log for details')
+                return
+            job.finish('done', document_id=document.id, counts=counts)
+        except Exception as e:
+            logger.exception("Extraction job %s for %s failed", job.id, job.pdf_path.name)
+            job.finish('failed', error=str(e))
+        finally:
+            if owner is not None:
+                release_document(job.pdf_path, owner)
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Versioned schema migrations for the SQLite database.
+
+The schema version is kept in SQLite's `PRAGMA user_version`. init_db() runs
+the pending migrations on every start; run this script to migrate an existing
+database by hand or to check that the hot queries use their indexes:
+
+    python migrations.py
+    python migrations.py --check-plans
+"""
+import argparse
+import sys
+
+from sqlalchemy import inspect, text, tuple_
+from sqlalchemy.orm import sessionmaker
+
+from models import (ARTICLE_CATALOG_TABLE, ARTICLE_FTS_TABLE, ARTICLE_TRIGRAM_TABLE, Article, ExtractionClaim,
+                    PDFDocument, article_fbet_prefix, article_search_values, create_article_catalog,
+                    create_article_search_index, create_article_trigram_index, engine)
+
+def _add_columns(table, columns):
+    """Migration adding (name, SQL type) columns to a table if they are missing."""
+    def migrate(bind):
+        existing = {column['name'] for column in inspect(bind).get_columns(table)}
+        with bind.begin() as connection:
+            for name, sql_type in columns:
+                if name not in existing:
+                    connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {sql_type}"))
+    return migrate
+
+def _create_table(model):
+    """Migration creating a model's table if it is missing."""
+    def migrate(bind):
+        model.__table__.create(bind, checkfirst=True)
+    return migrate
+
+# Named like the indexes SQLAlchemy creates for index=True columns, so a database
+# created by create_all() already has them
+_INDEXES = [
+    ('ix_articles_document_id', 'articles', 'document_id'),
+    ('ix_articles_fbet', 'articles', 'fbet'),
+    ('ix_articles_fben', 'articles', 'fben'),
+    ('ix_articles_extracted_at_id', 'articles', 'extracted_at, id'),
+    ('ix_pdf_documents_filename', 'pdf_documents', 'filename'),
+    ('ix_pdf_documents_content_hash', 'pdf_documents', 'content_hash'),
+]
+
+def _create_indexes(bind):
+    with bind.begin() as connection:
+        for name, table, columns in _INDEXES:
+            connection.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+
+_add_search_columns = _add_columns('articles', [('fbet_search', 'VARCHAR(50)'), ('fben_search', 'VARCHAR(50)'),
+                                                ('artikel_search', 'VARCHAR(500)')])
+
+def _with_search_columns(create_index):
+    """Migration creating a search index over the normalized search columns.
+    
+    Databases older than version 8 get the columns (still empty) first; version 8
+    fills them and builds the index again.
+    """
+    def migrate(bind):
+        _add_search_columns(bind)
+        return create_index(bind)
+    return migrate
+
+def _index_normalized_search_columns(bind):
+    """Fill the normalized search columns, index the FBET codes and rebuild both
+    search indexes from the columns."""
+    _add_search_columns(bind)
+    with bind.begin() as connection:
+        for table in (ARTICLE_FTS_TABLE, ARTICLE_TRIGRAM_TABLE):
+            for trigger_event in ('insert', 'delete', 'update'):
+                connection.execute(text(f"DROP TRIGGER IF EXISTS {table}_{trigger_event}"))
+            connection.execute(text(f"DROP TABLE IF EXISTS {table}"))
+        
+        rows = connection.execute(text("SELECT id, fbet, fben, artikel FROM articles")).mappings().all()
+        if rows:
+            connection.execute(
+                text("UPDATE articles SET fbet_search = :fbet_search, fben_search = :fben_search, "
+                     "artikel_search = :artikel_search WHERE id = :id"),
+                [{'id': row['id'], **article_search_values(row)} for row in rows]
+            )
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_articles_fbet_code ON articles (replace(fbet_search, ' ', ''))"
+        ))
+    create_article_search_index(bind)
+    create_article_trigram_index(bind)
+
+def _restrict_catalog_update_trigger(bind):
+    """Recreate the catalog update trigger so it only fires for ARTICLE_CATALOG_COLUMNS."""
+    with bind.begin() as connection:
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {ARTICLE_CATALOG_TABLE}_update"))
+    create_article_catalog(bind)
+
+def _drop_trigram_insert_trigger(bind):
+    """Drop the trigram insert trigger; inserted articles are indexed by models.py instead."""
+    with bind.begin() as connection:
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {ARTICLE_TRIGRAM_TABLE}_insert"))
+
+# (version, description, migration). Append new migrations at the end; every
+# migration must be safe to run on a database that already has its changes,
+# since a new database gets the current schema from create_all() first.
+MIGRATIONS = [
+    (1, "Add articles.image_url", _add_columns('articles', [('image_url', 'VARCHAR(1000)')])),
+    (2, "Add pdf_documents.file_size, file_mtime and content_hash",
+     _add_columns('pdf_documents', [('file_size', 'INTEGER'), ('file_mtime', 'FLOAT'),
+                                    ('content_hash', 'VARCHAR(64)')])),
+    (3, "Add pdf_documents.checkpoint_page and checkpoint_state",
+     _add_columns('pdf_documents', [('checkpoint_page', 'INTEGER'), ('checkpoint_state', 'TEXT')])),
+    (4, "Index article codes, document ids and sort keys, document filenames and hashes", _create_indexes),
+    (5, "Create the FTS5 article search index", _with_search_columns(create_article_search_index)),
+    (6, "Create the trigram index for fuzzy search", _with_search_columns(create_article_trigram_index)),
+    (7, "Create the article catalog generation counter", create_article_catalog),
+    (8, "Search normalized copies of FBET, FBEN and artikel", _index_normalized_search_columns),
+    (9, "Claim documents being extracted", _create_table(ExtractionClaim)),
+    (10, "Bump the article catalog only for searchable column updates", _restrict_catalog_update_trigger),
+    (11, "Index inserted articles for fuzzy search without a per-row trigger", _drop_trigram_insert_trigger),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def schema_version(bind):
+    with bind.connect() as connection:
+        return connection.execute(text("PRAGMA user_version")).scalar_one()
+
+def migrate_database(bind=engine):
+    """Run the migrations newer than the database's schema version.
+
+    Returns the list of (version, description) that were applied.
+    """
+    current = schema_version(bind)
+    applied = []
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        migrate(bind)
+        with bind.begin() as connection:
+            connection.execute(text(f"PRAGMA user_version = {version}"))
+        applied.append((version, description))
+    return applied
+
+def hot_queries(session):
+    """(description, query) for the queries the app and the extractor run most."""
+    after = ('2024-01-01 00:00:00', 1000)
+    return [
+        ("Document page articles", session.query(Article).filter_by(document_id=1).order_by(Article.id).limit(20)),
+        ("Article list, first page",
+         session.query(Article).order_by(Article.extracted_at.desc(), Article.id.desc()).limit(50)),
+        ("Article list, later page",
+         session.query(Article).filter(tuple_(Article.extracted_at, Article.id) < tuple_(*after))
+                .order_by(Article.extracted_at.desc(), Article.id.desc()).limit(50)),
+        ("Articles of a re-extracted document",
+         session.query(Article.id, Article.fbet, Article.fben).filter_by(document_id=1).order_by(Article.id)),
+        ("Code prefix search", session.query(Article.id).filter(article_fbet_prefix('F8009-12'))),
+        ("Code lookup", session.query(Article).filter(Article.fbet.in_(['F8009-000001', 'G7773-000002']) |
+                                                      Article.fben.in_(['KARB HMS']))),
+        ("Document by filename", session.query(PDFDocument).filter_by(filename='manual.pdf').limit(1)),
+        ("Renamed document by content hash", session.query(PDFDocument).filter_by(content_hash='0' * 64)),
+    ]
+
+def check_query_plans(bind=engine):
+    """Print the query plan of each hot query. Returns the number that scan a whole
+    table or sort without an index."""
+    session = sessionmaker(bind=bind)()
+    failures = 0
+    try:
+        for description, query in hot_queries(session):
+            sql = str(query.statement.compile(bind, compile_kwargs={'literal_binds': True}))
+            plan = [row[3] for row in session.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+            slow = [step for step in plan
+                    if (step.startswith('SCAN') and 'USING' not in step) or 'TEMP B-TREE' in step]
+            failures += bool(slow)
+            print(f"{'FAIL' if slow else 'ok  '}  {description}: {'; '.join(plan)}")
+    finally:
+        session.close()
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate the database schema to the current version")
+    parser.add_argument('--check-plans', action='store_true',
+                        help="Also check that the hot queries use indexes (exit status 1 if not)")
+    args = parser.parse_args()
+
+    from models import init_db
+    before = schema_version(engine)
+    init_db()
+    print(f"Schema version {before} -> {schema_version(engine)} (current: {SCHEMA_VERSION})")
+
+    if args.check_plans and check_query_plans():
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
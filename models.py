@@ -1,24 +1,96 @@
 """
 Database models for the PDF indexing system.
 """
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import (create_engine, event, inspect, Column, Integer, String, Text, DateTime, Float, ForeignKey,
+                        Index, and_, bindparam, false, func, insert, literal, literal_column, select, table, column,
+                        union_all, update, delete, or_, text, tuple_)
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import Session as OrmSession, sessionmaker, relationship, joinedload
 from datetime import datetime
+from itertools import islice
+import sqlite3
+from search_text import compact_search_text, normalize_search_text, text_similarity, word_trigrams
+
+# Number of rows sent per executemany() call by the bulk write helpers
+BULK_CHUNK_SIZE = 1000
+
+# Bound parameters per lookup_articles_by_code() query, shared by the IN lists of all
+# looked-up fields, so it stays below the 999 variables older SQLite versions allow
+LOOKUP_MAX_PARAMETERS = 900
+
+# Normalized copy (see normalize_search_text) of each searchable article column.
+# The copies are written with the article (see article_search_values), so neither
+# searches nor the search index triggers normalize any text.
+ARTICLE_SEARCH_COLUMNS = {'fbet': 'fbet_search', 'fben': 'fben_search', 'artikel': 'artikel_search'}
+
+# SQLite FTS5 index over the normalized search columns. It is an external-content
+# table: it stores only the tokens and reads the text back from `articles`.
+ARTICLE_FTS_TABLE = 'articles_fts'
+ARTICLE_FTS_COLUMNS = ('fbet_search', 'fben_search', 'artikel_search')
+ARTICLE_FTS_WEIGHTS = (10.0, 5.0, 1.0)  # bm25 weight per column, so code matches rank first
+
+# Rank of articles whose FBET starts with the search input typed as a code (with
+# or without separators), below any bm25 rank so they come first
+FBET_PREFIX_RANK = -1e9
+
+# SQLite FTS5 trigram index over normalized FBEN and artikel text, used to find
+# candidates for typo-tolerant search. It stores its own copy of the normalized
+# text, padded with spaces, copied from the search columns. Inserted articles are
+# added by bulk_insert_articles() and after each ORM flush in one statement each;
+# triggers handle updates and deletes.
+ARTICLE_TRIGRAM_TABLE = 'article_trigrams'
+ARTICLE_TRIGRAM_COLUMNS = ('fben', 'artikel')
+FUZZY_CANDIDATES = 500  # candidates fetched from the trigram index per search
+FUZZY_MIN_SIMILARITY = 0.7  # lowest text_similarity() of a fuzzy match
+
+# Milliseconds a connection waits for another connection's write lock before failing
+# with "database is locked"; the extractor holds it while it writes a checkpoint
+SQLITE_BUSY_TIMEOUT_MS = 30000
+
+# Single-row table whose generation is bumped by triggers when articles are inserted,
+# deleted or searchable columns change, so in-memory views of the articles (in any
+# process) can tell when they are stale
+ARTICLE_CATALOG_TABLE = 'article_catalog'
+# Article columns whose updates bump the generation; image and link changes don't
+# affect search results, suggestions or counts
+ARTICLE_CATALOG_COLUMNS = ('fbet', 'fben', 'artikel', 'document_id', 'extracted_at')
 
 Base = declarative_base()
 
+@event.listens_for(Engine, 'connect')
+def _configure_sqlite_connection(dbapi_connection, connection_record):
+    """Let the web app read while the extractor writes.
+    
+    In WAL mode readers see the last committed state instead of waiting for the
+    writer, and synchronous=NORMAL syncs at checkpoints rather than on every
+    commit (a power loss can only lose the latest commits, not corrupt the file).
+    A second writer waits up to SQLITE_BUSY_TIMEOUT_MS for the lock.
+    """
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA journal_mode = WAL")  # Stored in the database file, a no-op once set
+        cursor.execute("PRAGMA synchronous = NORMAL")
+        cursor.close()
+
 class PDFDocument(Base):
     """Model for storing PDF document information."""
     __tablename__ = 'pdf_documents'
     
     id = Column(Integer, primary_key=True)
-    filename = Column(String(255), nullable=False)
+    filename = Column(String(255), nullable=False, index=True)
     title = Column(String(500))
     author = Column(String(255))
     num_pages = Column(Integer)
     content = Column(Text)
     file_path = Column(String(500))
+    file_size = Column(Integer)  # Filstorlek i byte vid senaste indexering
+    file_mtime = Column(Float)  # Ändringstid (st_mtime) vid senaste indexering
+    content_hash = Column(String(64), index=True)  # SHA-256 av filens innehåll
+    checkpoint_page = Column(Integer)  # Sista färdiga sidan (0-baserad) i en avbruten extraktion
+    checkpoint_state = Column(Text)  # JSON med det som behövs för att fortsätta från checkpoint_page
     indexed_at = Column(DateTime, default=datetime.utcnow)
     
     # Relation till artiklar
@@ -32,28 +104,454 @@ class Article(Base):
     __tablename__ = 'articles'
     
     id = Column(Integer, primary_key=True)
-    document_id = Column(Integer, ForeignKey('pdf_documents.id'), nullable=False)
-    fbet = Column(String(50))  # FBET-kod
-    fben = Column(String(50))  # FBEN-kod  
+    document_id = Column(Integer, ForeignKey('pdf_documents.id'), nullable=False, index=True)
+    fbet = Column(String(50), index=True)  # FBET-kod
+    fben = Column(String(50), index=True)  # FBEN-kod  
     artikel = Column(String(500))  # Artikelnamn/beskrivning
     link = Column(String(1000))  # Länk till dokumentation
     image_url = Column(String(1000))  # URL till artikelbild
+    fbet_search = Column(String(50))  # FBET normaliserad för sökning
+    fben_search = Column(String(50))  # FBEN normaliserad för sökning
+    artikel_search = Column(String(500))  # Artikelnamnet normaliserat för sökning
     extracted_at = Column(DateTime, default=datetime.utcnow)
     
     # Relation tillbaka till dokument
     document = relationship("PDFDocument", back_populates="articles")
     
+    __table_args__ = (
+        # Sidvis listning med nyaste först (keyset på extracted_at, id)
+        Index('ix_articles_extracted_at_id', 'extracted_at', 'id'),
+        # FBET-koder utan skiljetecken, för prefixsökning på koder (se article_fbet_code)
+        Index('ix_articles_fbet_code', func.replace(fbet_search, ' ', '')),
+    )
+    
     def __repr__(self):
         return f"<Article(id={self.id}, fbet='{self.fbet}', fben='{self.fben}', artikel='{self.artikel}')>"
 
+class ExtractionClaim(Base):
+    """Marks a PDF file as being extracted, so only one process writes its articles."""
+    __tablename__ = 'extraction_claims'
+    
+    filename = Column(String(255), primary_key=True)
+    owner = Column(String(255), nullable=False)  # värd:pid:tråd för den som extraherar
+    claimed_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<ExtractionClaim(filename='{self.filename}', owner='{self.owner}')>"
+
+# The normalized FBET without spaces, as indexed by ix_articles_fbet_code. The
+# arguments are literals, since SQLite only uses the index for the same expression.
+article_fbet_code = func.replace(Article.fbet_search, literal_column("' '"), literal_column("''"))
+
+def article_search_values(article):
+    """Normalized search column values for the searchable columns present in an article dict."""
+    return {search_column: normalize_search_text(article[source_column])
+            for source_column, search_column in ARTICLE_SEARCH_COLUMNS.items() if source_column in article}
+
+@event.listens_for(Article, 'before_insert')
+@event.listens_for(Article, 'before_update')
+def _set_article_search_columns(mapper, connection, article):
+    """Normalize the searchable columns of articles written through the ORM when they change."""
+    attributes = inspect(article).attrs
+    for source_column, search_column in ARTICLE_SEARCH_COLUMNS.items():
+        if attributes[source_column].history.has_changes():
+            setattr(article, search_column, normalize_search_text(getattr(article, source_column)))
+
 # Database setup
 engine = create_engine('sqlite:///pdf_index.db', echo=False)
 Session = sessionmaker(bind=engine)
 
 def init_db():
-    """Initialize the database schema."""
+    """Initialize the database schema and run pending migrations (see migrations.py)."""
+    from migrations import migrate_database
     Base.metadata.create_all(engine)
+    migrate_database(engine)
 
 def get_session():
     """Get a new database session."""
     return Session()
+
+def _chunks(rows, chunk_size):
+    """Yield lists of at most chunk_size items from any iterable."""
+    iterator = iter(rows)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def bulk_insert_articles(session, document_id, articles, chunk_size=BULK_CHUNK_SIZE):
+    """Insert article dicts for a document using chunked executemany.
+    
+    Runs inside the caller's transaction; the caller commits. Returns the
+    number of inserted rows.
+    """
+    extracted_at = datetime.utcnow()
+    inserted = 0
+    # New rows get ids above the current largest one; their trigrams are indexed in
+    # one statement at the end, which is about 3x cheaper than a trigger per row
+    last_id = None
+    if _has_article_trigram_index(session.connection()):
+        last_id = session.execute(select(func.max(Article.id))).scalar() or 0
+    
+    for chunk in _chunks(articles, chunk_size):
+        rows = [
+            {
+                'document_id': document_id,
+                'fbet': article.get('fbet'),
+                'fben': article.get('fben'),
+                'artikel': article.get('artikel'),
+                'link': article.get('link'),
+                'extracted_at': extracted_at,
+            }
+            for article in chunk
+        ]
+        session.execute(insert(Article.__table__), [{**row, **article_search_values(row)} for row in rows])
+        inserted += len(chunk)
+    
+    if inserted and last_id is not None:
+        session.execute(text(f"{_TRIGRAM_INSERT_ARTICLES} WHERE id > :last_id"), {'last_id': last_id})
+    return inserted
+
+def bulk_update_articles(session, changes, chunk_size=BULK_CHUNK_SIZE):
+    """Update articles by primary key from dicts containing 'id' and the changed columns.
+    
+    The search columns of changed FBET, FBEN or artikel values are updated too.
+    """
+    updated = 0
+    for chunk in _chunks(changes, chunk_size):
+        session.execute(update(Article), [{**change, **article_search_values(change)} for change in chunk])
+        updated += len(chunk)
+    return updated
+
+def bulk_delete_articles(session, article_ids, chunk_size=BULK_CHUNK_SIZE):
+    """Delete articles by primary key in chunks."""
+    deleted = 0
+    for chunk in _chunks(article_ids, chunk_size):
+        session.execute(delete(Article).where(Article.id.in_(chunk)))
+        deleted += len(chunk)
+    return deleted
+
+_ARTICLE_FTS_CREATE = (
+    f"CREATE VIRTUAL TABLE {ARTICLE_FTS_TABLE} USING fts5({', '.join(ARTICLE_FTS_COLUMNS)}, "
+    f"content='articles', content_rowid='id', tokenize='ascii')"
+)
+
+def _fts_row(prefix):
+    return ', '.join(f"{prefix}.{column}" for column in ('id',) + ARTICLE_FTS_COLUMNS)
+
+_FTS_COLUMN_LIST = ', '.join(('rowid',) + ARTICLE_FTS_COLUMNS)
+_FTS_INSERT_NEW = f"INSERT INTO {ARTICLE_FTS_TABLE}({_FTS_COLUMN_LIST}) VALUES ({_fts_row('new')});"
+_FTS_DELETE_OLD = (f"INSERT INTO {ARTICLE_FTS_TABLE}({ARTICLE_FTS_TABLE}, {_FTS_COLUMN_LIST}) "
+                   f"VALUES ('delete', {_fts_row('old')});")
+
+# Keep the index in sync whichever code path writes articles (extractor, web app,
+# cascading document deletes). Image updates do not touch the indexed columns.
+# Migration 8 drops these triggers by name (see migrations.py).
+_ARTICLE_FTS_TRIGGERS = (
+    f"CREATE TRIGGER IF NOT EXISTS {ARTICLE_FTS_TABLE}_insert AFTER INSERT ON articles BEGIN "
+    f"{_FTS_INSERT_NEW} END",
+    f"CREATE TRIGGER IF NOT EXISTS {ARTICLE_FTS_TABLE}_delete AFTER DELETE ON articles BEGIN "
+    f"{_FTS_DELETE_OLD} END",
+    f"CREATE TRIGGER IF NOT EXISTS {ARTICLE_FTS_TABLE}_update AFTER UPDATE OF {', '.join(ARTICLE_FTS_COLUMNS)} "
+    f"ON articles BEGIN {_FTS_DELETE_OLD} {_FTS_INSERT_NEW} END",
+)
+
+# Whether the FTS5 index exists, per engine URL (checked once per process)
+_article_search_index = {}
+
+def create_article_search_index(bind):
+    """Create the FTS5 article index and its sync triggers if they don't exist.
+    
+    A newly created index is built from the existing rows. Returns False if this
+    SQLite build has no FTS5, in which case searches fall back to LIKE.
+    """
+    with bind.begin() as connection:
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {'name': ARTICLE_FTS_TABLE}
+        ).first() is not None
+        
+        if not exists:
+            try:
+                connection.execute(text(_ARTICLE_FTS_CREATE))
+            except OperationalError:
+                _article_search_index[str(bind.url)] = False
+                return False
+        
+        for trigger in _ARTICLE_FTS_TRIGGERS:
+            connection.execute(text(trigger))
+        
+        if not exists:
+            connection.execute(text(f"INSERT INTO {ARTICLE_FTS_TABLE}({ARTICLE_FTS_TABLE}) VALUES ('rebuild')"))
+    
+    _article_search_index[str(bind.url)] = True
+    return True
+
+def _has_article_search_index(session):
+    bind = session.get_bind()
+    key = str(bind.url)
+    if key not in _article_search_index:
+        _article_search_index[key] = session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {'name': ARTICLE_FTS_TABLE}
+        ).first() is not None
+    return _article_search_index[key]
+
+def article_fts_match(query):
+    """Turn free-text search input into an FTS5 MATCH expression.
+    
+    The input is normalized like the search columns and every word becomes a
+    quoted prefix phrase, so all words must match the start of a word,
+    regardless of case, diacritics and punctuation. Returns '' if the input
+    contains no searchable words.
+    """
+    return ' '.join(f'"{word}"*' for word in (normalize_search_text(query) or '').split())
+
+def article_fbet_prefix(query):
+    """Condition for articles whose FBET starts with the search input typed as a code,
+    with or without separators ('F8009-12', 'f800912'), as a range on ix_articles_fbet_code."""
+    code = compact_search_text(query)
+    # Normalized text only contains 0-9, a-z and spaces, all sorting before '{'
+    return and_(article_fbet_code >= code, article_fbet_code < code + '{')
+
+def keyset_page(query, sort_key, after=None, page_size=None, descending=False):
+    """Fetch one page of `query` ordered by the `sort_key` columns.
+    
+    `after` holds the sort key values of the last row of the previous page, so
+    the page starts with a range condition on the (indexed) key instead of
+    skipping rows with OFFSET. Returns (items, next_after), where next_after is
+    None on the last page. Items are the query's single entity, or tuples for
+    queries selecting several columns.
+    """
+    entities = len(query.column_descriptions)
+    key = tuple_(*sort_key)
+    if after is not None:
+        query = query.filter(key < tuple_(*after) if descending else key > tuple_(*after))
+    query = query.add_columns(*sort_key).order_by(*(column.desc() if descending else column for column in sort_key))
+    
+    def item(row):
+        return row[0] if entities == 1 else tuple(row[:entities])
+    
+    if page_size is None:
+        return [item(row) for row in query], None
+    rows = query.limit(page_size + 1).all()
+    next_after = tuple(rows[page_size - 1][entities:]) if len(rows) > page_size else None
+    return [item(row) for row in rows[:page_size]], next_after
+
+def lookup_articles_by_code(query, codes, fields=('fbet', 'fben'), max_parameters=LOOKUP_MAX_PARAMETERS):
+    """Yield the rows of an Article `query` whose FBET or FBEN (see `fields`) exactly
+    equals one of `codes`, using chunked IN lists on the code indexes.
+    
+    Each chunk binds its codes once per field, so the chunks hold `max_parameters`
+    divided by the number of fields.
+    """
+    for chunk in _chunks(codes, max(1, max_parameters // len(fields))):
+        yield from query.filter(or_(*(getattr(Article, field).in_(chunk) for field in fields)))
+
+def search_articles_query(session, query):
+    """Query for articles matching search input and the sort key ranking them.
+    
+    Uses the FTS5 index ranked with bm25, after the articles whose FBET starts
+    with the input typed as a code (sort key: rank, id). Without the index (or
+    for input with no searchable words) it falls back to an unranked substring
+    match on FBET, FBEN and artikel (sort key: id). Pass both to keyset_page().
+    """
+    match = article_fts_match(query)
+    if match and _has_article_search_index(session):
+        fts = table(ARTICLE_FTS_TABLE, column('rowid'))
+        code_prefix = article_fbet_prefix(query)
+        ranked = union_all(
+            select(Article.id, literal(FBET_PREFIX_RANK, Float).label('rank')).where(code_prefix),
+            select(fts.c.rowid, func.bm25(literal_column(ARTICLE_FTS_TABLE), *ARTICLE_FTS_WEIGHTS))
+            .where(text(f"{ARTICLE_FTS_TABLE} MATCH :match").bindparams(match=match))
+            .where(fts.c.rowid.not_in(select(Article.id).where(code_prefix)))
+        ).subquery('ranked')
+        return session.query(Article).join(ranked, Article.id == ranked.c.id), (ranked.c.rank, Article.id)
+    
+    return session.query(Article).filter(article_substring_filter(query)), (Article.id,)
+
+def article_substring_filter(query):
+    """Substring filter on the normalized FBET, FBEN and artikel (full table scan).
+    
+    Matches nothing if the input contains no searchable words.
+    """
+    normalized = normalize_search_text(query)
+    if not normalized:
+        return false()
+    return or_(
+        article_fbet_code.contains(compact_search_text(normalized)),
+        Article.fben_search.contains(normalized),
+        Article.artikel_search.contains(normalized)
+    )
+
+_ARTICLE_CATALOG_BUMP = f"UPDATE {ARTICLE_CATALOG_TABLE} SET generation = generation + 1 WHERE id = 1;"
+
+def create_article_catalog(bind):
+    """Create the article catalog generation counter and its triggers if they don't exist."""
+    with bind.begin() as connection:
+        connection.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {ARTICLE_CATALOG_TABLE} "
+            f"(id INTEGER PRIMARY KEY CHECK (id = 1), generation INTEGER NOT NULL)"
+        ))
+        connection.execute(text(f"INSERT OR IGNORE INTO {ARTICLE_CATALOG_TABLE} (id, generation) VALUES (1, 0)"))
+        for name, trigger_event in (('insert', 'INSERT'), ('delete', 'DELETE'),
+                                    ('update', f"UPDATE OF {', '.join(ARTICLE_CATALOG_COLUMNS)}")):
+            connection.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {ARTICLE_CATALOG_TABLE}_{name} "
+                f"AFTER {trigger_event} ON articles BEGIN {_ARTICLE_CATALOG_BUMP} END"
+            ))
+
+def article_catalog_generation(session):
+    """Current article catalog generation; changes whenever articles are added, removed or their
+    ARTICLE_CATALOG_COLUMNS change."""
+    return session.execute(text(f"SELECT generation FROM {ARTICLE_CATALOG_TABLE} WHERE id = 1")).scalar_one()
+
+# (generation, count) of the last article count, per engine URL
+_article_counts = {}
+
+def article_count(session):
+    """Number of articles, counted again only when the catalog generation has changed."""
+    key = str(session.get_bind().url)
+    generation = article_catalog_generation(session)
+    cached = _article_counts.get(key)
+    if cached is None or cached[0] != generation:
+        cached = _article_counts[key] = (generation, session.query(Article).count())
+    return cached[1]
+
+def _trigram_values(prefix):
+    # Padded with spaces so the first and last letters of the text also form trigrams
+    return ', '.join(f"' ' || {prefix}.{column}_search || ' '" for column in ARTICLE_TRIGRAM_COLUMNS)
+
+_TRIGRAM_INSERT_COLUMNS = f"{ARTICLE_TRIGRAM_TABLE}(rowid, {', '.join(ARTICLE_TRIGRAM_COLUMNS)})"
+
+# Indexes the articles matching a condition appended to it
+_TRIGRAM_INSERT_ARTICLES = (f"INSERT INTO {_TRIGRAM_INSERT_COLUMNS} "
+                            f"SELECT id, {_trigram_values('articles')} FROM articles")
+
+# There is no insert trigger: a per-row FTS5 insert made bulk inserts almost 2x slower
+# (benchmark.py insert), so inserts are indexed by the code writing them. Migration
+# 11 drops the insert trigger of older databases.
+_ARTICLE_TRIGRAM_TRIGGERS = (
+    f"CREATE TRIGGER IF NOT EXISTS {ARTICLE_TRIGRAM_TABLE}_delete AFTER DELETE ON articles BEGIN "
+    f"DELETE FROM {ARTICLE_TRIGRAM_TABLE} WHERE rowid = old.id; END",
+    f"CREATE TRIGGER IF NOT EXISTS {ARTICLE_TRIGRAM_TABLE}_update "
+    f"AFTER UPDATE OF {', '.join(f'{column}_search' for column in ARTICLE_TRIGRAM_COLUMNS)} "
+    f"ON articles BEGIN DELETE FROM {ARTICLE_TRIGRAM_TABLE} WHERE rowid = old.id; "
+    f"INSERT INTO {_TRIGRAM_INSERT_COLUMNS} VALUES (new.id, {_trigram_values('new')}); END",
+)
+
+# Whether the trigram index exists, per engine URL (checked once per process)
+_article_trigram_index = {}
+
+# All normalized columns of an index row as one text
+_TRIGRAM_TEXT = ' || '.join(f"coalesce({column}, '')" for column in ARTICLE_TRIGRAM_COLUMNS)
+
+def create_article_trigram_index(bind):
+    """Create the trigram index for fuzzy search and its sync triggers if they don't exist.
+    
+    A newly created index is filled from the existing rows. Returns False if this
+    SQLite build has no FTS5 trigram tokenizer; fuzzy search then finds nothing.
+    """
+    with bind.begin() as connection:
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {'name': ARTICLE_TRIGRAM_TABLE}
+        ).first() is not None
+        
+        if not exists:
+            try:
+                connection.execute(text(
+                    f"CREATE VIRTUAL TABLE {ARTICLE_TRIGRAM_TABLE} "
+                    f"USING fts5({', '.join(ARTICLE_TRIGRAM_COLUMNS)}, tokenize='trigram')"
+                ))
+            except OperationalError:
+                _article_trigram_index[str(bind.url)] = False
+                return False
+        
+        for trigger in _ARTICLE_TRIGRAM_TRIGGERS:
+            connection.execute(text(trigger))
+        
+        if not exists:
+            connection.execute(text(_TRIGRAM_INSERT_ARTICLES))
+    
+    _article_trigram_index[str(bind.url)] = True
+    return True
+
+def _has_article_trigram_index(connection):
+    key = str(connection.engine.url)
+    if key not in _article_trigram_index:
+        _article_trigram_index[key] = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {'name': ARTICLE_TRIGRAM_TABLE}
+        ).first() is not None
+    return _article_trigram_index[key]
+
+@event.listens_for(OrmSession, 'after_flush')
+def _index_article_trigrams(session, flush_context):
+    """Add the articles a flush inserted through the ORM to the trigram index."""
+    article_ids = [article.id for article in session.new if isinstance(article, Article)]
+    if article_ids and _has_article_trigram_index(session.connection()):
+        for chunk in _chunks(article_ids, LOOKUP_MAX_PARAMETERS):
+            session.execute(text(f"{_TRIGRAM_INSERT_ARTICLES} WHERE id IN :ids")
+                            .bindparams(bindparam('ids', expanding=True)), {'ids': chunk})
+
+def _transpositions(word):
+    """The word and every variant of it with two adjacent letters swapped."""
+    return {word} | {word[:i] + word[i + 1] + word[i] + word[i + 2:] for i in range(len(word) - 1)}
+
+def _fuzzy_candidates(session, match, ranked):
+    order = " ORDER BY rank" if ranked else ""
+    return session.execute(text(
+        f"SELECT rowid, {_TRIGRAM_TEXT} FROM {ARTICLE_TRIGRAM_TABLE} "
+        f"WHERE {ARTICLE_TRIGRAM_TABLE} MATCH :match{order} LIMIT :candidates"
+    ), {'match': match, 'candidates': FUZZY_CANDIDATES}).all()
+
+def fuzzy_search_articles(session, query, limit=50):
+    """Find articles whose FBEN or artikel resembles the search input despite typos.
+    
+    Candidates come from the trigram index in up to two passes and are ranked by
+    text_similarity(); matches below FUZZY_MIN_SIMILARITY are dropped.
+    
+    1. Texts where every query word, or a variant of it with two adjacent letters
+       swapped, starts a word. This intersects trigram lists, so it is cheap, and
+       covers å/ä/ö typed as a/o and transposed letters.
+    2. Only if that finds nothing: the texts sharing the most trigrams with the
+       query words (bm25), for missing, extra or wrong letters. This pass has to
+       rank every text sharing a trigram and is much slower on large catalogs.
+    
+    Returns Article objects (with their document loaded), best match first.
+    """
+    words = (normalize_search_text(query) or '').split()
+    variants = [sorted(_transpositions(word)) for word in words if len(word) >= 3]
+    if not variants:
+        return []
+    
+    word_starts = ' AND '.join(
+        '(' + ' OR '.join(f'" {variant}"' for variant in word_variants) + ')' for word_variants in variants
+    )
+    trigrams = set()
+    for word_variants in variants:
+        for variant in word_variants:
+            trigrams |= word_trigrams(f" {variant} ")
+    shared_trigrams = ' OR '.join(f'"{trigram}"' for trigram in sorted(trigrams))
+    
+    similarities = {}
+    for match, ranked in ((word_starts, False), (shared_trigrams, True)):
+        try:
+            candidates = _fuzzy_candidates(session, match, ranked)
+        except OperationalError:  # no trigram index in this database
+            return []
+        for article_id, normalized in candidates:
+            similarity = text_similarity(words, normalized)
+            if similarity >= FUZZY_MIN_SIMILARITY:
+                similarities[article_id] = similarity
+        if similarities:
+            break
+    
+    best = sorted(similarities, key=lambda article_id: (-similarities[article_id], article_id))[:limit]
+    articles = {
+        article.id: article for article in
+        session.query(Article).options(joinedload(Article.document)).filter(Article.id.in_(best))
+    }
+    return [articles[article_id] for article_id in best if article_id in articles]
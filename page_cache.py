@@ -0,0 +1,86 @@
+"""
+Diskcache för sidlayout (text, ord med koordinater, tabellceller) från pdfplumber
+
+Posterna nycklas på dokumentets innehållshash, sidnummer och extraktorversion, så att
+tolkningsreglerna kan köras om mot sparad layout utan ny layoutanalys.
+"""
+
+import gzip
+import json
+import os
+import tempfile
+
+DEFAULT_CACHE_DIR = '.page_cache'
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+class PageCache:
+    """Storleksbegränsad cache med en komprimerad JSON-fil per sida
+
+    Läsning uppdaterar filens ändringstid, så trim() tar bort de poster
+    som använts längst tillbaka först.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, version=1, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.version = version
+        self.max_bytes = max_bytes
+
+    def _path(self, doc_hash, key):
+        return os.path.join(self.directory, doc_hash[:2], f"{doc_hash}-{key}-v{self.version}.json.gz")
+
+    def get(self, doc_hash, key):
+        """Hämtar en post, eller None om den saknas eller inte går att läsa"""
+        path = self._path(doc_hash, key)
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def put(self, doc_hash, key, data):
+        """Sparar en post. Skrivs till en temporär fil först så att samtidiga processer aldrig läser halva filer."""
+        path = self._path(doc_hash, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as raw, gzip.open(raw, 'wt', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def trim(self):
+        """Tar bort de äldsta posterna tills cachen ryms inom max_bytes. Returnerar antal borttagna."""
+        entries = []
+        total_bytes = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total_bytes += stat.st_size
+
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_bytes -= size
+            removed += 1
+
+        return removed
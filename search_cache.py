@@ -0,0 +1,64 @@
+"""
+In-memory cache of article search results, invalidated when articles change.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+# Cached result pages kept before the least recently used are dropped
+SEARCH_CACHE_SIZE = 1024
+
+# Seconds a cached page is served before it is computed again
+SEARCH_CACHE_TTL = 600.0
+
+class SearchResultCache:
+    """Bounded LRU cache with a TTL for search result pages.
+
+    Every lookup passes the current article catalog generation (bumped by
+    triggers whenever articles or their searchable columns change). When it differs
+    from the generation the cached pages were computed for, the whole cache is
+    dropped, so a page is never served after the articles it lists have changed.
+    """
+
+    def __init__(self, max_entries=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.generation = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _current(self, generation):
+        """Drop the cache for a newer generation; False for an older one (a slow request)."""
+        if self.generation is None or generation > self.generation:
+            self._entries.clear()
+            self.generation = generation
+        return generation == self.generation
+
+    def get(self, key, generation):
+        """Cached value for `key` computed at `generation`, or None."""
+        with self._lock:
+            entry = self._entries.get(key) if self._current(generation) else None
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, generation, value):
+        """Cache `value`, computed from the articles at catalog `generation`."""
+        with self._lock:
+            if not self._current(generation):
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
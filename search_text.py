@@ -0,0 +1,70 @@
+"""
+Text normalization and similarity for typo-tolerant article search.
+"""
+import re
+import unicodedata
+from functools import lru_cache
+
+# Letters that don't decompose into a base letter and a combining mark
+_FOLDED_LETTERS = str.maketrans({'ø': 'o', 'æ': 'ae', 'đ': 'd', 'ł': 'l'})
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+def normalize_search_text(value):
+    """Fold text to lowercase ASCII letters, digits and single spaces.
+
+    Diacritics are dropped, so 'Hjälm', 'HJALM' and 'hjälm' all become 'hjalm',
+    and punctuation separates words ('REP DYN 10,5MM' -> 'rep dyn 10 5mm').
+    """
+    if value is None:
+        return None
+    folded = value.casefold()
+    if not folded.isascii():
+        decomposed = unicodedata.normalize('NFKD', folded.translate(_FOLDED_LETTERS))
+        folded = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return _NON_ALNUM.sub(' ', folded).strip()
+
+def compact_search_text(value):
+    """normalize_search_text() without spaces, for codes that users type with or
+    without their separators ('F8009-123456' and 'f8009 123456' -> 'f8009123456')."""
+    normalized = normalize_search_text(value)
+    return normalized.replace(' ', '') if normalized is not None else None
+
+def word_trigrams(word):
+    """The overlapping three-letter substrings of a word (none for shorter words)."""
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+def edit_distance(a, b):
+    """Optimal string alignment distance: insertions, deletions, substitutions and
+    swaps of two adjacent letters each count as one edit."""
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[len(b)]
+
+@lru_cache(maxsize=65536)  # the same words recur across many candidate texts
+def word_similarity(query_word, word):
+    """Similarity between 0 and 1 of a typed word and a word in the text.
+
+    The typed word is also compared with the start of the word, so an
+    unfinished word ('karbin') matches the whole word ('karbinhake').
+    """
+    best = 0.0
+    for candidate in {word, word[:len(query_word)]}:
+        length = max(len(query_word), len(candidate))
+        if length:
+            best = max(best, 1 - edit_distance(query_word, candidate) / length)
+    return best
+
+def text_similarity(query_words, text):
+    """Mean over the typed words of their best word similarity in a normalized text."""
+    words = text.split() if text else []
+    if not query_words or not words:
+        return 0.0
+    return sum(max(word_similarity(query_word, word) for word in words)
+               for query_word in query_words) / len(query_words)
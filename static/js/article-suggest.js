@@ -0,0 +1,50 @@
+/**
+ * Autocomplete for the article search fields
+ */
+
+const SUGGEST_DELAY = 100;
+const SUGGEST_FIELD_LABELS = { fbet: 'FBET', fben: 'FBEN', artikel: 'Artikel' };
+
+function attachArticleSuggestions(input, index) {
+    const list = document.createElement('datalist');
+    list.id = `articleSuggestions${index}`;
+    input.after(list);
+    input.setAttribute('list', list.id);
+    input.setAttribute('autocomplete', 'off');
+
+    let timer = null;
+    let controller = null;
+
+    input.addEventListener('input', function() {
+        clearTimeout(timer);
+        const query = input.value.trim();
+        if (!query) {
+            list.replaceChildren();
+            return;
+        }
+
+        timer = setTimeout(() => {
+            if (controller) controller.abort();
+            controller = new AbortController();
+
+            fetch(`/api/articles/suggest?q=${encodeURIComponent(query)}`, { signal: controller.signal })
+                .then(response => response.json())
+                .then(data => {
+                    list.replaceChildren(...data.suggestions.map(suggestion => {
+                        const option = document.createElement('option');
+                        option.value = suggestion.value;
+                        option.label = SUGGEST_FIELD_LABELS[suggestion.field];
+                        return option;
+                    }));
+                })
+                .catch(error => {
+                    if (error.name !== 'AbortError') console.error('Kunde inte hämta förslag:', error);
+                });
+        }, SUGGEST_DELAY);
+    });
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('form[action="/articles/search"] input[name="q"]')
+        .forEach(attachArticleSuggestions);
+});
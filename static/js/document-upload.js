@@ -0,0 +1,78 @@
+/**
+ * PDF upload with progress for the background extraction job
+ */
+
+const JOB_POLL_INTERVAL = 1000;
+
+function showUploadStatus(message, percent, style) {
+    const status = document.getElementById('documentUploadStatus');
+    const bar = status.querySelector('.progress-bar');
+
+    status.style.display = 'block';
+    document.getElementById('documentUploadMessage').textContent = message;
+    if (percent !== null) {
+        bar.style.width = `${percent}%`;
+    }
+    bar.className = `progress-bar${style ? ' bg-' + style : ' progress-bar-striped progress-bar-animated'}`;
+}
+
+function pollJob(jobUrl, button) {
+    fetch(jobUrl)
+        .then(response => response.json())
+        .then(job => {
+            if (job.status === 'queued' || job.status === 'running') {
+                const percent = job.pages_total ? Math.round(100 * job.pages_done / job.pages_total) : 0;
+                const pages = job.pages_total ? `sida ${job.pages_done} av ${job.pages_total}` : 'väntar';
+                showUploadStatus(`Extraherar ${job.filename}: ${pages}, ${job.articles_found} artiklar hittills`, percent);
+                setTimeout(() => pollJob(jobUrl, button), JOB_POLL_INTERVAL);
+                return;
+            }
+
+            button.disabled = false;
+            if (job.status === 'done') {
+                const counts = job.counts;
+                showUploadStatus(`✅ ${job.filename} är klar: ${job.articles_found} artiklar ` +
+                                 `(${counts.inserted} nya, ${counts.updated} uppdaterade, ${counts.deleted} borttagna)`,
+                                 100, 'success');
+            } else if (job.status === 'unchanged') {
+                showUploadStatus(`${job.filename} är redan indexerad och oförändrad`, 100, 'secondary');
+            } else {
+                showUploadStatus(`❌ Extraktionen misslyckades: ${job.error}`, 100, 'danger');
+            }
+        })
+        .catch(error => {
+            button.disabled = false;
+            showUploadStatus(`❌ Kunde inte hämta status: ${error}`, null, 'danger');
+        });
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    const form = document.getElementById('documentUploadForm');
+    if (!form) return;
+
+    form.addEventListener('submit', function(e) {
+        e.preventDefault();
+        const fileInput = document.getElementById('documentFileInput');
+        const button = document.getElementById('documentUploadButton');
+        if (!fileInput.files.length) return;
+
+        const formData = new FormData();
+        formData.append('file', fileInput.files[0]);
+        button.disabled = true;
+        showUploadStatus(`Laddar upp ${fileInput.files[0].name}...`, 0);
+
+        fetch('/api/documents', { method: 'POST', body: formData })
+            .then(response => response.json().then(data => ({ response, data })))
+            .then(({ response, data }) => {
+                if (!response.ok) {
+                    throw new Error(data.error || response.statusText);
+                }
+                fileInput.value = '';
+                pollJob(response.headers.get('Location'), button);
+            })
+            .catch(error => {
+                button.disabled = false;
+                showUploadStatus(`❌ Uppladdningen misslyckades: ${error.message}`, null, 'danger');
+            });
+    });
+});
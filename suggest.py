@@ -0,0 +1,124 @@
+"""
+In-memory prefix index for autocompleting article searches.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from models import Article, article_catalog_generation, get_session
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks of the article catalog generation
+REFRESH_CHECK_INTERVAL = 2.0
+
+# While articles keep changing (an extraction is writing chunks), rebuild at most this often
+MAX_STALE_SECONDS = 30.0
+
+# Suggestion fields in priority order for equal keys
+SUGGEST_FIELDS = ('fbet', 'fben', 'artikel')
+
+def _suggest_keys(value):
+    """Lookup keys for a value: the whole value and each word after the first, case-folded."""
+    folded = value.casefold()
+    keys = [folded]
+    keys.extend(word for word in folded.split()[1:])
+    return keys
+
+class ArticleSuggestIndex:
+    """Sorted prefix index over FBET codes, FBEN codes and artikel words.
+    
+    Lookups are a binary search in a sorted list of case-folded keys, so they
+    don't touch the database. The index is rebuilt on a background thread when
+    the article catalog generation has changed and then stayed the same for one
+    check (checked at most every `refresh_interval` seconds, on lookup), or after
+    MAX_STALE_SECONDS of continuous writes. Lookups keep using the previous
+    index until the new one is ready.
+    """
+    
+    def __init__(self, session_factory=get_session, refresh_interval=REFRESH_CHECK_INTERVAL):
+        self.session_factory = session_factory
+        self.refresh_interval = refresh_interval
+        self.generation = None
+        self._index = ([], [])  # (sorted keys, entry for each key)
+        self._next_check = 0.0
+        self._checked_generation = None
+        self._built_at = 0.0
+        self._rebuilding = threading.Lock()
+    
+    def __len__(self):
+        return len(self._index[0])
+    
+    def build(self):
+        """Rebuild the index from the articles table."""
+        with self._rebuilding:
+            self._build()
+    
+    def _build(self):
+        started = time.perf_counter()
+        session = self.session_factory()
+        try:
+            generation = article_catalog_generation(session)
+            pairs = []
+            for priority, field in enumerate(SUGGEST_FIELDS):
+                column = getattr(Article, field)
+                for (value,) in session.query(column).filter(column.isnot(None), column != '').distinct():
+                    entry = (field, value)
+                    pairs.extend((key, priority, entry) for key in _suggest_keys(value))
+        finally:
+            session.close()
+        
+        pairs.sort(key=lambda pair: (pair[0], pair[1], pair[2][1]))
+        keys = [key for key, _, _ in pairs]
+        entries = [entry for _, _, entry in pairs]
+        
+        # Swap in a single attribute so concurrent lookups see either index, never a mix
+        self._index = (keys, entries)
+        self.generation = generation
+        self._built_at = time.monotonic()
+        logger.info("Built suggestion index for generation %s: %d keys in %.2f s",
+                    generation, len(keys), time.perf_counter() - started)
+    
+    def _refresh_if_stale(self):
+        now = time.monotonic()
+        if now < self._next_check or self._rebuilding.locked():
+            return
+        self._next_check = now + self.refresh_interval
+        
+        session = self.session_factory()
+        try:
+            generation = article_catalog_generation(session)
+        finally:
+            session.close()
+        settled = generation == self._checked_generation or now - self._built_at >= MAX_STALE_SECONDS
+        self._checked_generation = generation
+        if generation != self.generation and settled and self._rebuilding.acquire(blocking=False):
+            threading.Thread(target=self._rebuild_in_background, name='suggest-index', daemon=True).start()
+    
+    def _rebuild_in_background(self):
+        try:
+            self._build()
+        except Exception:
+            logger.exception("Rebuilding the suggestion index failed")
+        finally:
+            self._rebuilding.release()
+    
+    def suggest(self, query, limit=10):
+        """Return up to `limit` distinct suggestions whose key starts with `query`."""
+        self._refresh_if_stale()
+        prefix = ' '.join(query.casefold().split())
+        if not prefix:
+            return []
+        
+        keys, entries = self._index
+        suggestions = []
+        seen = set()
+        position = bisect_left(keys, prefix)
+        while position < len(keys) and len(suggestions) < limit and keys[position].startswith(prefix):
+            entry = entries[position]
+            if entry not in seen:
+                seen.add(entry)
+                suggestions.append({'field': entry[0], 'value': entry[1]})
+            position += 1
+        return suggestions
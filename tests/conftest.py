@@ -0,0 +1,59 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Skripten ligger direkt i projektroten och importeras som moduler
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import extract_articles
+from migrations import migrate_database
+from models import Base
+
+@pytest.fixture
+def db_engine(tmp_path):
+    """En tom databas i tmp_path med alla tabeller och migreringar"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(engine)
+    migrate_database(engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def make_session(db_engine):
+    return sessionmaker(bind=db_engine)
+
+@pytest.fixture
+def session(make_session):
+    session = make_session()
+    yield session
+    session.close()
+
+@pytest.fixture
+def patch_get_session(make_session, monkeypatch):
+    """Låter extract_articles.py öppna sina sessioner mot testdatabasen"""
+    monkeypatch.setattr(extract_articles, 'get_session', make_session)
+    return make_session
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    """app.py, importerad i en tom mapp eftersom den skapar databas och mappar vid importen
+    
+    models.py har redan skapat sin engine mot pdf_index.db i projektroten, så den
+    pekas om till en databas i samma tomma mapp.
+    """
+    import models
+    
+    directory = tmp_path_factory.mktemp('app')
+    models.engine = create_engine(f"sqlite:///{directory / 'pdf_index.db'}")
+    models.Session.configure(bind=models.engine)
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        import app
+    finally:
+        os.chdir(cwd)
+    return app
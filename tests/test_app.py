@@ -0,0 +1,35 @@
+"""Pagination cursors of the web app."""
+
+import base64
+import json
+from datetime import datetime
+
+import pytest
+
+def token(state):
+    return base64.urlsafe_b64encode(json.dumps(state).encode()).decode().rstrip('=')
+
+def test_cursor_round_trip(app_module):
+    after = (datetime(2024, 1, 2, 3, 4, 5), 42)
+    cursor = app_module.encode_cursor(after, 120, 50)
+
+    assert app_module.decode_cursor(cursor, datetime.fromisoformat, int) == (after, 120, 50)
+    assert app_module.decode_cursor(app_module.encode_cursor((-1.5, 7), 3, 1), float, int) == ((-1.5, 7), 3, 1)
+
+@pytest.mark.parametrize('cursor', [
+    None,
+    '',
+    '!!!',
+    'not-base64',
+    base64.urlsafe_b64encode(b'\xff\xfe').decode(),
+    token([1, 2, 3]),
+    token({'after': [1], 'total': 10}),
+    token({'after': [1, 2], 'total': 10, 'offset': 0}),
+    token({'after': ['abc'], 'total': 10, 'offset': 0}),
+    token({'after': [[1]], 'total': 10, 'offset': 0}),
+    token({'after': [1], 'total': None, 'offset': 0}),
+    token({'after': [1], 'total': 10, 'offset': -5}),
+    token({'after': [1], 'total': -1, 'offset': 0}),
+])
+def test_malformed_or_tampered_cursor_gives_the_first_page(app_module, cursor):
+    assert app_module.decode_cursor(cursor, int) == (None, None, 0)
@@ -0,0 +1,107 @@
+"""Vilka dokument som behöver extraheras på nytt: oförändrade, ändrade, omdöpta och kopierade filer"""
+
+import os
+
+import pytest
+
+import extract_articles
+from extract_articles import check_document_changes, compute_content_hash
+from models import PDFDocument
+
+pytestmark = pytest.mark.usefixtures('patch_get_session')
+
+CONTENT = b'%PDF-1.4 manual'
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / 'manual.pdf'
+    path.write_bytes(CONTENT)
+    return path
+
+def record_extracted(make_session, pdf_path):
+    """Sparar dokumentet med fingeravtryck som efter en avslutad extraktion"""
+    stat = pdf_path.stat()
+    session = make_session()
+    document = PDFDocument(filename=pdf_path.name, file_path=str(pdf_path), file_size=stat.st_size,
+                           file_mtime=stat.st_mtime, content_hash=compute_content_hash(pdf_path))
+    session.add(document)
+    session.commit()
+    document_id = document.id
+    session.close()
+    return document_id
+
+def stored_document(make_session, document_id):
+    session = make_session()
+    try:
+        return session.get(PDFDocument, document_id)
+    finally:
+        session.close()
+
+def touch(path, seconds_later=10):
+    stat = path.stat()
+    os.utime(path, (stat.st_atime, stat.st_mtime + seconds_later))
+
+def test_same_size_and_mtime_is_unchanged_without_hashing(make_session, pdf_path, monkeypatch):
+    record_extracted(make_session, pdf_path)
+    hashed = []
+    monkeypatch.setattr(extract_articles, 'compute_content_hash', lambda path: hashed.append(path))
+
+    status, fingerprint = check_document_changes(pdf_path)
+
+    assert status == 'unchanged'
+    assert hashed == []
+    assert fingerprint['content_hash'] is None
+
+def test_touched_but_identical_file_is_unchanged(make_session, pdf_path):
+    document_id = record_extracted(make_session, pdf_path)
+    touch(pdf_path)
+
+    status, fingerprint = check_document_changes(pdf_path)
+
+    assert status == 'unchanged'
+    assert fingerprint['content_hash'] == compute_content_hash(pdf_path)
+    # Den nya ändringstiden sparas, så nästa körning behöver inte hasha igen
+    assert stored_document(make_session, document_id).file_mtime == pdf_path.stat().st_mtime
+
+def test_changed_bytes_are_changed(make_session, pdf_path):
+    record_extracted(make_session, pdf_path)
+    pdf_path.write_bytes(CONTENT.replace(b'manual', b'MANUAL'))
+    touch(pdf_path)
+
+    status, fingerprint = check_document_changes(pdf_path)
+
+    assert status == 'changed'
+    assert fingerprint['content_hash'] == compute_content_hash(pdf_path)
+
+def test_renamed_file_keeps_its_document(make_session, pdf_path):
+    document_id = record_extracted(make_session, pdf_path)
+    renamed = pdf_path.rename(pdf_path.with_name('manual-2024.pdf'))
+
+    status, _ = check_document_changes(renamed)
+
+    assert status == 'unchanged'
+    document = stored_document(make_session, document_id)
+    assert document.filename == 'manual-2024.pdf'
+    assert document.file_path == str(renamed.absolute())
+
+def test_copy_next_to_the_original_is_new(make_session, pdf_path):
+    document_id = record_extracted(make_session, pdf_path)
+    copy = pdf_path.with_name('manual-copy.pdf')
+    copy.write_bytes(CONTENT)
+
+    status, _ = check_document_changes(copy)
+
+    assert status == 'new'
+    assert stored_document(make_session, document_id).filename == pdf_path.name
+
+def test_interrupted_extraction_is_never_unchanged(make_session, pdf_path):
+    document_id = record_extracted(make_session, pdf_path)
+    session = make_session()
+    session.get(PDFDocument, document_id).checkpoint_page = 3
+    session.commit()
+    session.close()
+
+    status, fingerprint = check_document_changes(pdf_path)
+
+    assert status == 'interrupted'
+    assert fingerprint['content_hash'] == compute_content_hash(pdf_path)
@@ -0,0 +1,106 @@
+"""Extraction claims are leases that expire unless they are renewed."""
+
+import os
+import socket
+import time
+from argparse import Namespace
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from sqlalchemy import select
+
+import extract_articles
+from extract_articles import CLAIM_LEASE_SECONDS, claim_document, process_documents, release_document, renew_claims
+from jobs import ExtractionJobQueue
+from models import ExtractionClaim
+
+pytestmark = pytest.mark.usefixtures('patch_get_session')
+
+PDF_PATH = Path('manual.pdf')
+
+def add_claim(make_session, owner, age_seconds):
+    session = make_session()
+    session.add(ExtractionClaim(filename=PDF_PATH.name, owner=owner,
+                                claimed_at=datetime.utcnow() - timedelta(seconds=age_seconds)))
+    session.commit()
+    session.close()
+
+def backdate_claims(make_session, age_seconds):
+    session = make_session()
+    session.execute(ExtractionClaim.__table__.update().values(
+        claimed_at=datetime.utcnow() - timedelta(seconds=age_seconds)
+    ))
+    session.commit()
+    session.close()
+
+def claimed_at(make_session):
+    session = make_session()
+    try:
+        return session.execute(select(ExtractionClaim.claimed_at)).scalar_one()
+    finally:
+        session.close()
+
+def test_live_claim_from_another_host_is_respected(make_session):
+    add_claim(make_session, 'other-host:1:1', age_seconds=60)
+
+    assert claim_document(PDF_PATH) is None
+
+def test_expired_claim_from_another_host_is_taken_over(make_session):
+    add_claim(make_session, 'other-host:1:1', age_seconds=CLAIM_LEASE_SECONDS + 1)
+
+    owner = claim_document(PDF_PATH)
+    assert owner is not None
+    release_document(PDF_PATH, owner)
+
+def test_expired_claim_with_a_reused_pid_is_taken_over(make_session):
+    # A restarted container gets the same hostname and PID as the run it replaced
+    add_claim(make_session, f"{socket.gethostname()}:{os.getpid()}:1", age_seconds=CLAIM_LEASE_SECONDS + 1)
+
+    assert claim_document(PDF_PATH) is not None
+
+def test_renewed_claim_does_not_expire(make_session):
+    owner = claim_document(PDF_PATH)
+    backdate_claims(make_session, CLAIM_LEASE_SECONDS - 1)
+
+    renew_claims({PDF_PATH: owner})
+
+    assert datetime.utcnow() - claimed_at(make_session) < timedelta(seconds=60)
+
+def test_job_fails_instead_of_waiting_for_a_live_claim(make_session):
+    add_claim(make_session, 'other-host:1:1', age_seconds=0)
+
+    job = ExtractionJobQueue(claim_wait=0).submit(PDF_PATH)
+    deadline = time.monotonic() + 10
+    while job.finished_at is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert job.status == 'failed'
+    assert 'another process' in job.error
+
+def test_claim_of_a_long_extraction_is_not_taken_over(make_session, tmp_path, monkeypatch):
+    pdf_path = tmp_path / PDF_PATH.name
+    pdf_path.write_bytes(b'%PDF-1.4 manual')
+    monkeypatch.setattr(extract_articles, 'CLAIM_RENEW_SECONDS', 0.05)
+    taken_over = []
+
+    def extract_for_longer_than_the_lease(*args):
+        # As if the extraction had been running since longer than the lease ago
+        backdate_claims(make_session, CLAIM_LEASE_SECONDS + 60)
+        deadline = time.monotonic() + 10
+        while datetime.utcnow() - claimed_at(make_session) > timedelta(seconds=60):
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        taken_over.append(claim_document(pdf_path))
+        return iter(())
+
+    monkeypatch.setattr(extract_articles, 'iter_written_documents', extract_for_longer_than_the_lease)
+    args = Namespace(jobs=1, workers=1, force=False, stream=False, prefilter=True, resume=False, stats_file=None)
+
+    assert process_documents([pdf_path], args) == []
+    assert taken_over == [None]
+    session = make_session()
+    try:
+        assert session.query(ExtractionClaim).count() == 0
+    finally:
+        session.close()
@@ -0,0 +1,67 @@
+"""Searches while an extraction writes, as the web app and extract_articles.py do."""
+
+import threading
+
+from sqlalchemy import text
+
+from extract_articles import ArticleDeltaWriter
+from models import PDFDocument, keyset_page, search_articles_query
+
+READERS = 3
+PAGES = 40
+PAGE_ROWS = 25
+
+def page_articles(page_num):
+    return [{'fbet': f"F8009-{page_num * PAGE_ROWS + row:06d}", 'fben': 'KARB HMS',
+             'artikel': f"Karbinhake {row}", 'link': None}
+            for row in range(PAGE_ROWS)]
+
+def test_searches_while_an_extraction_commits_per_page(db_engine, make_session):
+    stop = threading.Event()
+    errors = []
+    searches = []
+
+    def read():
+        while not stop.is_set():
+            session = make_session()
+            try:
+                for query in ('F8009-0000', 'KARB', 'karbinhake'):
+                    ids, _ = keyset_page(*search_articles_query(session, query), page_size=50)
+                    searches.append(len(ids))
+            except Exception as e:
+                errors.append(e)
+                return
+            finally:
+                session.close()
+
+    def write():
+        session = make_session()
+        try:
+            document = PDFDocument(filename='concurrency.pdf')
+            session.add(document)
+            session.commit()
+            writer = ArticleDeltaWriter(session, document.id)
+            for page_num in range(PAGES):
+                writer.add(page_articles(page_num))
+                writer.checkpoint(page_num)
+                session.commit()
+            writer.finish()
+            session.commit()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            session.close()
+
+    readers = [threading.Thread(target=read) for _ in range(READERS)]
+    for reader in readers:
+        reader.start()
+    write()
+    stop.set()
+    for reader in readers:
+        reader.join()
+
+    assert errors == []
+    assert searches
+    with db_engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == 'wal'
+        assert connection.execute(text("SELECT count(*) FROM articles")).scalar() == PAGES * PAGE_ROWS
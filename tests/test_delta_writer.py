@@ -0,0 +1,113 @@
+"""Re-extracting a document writes only the difference and keeps article IDs and images."""
+
+import pytest
+
+from extract_articles import ArticleDeltaWriter
+from models import Article, PDFDocument
+
+FIRST_EXTRACTION = [
+    {'fbet': 'F8009-000001', 'fben': 'KARB HMS', 'artikel': 'Karbinhake', 'link': None},
+    {'fbet': 'F8009-000002', 'fben': 'REP DYN', 'artikel': 'Klätterrep', 'link': None},
+    {'fbet': 'F8009-000003', 'fben': 'HJÄLM STD', 'artikel': 'Hjälm', 'link': None},
+    {'fbet': 'F8009-000004', 'fben': 'SELE PPE', 'artikel': 'Sele', 'link': None},
+    {'fbet': 'F8009-000004', 'fben': 'SELE PPE', 'artikel': 'Sele', 'link': None},
+]
+
+# 1 unchanged, 2 renamed, 3 gone, 4 once instead of twice, 5 new
+SECOND_EXTRACTION = [
+    {'fbet': 'F8009-000001', 'fben': 'KARB HMS', 'artikel': 'Karbinhake', 'link': None},
+    {'fbet': 'F8009-000002', 'fben': 'REP DYN', 'artikel': 'Klätterrep dynamiskt', 'link': 'https://example.com'},
+    {'fbet': 'F8009-000004', 'fben': 'SELE PPE', 'artikel': 'Sele', 'link': None},
+    {'fbet': 'F8009-000005', 'fben': 'BROMS AL', 'artikel': 'Repbroms', 'link': None},
+]
+
+def extract(session, document_id, articles, chunk_size=2):
+    writer = ArticleDeltaWriter(session, document_id, chunk_size=chunk_size)
+    writer.add(articles)
+    result = writer.finish()
+    session.commit()
+    return result
+
+def stored(session, document_id):
+    return {article.id: article for article in
+            session.query(Article).filter_by(document_id=document_id).order_by(Article.id)}
+
+@pytest.fixture
+def document_id(session):
+    document = PDFDocument(filename='manual.pdf')
+    session.add(document)
+    session.commit()
+    extract(session, document.id, FIRST_EXTRACTION)
+    for article in stored(session, document.id).values():
+        article.image_url = f"/static/uploads/{article.id}.jpg"
+    session.commit()
+    return document.id
+
+def test_first_extraction_inserts_every_row(session, document_id):
+    assert len(stored(session, document_id)) == len(FIRST_EXTRACTION)
+
+def test_reextraction_keeps_ids_and_images(session, document_id):
+    before = stored(session, document_id)
+    ids = {article.fbet: article.id for article in reversed(list(before.values()))}
+
+    counts, orphaned_images = extract(session, document_id, SECOND_EXTRACTION)
+
+    assert counts == {'inserted': 1, 'updated': 1, 'deleted': 2, 'unchanged': 2}
+    after = stored(session, document_id)
+    for fbet in ('F8009-000001', 'F8009-000002', 'F8009-000004'):
+        article = after[ids[fbet]]
+        assert article.fbet == fbet
+        assert article.image_url == f"/static/uploads/{ids[fbet]}.jpg"
+    assert after[ids['F8009-000002']].artikel == 'Klätterrep dynamiskt'
+    assert after[ids['F8009-000002']].link == 'https://example.com'
+    # The older of the two duplicates is kept
+    removed_ids = [ids['F8009-000003'], max(before)]
+    assert sorted(orphaned_images) == sorted(f"/static/uploads/{article_id}.jpg" for article_id in removed_ids)
+
+def test_reextraction_deletes_rows_that_disappeared(session, document_id):
+    extract(session, document_id, SECOND_EXTRACTION)
+
+    after = stored(session, document_id).values()
+    assert sorted(article.fbet for article in after) == [
+        'F8009-000001', 'F8009-000002', 'F8009-000004', 'F8009-000005'
+    ]
+
+def test_new_rows_get_ids_after_the_existing_ones(session, document_id):
+    first_new_id = max(stored(session, document_id)) + 1
+
+    extract(session, document_id, SECOND_EXTRACTION)
+
+    new = session.query(Article).filter_by(document_id=document_id, fbet='F8009-000005').one()
+    assert new.id >= first_new_id
+    assert new.image_url is None
+
+def test_unchanged_reextraction_writes_nothing(session, document_id):
+    before = {article_id: (article.fbet, article.artikel) for article_id, article in
+              stored(session, document_id).items()}
+
+    counts, orphaned_images = extract(session, document_id, FIRST_EXTRACTION)
+
+    assert counts == {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': len(FIRST_EXTRACTION)}
+    assert orphaned_images == []
+    assert {article_id: (article.fbet, article.artikel) for article_id, article in
+            stored(session, document_id).items()} == before
+
+def test_empty_extraction_keeps_the_stored_articles(session, document_id):
+    counts, _ = extract(session, document_id, [])
+
+    assert counts['deleted'] == 0
+    assert len(stored(session, document_id)) == len(FIRST_EXTRACTION)
+
+def test_resumed_writer_does_not_match_rows_twice(session, document_id):
+    writer = ArticleDeltaWriter(session, document_id, chunk_size=2)
+    writer.add(SECOND_EXTRACTION[:2])
+    writer.checkpoint(0)
+    session.commit()
+
+    resumed = ArticleDeltaWriter(session, document_id, chunk_size=2, state=writer.state())
+    resumed.add(SECOND_EXTRACTION[2:])
+    counts, _ = resumed.finish()
+    session.commit()
+
+    assert counts == {'inserted': 1, 'updated': 1, 'deleted': 2, 'unchanged': 2}
+    assert len(stored(session, document_id)) == len(SECOND_EXTRACTION)
@@ -0,0 +1,92 @@
+"""Extraktion ur syntetiska PDF:er (bara första tabellsidan har tabellhuvud) och tidtagning per steg"""
+
+import time
+
+import pytest
+
+import extract_articles
+from benchmark import write_synthetic_pdf
+from extract_articles import (EXTRACTOR_VERSION, ColumnModel, StageTimer, compute_content_hash, iter_article_pages,
+                              iter_article_pages_parallel, iter_document_articles)
+from page_cache import PageCache
+
+TABLE_PAGES = 6
+ROWS_PER_PAGE = 20
+FILLER_PAGES = 2
+
+def articles_of(pages):
+    return [article for _, page_articles in pages for article in page_articles]
+
+@pytest.fixture(scope='module')
+def pdf_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp('pdfs') / 'manual.pdf'
+    write_synthetic_pdf(path, TABLE_PAGES, ROWS_PER_PAGE, FILLER_PAGES, repeat_header=False)
+    return path
+
+@pytest.fixture(scope='module')
+def sequential(pdf_path):
+    articles = articles_of(iter_article_pages(pdf_path))
+    assert len(articles) == TABLE_PAGES * ROWS_PER_PAGE
+    return articles
+
+def test_range_mid_table_finds_the_header_before_it(pdf_path, sequential):
+    start = FILLER_PAGES + 3
+    pages = iter_article_pages(pdf_path, range(start, FILLER_PAGES + TABLE_PAGES), seek_model=True)
+    assert articles_of(pages) == sequential[3 * ROWS_PER_PAGE:]
+
+def test_parallel_shards_without_known_headers_match_sequential(pdf_path, sequential):
+    # Förfiltreringen (PyPDF2) har inte hittat några tabellhuvuden
+    assert articles_of(iter_article_pages_parallel(pdf_path, 2, [])) == sequential
+
+def test_nested_stages_are_counted_once():
+    timer = StageTimer()
+    started = time.perf_counter()
+    with timer.stage('classify'):
+        time.sleep(0.01)
+        with timer.stage('open'):
+            time.sleep(0.02)
+    elapsed = time.perf_counter() - started
+
+    assert timer.seconds['open'] >= 0.02
+    assert timer.seconds['classify'] < 0.02
+    assert sum(timer.seconds.values()) <= elapsed
+
+def test_known_content_hash_is_not_computed_again(pdf_path, sequential, tmp_path, monkeypatch):
+    content_hash = compute_content_hash(pdf_path)
+    hashed = []
+    monkeypatch.setattr(extract_articles, 'compute_content_hash', lambda path: hashed.append(path) or content_hash)
+    cache = PageCache(str(tmp_path / 'cache'), EXTRACTOR_VERSION)
+
+    pages = iter_document_articles(pdf_path, cache=cache, content_hash=content_hash)
+    assert articles_of(pages) == sequential
+    assert hashed == []
+
+    # Utan känd hash beräknas den, och sidorna läses då ur cachen under samma hash
+    pages = iter_document_articles(pdf_path, cache=cache)
+    assert articles_of(pages) == sequential
+    assert hashed == [pdf_path]
+
+def words_at(top, **cells):
+    """Ord på en rad som börjar vid top, ett per kolumn (fbet, fben, artikel, link)"""
+    x0 = {'fbet': 50, 'fben': 150, 'artikel': 250, 'link': 450}
+    return [{'text': text, 'x0': x0[key], 'top': top, 'bottom': top + 8} for key, text in cells.items()]
+
+def test_column_model_keeps_rows_without_fbet_inside_the_table():
+    model = ColumnModel([('fbet', 50), ('fben', 150), ('artikel', 250), ('link', 450)], page_width=600)
+    words = [
+        *words_at(10, artikel='Kapitel 9'),
+        *words_at(40, fbet='F8009-000001', fben='KARB', artikel='Karbinhake'),
+        *words_at(60, fben='SLINGA', artikel='Slinga'),
+        *words_at(80, artikel='Repbroms'),
+        *words_at(100, fbet='F8009-000002', fben='REP', artikel='Klätterrep'),
+        *words_at(110, artikel='dynamiskt'),
+        *words_at(200, artikel='Sida 1 av 3'),
+    ]
+
+    assert model.extract_articles(words) == [
+        {'fbet': 'F8009-000001', 'fben': 'KARB', 'artikel': 'Karbinhake', 'link': None},
+        {'fbet': None, 'fben': 'SLINGA', 'artikel': 'Slinga', 'link': None},
+        {'fbet': None, 'fben': None, 'artikel': 'Repbroms', 'link': None},
+        {'fbet': 'F8009-000002', 'fben': 'REP', 'artikel': 'Klätterrep dynamiskt', 'link': None},
+    ]
+    assert model.extract_articles(words_at(40, fben='SLINGA', artikel='Slinga')) == []
@@ -0,0 +1,71 @@
+"""Typo-tolerant search finds FBEN codes and article names despite misspellings."""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models import Article, Base, PDFDocument, bulk_insert_articles, fuzzy_search_articles
+
+ARTICLES = [
+    ('F8009-000001', 'KARB HMS', 'Karbinhake skruv'),
+    ('F8009-000002', 'REP DYN 10,5MM', 'Klätterrep dynamiskt'),
+    ('G7773-000003', 'HJÄLM STD', 'Hjälm vuxen'),
+    ('F8009-000004', 'SELE PPE', 'Sele komplett'),
+]
+
+@pytest.fixture
+def session(session):
+    document = PDFDocument(filename='manual.pdf')
+    session.add_all(Article(document=document, fbet=fbet, fben=fben, artikel=artikel)
+                    for fbet, fben, artikel in ARTICLES)
+    session.commit()
+    return session
+
+def found(session, query):
+    return [article.fbet for article in fuzzy_search_articles(session, query)]
+
+@pytest.mark.parametrize('query, fbet', [
+    ('KRAB HMS', 'F8009-000001'),  # adjacent letters swapped
+    ('SELLE', 'F8009-000004'),  # extra letter
+    ('HJLM STD', 'G7773-000003'),  # missing letter
+    ('hjalm', 'G7773-000003'),  # ä typed as a
+    ('karbinhkae', 'F8009-000001'),
+    ('klaterrep', 'F8009-000002'),
+])
+def test_misspelled_codes_and_names_are_found(session, query, fbet):
+    assert found(session, query) == [fbet]
+
+def test_unrelated_and_too_short_input_finds_nothing(session):
+    assert found(session, 'xyzzy') == []
+    assert found(session, 'ka') == []
+    assert found(session, '') == []
+
+def test_matches_load_their_document(session):
+    article, = fuzzy_search_articles(session, 'KRAB HMS')
+    assert article.document.filename == 'manual.pdf'
+
+def test_bulk_inserted_and_renamed_articles_are_found(session):
+    document = session.query(PDFDocument).one()
+    bulk_insert_articles(session, document.id, [
+        {'fbet': 'F8009-000005', 'fben': 'BROMS AL', 'artikel': 'Repbroms', 'link': None},
+        {'fbet': 'F8009-000006', 'fben': 'SLINGA 60', 'artikel': 'Slinga sydd', 'link': None},
+    ], chunk_size=1)
+    session.commit()
+
+    assert found(session, 'BRMOS AL') == ['F8009-000005']
+    assert found(session, 'slniga') == ['F8009-000006']
+
+    session.query(Article).filter_by(fbet='F8009-000006').one().artikel = 'Bandslinga'
+    session.commit()
+    assert found(session, 'bandslnga') == ['F8009-000006']
+    assert found(session, 'slinga sydd') == []
+
+def test_database_without_trigram_index_finds_nothing(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'plain.db'}")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        assert fuzzy_search_articles(session, 'KRAB HMS') == []
+    finally:
+        session.close()
+        engine.dispose()
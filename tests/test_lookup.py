@@ -0,0 +1,101 @@
+"""Batch lookup of FBET/FBEN codes: request validation and IN lists within SQLite's variable limit."""
+
+import sqlite3
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from models import Article, PDFDocument, bulk_insert_articles, lookup_articles_by_code
+
+CODES = 2000
+
+# SQLite builds before 3.32 allow at most 999 bound parameters per statement
+OLD_SQLITE_VARIABLE_LIMIT = 999
+
+@pytest.fixture
+def db_engine(db_engine):
+    @event.listens_for(db_engine, 'connect')
+    def limit_variables(dbapi_connection, connection_record):
+        dbapi_connection.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, OLD_SQLITE_VARIABLE_LIMIT)
+
+    # The pooled connection from the migrations was opened without the limit
+    db_engine.dispose()
+    return db_engine
+
+@pytest.fixture
+def session(session):
+    document = PDFDocument(filename='manual.pdf')
+    session.add(document)
+    session.flush()
+    bulk_insert_articles(session, document.id, [
+        {'fbet': f"F8009-{n:06d}", 'fben': f"KOD {n}", 'artikel': None, 'link': None} for n in range(CODES)
+    ])
+    session.commit()
+    return session
+
+def test_codes_in_both_fields_stay_within_the_variable_limit(session):
+    codes = [f"F8009-{n:06d}" for n in range(CODES)]
+
+    rows = list(lookup_articles_by_code(session.query(Article.fbet), codes))
+
+    assert sorted(fbet for fbet, in rows) == codes
+
+def test_one_field_uses_every_parameter_for_codes(session):
+    codes = [f"KOD {n}" for n in range(CODES)]
+
+    rows = list(lookup_articles_by_code(session.query(Article.fben), codes, fields=('fben',)))
+
+    assert len(rows) == CODES
+
+def test_parameters_over_the_limit_fail(session):
+    codes = [f"F8009-{n:06d}" for n in range(CODES)]
+
+    with pytest.raises(OperationalError):
+        list(lookup_articles_by_code(session.query(Article.fbet), codes, max_parameters=1000))
+
+@pytest.mark.parametrize('body', [
+    {'codes': ['F8009-000001'], 'fields': [['fbet']]},
+    {'codes': ['F8009-000001'], 'fields': [{'fbet': True}]},
+    {'codes': ['F8009-000001'], 'fields': 'fbet'},
+    {'codes': ['F8009-000001'], 'fields': []},
+    {'codes': ['F8009-000001'], 'fields': ['artikel']},
+    {'codes': 'F8009-000001'},
+    {'codes': [1, 2]},
+])
+def test_invalid_lookup_request_is_rejected(app_module, body):
+    response = app_module.app.test_client().post('/api/articles/lookup', json=body)
+
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+def test_duplicate_fields_are_accepted(app_module):
+    response = app_module.app.test_client().post('/api/articles/lookup',
+                                                 json={'codes': ['F8009-000001'], 'fields': ['fbet', 'fbet']})
+
+    assert response.status_code == 200
+    assert response.get_json()['missing'] == ['F8009-000001']
+
+@pytest.fixture
+def app_article(app_module):
+    session = app_module.Session()
+    document = PDFDocument(filename='lookup.pdf')
+    article = Article(document=document, fbet='F8009-999001', fben='KARB DUBBEL', artikel='Karbinhake')
+    session.add(article)
+    session.commit()
+    yield article
+    session.delete(article)
+    session.delete(document)
+    session.commit()
+    session.close()
+
+def test_article_found_in_two_chunks_is_listed_once_per_code(app_module, app_article):
+    # With both fields a chunk holds 450 codes, so the FBET and FBEN end up in different chunks
+    filler = [f"G7773-{n:06d}" for n in range(600)]
+    codes = [app_article.fbet, *filler, app_article.fben]
+
+    response = app_module.app.test_client().post('/api/articles/lookup', json={'codes': codes})
+
+    matches = response.get_json()['matches']
+    assert [article['id'] for article in matches[app_article.fbet]] == [app_article.id]
+    assert [article['id'] for article in matches[app_article.fben]] == [app_article.id]
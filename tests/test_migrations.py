@@ -0,0 +1,79 @@
+"""Schema migrations and the query plans of the hot queries."""
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from migrations import SCHEMA_VERSION, check_query_plans, migrate_database, schema_version
+from models import Base, search_articles_query
+
+# The tables as created before the first migration
+BASELINE_SCHEMA = (
+    """CREATE TABLE pdf_documents (
+        id INTEGER NOT NULL PRIMARY KEY,
+        filename VARCHAR(255) NOT NULL,
+        title VARCHAR(500),
+        author VARCHAR(255),
+        num_pages INTEGER,
+        content TEXT,
+        file_path VARCHAR(500),
+        indexed_at DATETIME
+    )""",
+    """CREATE TABLE articles (
+        id INTEGER NOT NULL PRIMARY KEY,
+        document_id INTEGER NOT NULL REFERENCES pdf_documents (id),
+        fbet VARCHAR(50),
+        fben VARCHAR(50),
+        artikel VARCHAR(500),
+        link VARCHAR(1000),
+        extracted_at DATETIME
+    )""",
+)
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    yield engine
+    engine.dispose()
+
+def test_new_database_uses_indexes(engine):
+    Base.metadata.create_all(engine)
+    migrate_database(engine)
+
+    assert schema_version(engine) == SCHEMA_VERSION
+    assert check_query_plans(engine) == 0
+
+def test_baseline_database_is_upgraded(engine):
+    with engine.begin() as connection:
+        for statement in BASELINE_SCHEMA:
+            connection.execute(text(statement))
+        connection.execute(text("INSERT INTO pdf_documents (id, filename) VALUES (1, 'manual.pdf')"))
+        connection.execute(text(
+            "INSERT INTO articles (document_id, fbet, fben, artikel, extracted_at) "
+            "VALUES (1, 'F8009-123456', 'REP DYN 10,5MM', 'Klätterrep dynamiskt', '2024-01-01 00:00:00')"
+        ))
+
+    applied = migrate_database(engine)
+
+    assert [version for version, _ in applied] == list(range(1, SCHEMA_VERSION + 1))
+    assert schema_version(engine) == SCHEMA_VERSION
+    columns = {column['name'] for column in inspect(engine).get_columns('articles')}
+    assert {'image_url', 'fbet_search', 'fben_search', 'artikel_search'} <= columns
+    with engine.connect() as connection:
+        indexes = set(connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'")).scalars())
+    assert {'ix_articles_fbet', 'ix_articles_fben', 'ix_articles_fbet_code'} <= indexes
+    assert check_query_plans(engine) == 0
+
+    session = sessionmaker(bind=engine)()
+    try:
+        for query in ('F8009-12', 'klatterrep', 'REP DYN'):
+            matches, _ = search_articles_query(session, query)
+            assert [article.fbet for article in matches] == ['F8009-123456'], query
+    finally:
+        session.close()
+
+def test_migrations_run_once(engine):
+    Base.metadata.create_all(engine)
+    migrate_database(engine)
+
+    assert migrate_database(engine) == []
@@ -0,0 +1,97 @@
+"""En strömmande extraktion som avbryts efter en checkpoint fortsätter därifrån med --resume"""
+
+import pytest
+
+from benchmark import write_synthetic_pdf
+from extract_articles import load_checkpoint, stream_document
+from models import Article, PDFDocument
+
+TABLE_PAGES = 6
+ROWS_PER_PAGE = 10
+FILLER_PAGES = 2
+CHECKPOINT_PAGES = 2
+
+pytestmark = pytest.mark.usefixtures('patch_get_session')
+
+class Crash(Exception):
+    pass
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / 'manual.pdf'
+    write_synthetic_pdf(path, TABLE_PAGES, ROWS_PER_PAGE, FILLER_PAGES)
+    return path
+
+def crash_after_page(last_page):
+    """progress-callback som avbryter extraktionen när sidan last_page är klar"""
+    def progress(pages_done, pages_total, articles_found):
+        if pages_done == last_page + 1:
+            raise Crash
+    return progress
+
+def progress_starts(starts):
+    def progress(pages_done, pages_total, articles_found):
+        starts.append(pages_done)
+    return progress
+
+def stored_codes(make_session):
+    session = make_session()
+    try:
+        return [fbet for fbet, in session.query(Article.fbet).order_by(Article.fbet)]
+    finally:
+        session.close()
+
+def interrupted_document(make_session, pdf_path):
+    """Extraherar fram till tre sidor efter första checkpointen och avbryter"""
+    first_checkpoint = FILLER_PAGES + CHECKPOINT_PAGES - 1
+    _, document, _ = stream_document(pdf_path, prefilter=False, checkpoint_pages=CHECKPOINT_PAGES,
+                                     progress=crash_after_page(first_checkpoint + 3))
+    assert document is None
+
+    session = make_session()
+    try:
+        document = session.query(PDFDocument).filter_by(filename=pdf_path.name).one()
+        assert document.checkpoint_page == FILLER_PAGES + 2 * CHECKPOINT_PAGES - 1
+        return document.id
+    finally:
+        session.close()
+
+def test_resume_continues_after_the_checkpoint(make_session, pdf_path):
+    interrupted_document(make_session, pdf_path)
+    # Bara det som skrevs fram till checkpointen finns kvar
+    assert len(stored_codes(make_session)) == 2 * CHECKPOINT_PAGES * ROWS_PER_PAGE
+
+    starts = []
+    result, document, _ = stream_document(pdf_path, prefilter=False, checkpoint_pages=CHECKPOINT_PAGES,
+                                          resume=True, progress=progress_starts(starts))
+
+    assert document is not None
+    assert starts[0] == FILLER_PAGES + 2 * CHECKPOINT_PAGES
+    codes = stored_codes(make_session)
+    assert len(codes) == len(set(codes)) == TABLE_PAGES * ROWS_PER_PAGE
+    assert result['summary']['articles'] == TABLE_PAGES * ROWS_PER_PAGE
+
+    session = make_session()
+    try:
+        assert session.get(PDFDocument, document.id).checkpoint_page is None
+    finally:
+        session.close()
+
+def test_checkpoint_for_other_content_is_ignored(make_session, pdf_path):
+    document_id = interrupted_document(make_session, pdf_path)
+
+    session = make_session()
+    try:
+        assert load_checkpoint(session, document_id, 'other-content-hash') == (None, None)
+    finally:
+        session.close()
+
+    starts = []
+    fingerprint = {'file_size': None, 'file_mtime': None, 'content_hash': 'other-content-hash'}
+    _, document, _ = stream_document(pdf_path, fingerprint, prefilter=False, checkpoint_pages=CHECKPOINT_PAGES,
+                                     resume=True, progress=progress_starts(starts))
+
+    assert document is not None
+    assert starts[0] == 0
+    codes = stored_codes(make_session)
+    assert len(codes) == len(set(codes)) == TABLE_PAGES * ROWS_PER_PAGE
@@ -0,0 +1,84 @@
+"""The JSON search API: keyset pages followed through their next URLs, and the NDJSON stream."""
+
+import json
+
+import pytest
+
+from models import Article, PDFDocument
+
+ARTICLES = 7
+PER_PAGE = 3
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+@pytest.fixture
+def fbets(app_module):
+    session = app_module.Session()
+    document = PDFDocument(filename='search-api.pdf')
+    articles = [Article(document=document, fbet=f"H1111-{n:06d}", fben='SLINGA SYDD', artikel=f"Bandslinga {n}")
+                for n in range(ARTICLES)]
+    session.add_all(articles)
+    session.commit()
+    yield sorted(article.fbet for article in articles)
+    for article in articles:
+        session.delete(article)
+    session.delete(document)
+    session.commit()
+    session.close()
+
+def test_page_shape(client, fbets):
+    response = client.get('/api/articles/search', query_string={'q': 'bandslinga', 'per_page': PER_PAGE})
+
+    assert response.status_code == 200
+    page = response.get_json()
+    assert set(page) == {'query', 'fuzzy', 'total', 'start', 'end', 'next', 'articles'}
+    assert (page['query'], page['fuzzy'], page['total'], page['start'], page['end']) == (
+        'bandslinga', False, ARTICLES, 1, PER_PAGE)
+    assert page['next'].startswith('/api/articles/search?')
+    article = page['articles'][0]
+    assert set(article) == {'id', 'document_id', 'document', 'fbet', 'fben', 'artikel', 'link', 'image_url',
+                            'extracted_at'}
+    assert article['document'] == 'search-api.pdf'
+
+def test_next_urls_walk_every_match_once(client, fbets):
+    url = f"/api/articles/search?q=bandslinga&per_page={PER_PAGE}"
+    seen = []
+    positions = []
+    while url:
+        page = client.get(url).get_json()
+        seen += [article['fbet'] for article in page['articles']]
+        positions.append((page['start'], page['end'], page['total']))
+        url = page['next']
+
+    assert sorted(seen) == fbets
+    assert len(seen) == len(set(seen))
+    assert positions == [(1, 3, ARTICLES), (4, 6, ARTICLES), (7, 7, ARTICLES)]
+
+def test_missing_query_is_rejected(client):
+    response = client.get('/api/articles/search', query_string={'q': '  '})
+
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+@pytest.mark.parametrize('query_string, headers', [
+    ({'q': 'bandslinga', 'format': 'ndjson'}, {}),
+    ({'q': 'bandslinga'}, {'Accept': 'application/x-ndjson'}),
+])
+def test_ndjson_streams_every_match(client, fbets, query_string, headers):
+    response = client.get('/api/articles/search', query_string=query_string, headers=headers)
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.get_data(as_text=True).splitlines()
+    articles = [json.loads(line) for line in lines]
+    assert sorted(article['fbet'] for article in articles) == fbets
+    assert all(article['document'] == 'search-api.pdf' for article in articles)
+
+def test_json_is_the_default_for_other_accept_headers(client, fbets):
+    response = client.get('/api/articles/search', query_string={'q': 'bandslinga'},
+                          headers={'Accept': 'application/json, */*'})
+
+    assert response.mimetype == 'application/json'
+    assert response.get_json()['total'] == ARTICLES
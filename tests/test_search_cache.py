@@ -0,0 +1,74 @@
+"""Cached search result pages are dropped when articles change or their TTL runs out."""
+
+import search_cache
+from models import Article, PDFDocument, article_catalog_generation
+from search_cache import SearchResultCache
+
+def test_hit_at_the_same_generation():
+    cache = SearchResultCache()
+    cache.put('karb', 1, [1, 2])
+
+    assert cache.get('karb', 1) == [1, 2]
+    assert (cache.hits, cache.misses) == (1, 0)
+
+def test_newer_generation_drops_every_page():
+    cache = SearchResultCache()
+    cache.put('karb', 1, [1, 2])
+    cache.put('rep', 1, [3])
+
+    assert cache.get('karb', 2) is None
+    assert len(cache) == 0
+    assert cache.get('rep', 2) is None
+
+def test_page_from_an_older_generation_is_not_stored():
+    # A slow request that read the articles before they changed
+    cache = SearchResultCache()
+    cache.put('karb', 2, [1, 2])
+    cache.put('rep', 1, [3])
+
+    assert cache.get('rep', 1) is None
+    assert cache.get('rep', 2) is None
+    assert cache.get('karb', 2) == [1, 2]
+
+def test_page_expires_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(search_cache.time, 'monotonic', lambda: now[0])
+    cache = SearchResultCache(ttl=60)
+    cache.put('karb', 1, [1, 2])
+
+    now[0] += 59
+    assert cache.get('karb', 1) == [1, 2]
+    now[0] += 2
+    assert cache.get('karb', 1) is None
+    assert len(cache) == 0
+
+def test_least_recently_used_page_is_dropped():
+    cache = SearchResultCache(max_entries=2)
+    cache.put('karb', 1, [1])
+    cache.put('rep', 1, [2])
+    cache.get('karb', 1)
+    cache.put('hjälm', 1, [3])
+
+    assert cache.get('rep', 1) is None
+    assert cache.get('karb', 1) == [1]
+    assert cache.get('hjälm', 1) == [3]
+
+def test_generation_changes_with_searchable_columns_only(session):
+    article = Article(document=PDFDocument(filename='manual.pdf'), fbet='F8009-000001', fben='KARB HMS',
+                      artikel='Karbinhake')
+    session.add(article)
+    session.commit()
+    added = article_catalog_generation(session)
+
+    article.image_url = '/static/uploads/karbinhake.jpg'
+    session.commit()
+    assert article_catalog_generation(session) == added
+
+    article.artikel = 'Karbinhake skruv'
+    session.commit()
+    renamed = article_catalog_generation(session)
+    assert renamed > added
+
+    session.delete(article)
+    session.commit()
+    assert article_catalog_generation(session) > renamed
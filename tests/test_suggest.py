@@ -0,0 +1,79 @@
+"""Prefix suggestions from the in-memory index, before and after a rebuild."""
+
+import pytest
+
+from models import Article, PDFDocument
+from suggest import ArticleSuggestIndex
+
+ARTICLES = [
+    ('F8009-000001', 'KARB HMS', 'Karbinhake skruv'),
+    ('F8009-000002', 'KARB D', 'Karbinhake snäpp'),
+    ('G7773-000003', 'REP DYN 10,5MM', 'Klätterrep dynamiskt'),
+]
+
+@pytest.fixture
+def make_session(make_session):
+    add_articles(make_session, ARTICLES)
+    return make_session
+
+def add_articles(make_session, rows):
+    session = make_session()
+    document = session.query(PDFDocument).first() or PDFDocument(filename='manual.pdf')
+    session.add(document)
+    session.add_all(Article(document=document, fbet=fbet, fben=fben, artikel=artikel) for fbet, fben, artikel in rows)
+    session.commit()
+    session.close()
+
+def values(suggestions):
+    return [(suggestion['field'], suggestion['value']) for suggestion in suggestions]
+
+@pytest.fixture
+def index(make_session):
+    # A refresh interval this long means lookups never rebuild in the background
+    index = ArticleSuggestIndex(make_session, refresh_interval=3600)
+    index.build()
+    return index
+
+def test_prefix_matches_codes_and_names(index):
+    assert values(index.suggest('f8009')) == [('fbet', 'F8009-000001'), ('fbet', 'F8009-000002')]
+    assert values(index.suggest('karb')) == [('fben', 'KARB D'), ('fben', 'KARB HMS'),
+                                             ('artikel', 'Karbinhake skruv'), ('artikel', 'Karbinhake snäpp')]
+    assert values(index.suggest('  DYNAMISKT ')) == [('artikel', 'Klätterrep dynamiskt')]
+    assert index.suggest('karb', limit=1) == [{'field': 'fben', 'value': 'KARB D'}]
+    assert index.suggest('') == []
+    assert index.suggest('x') == []
+
+def test_rebuild_picks_up_new_articles(make_session, index):
+    generation = index.generation
+    add_articles(make_session, [('M1234-000004', 'HJÄLM STD', 'Hjälm vuxen')])
+    assert index.suggest('hjä') == []
+
+    index.build()
+
+    assert index.generation != generation
+    assert values(index.suggest('hjä')) == [('fben', 'HJÄLM STD'), ('artikel', 'Hjälm vuxen')]
+    assert values(index.suggest('m1234')) == [('fbet', 'M1234-000004')]
+
+class LookupOnEveryWrite(ArticleSuggestIndex):
+    """Runs a lookup after each attribute a rebuild writes, as a concurrent request could."""
+
+    lookups = None
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if self.lookups is not None and name != 'lookups':
+            self.lookups.append(self.suggest('k', limit=50))
+
+def test_lookups_during_a_rebuild_never_mix_indexes(make_session):
+    index = LookupOnEveryWrite(make_session, refresh_interval=3600)
+    index.build()
+    # Keys sorting before 'k' shift every position of the 'k' keys in the new index
+    add_articles(make_session, [(f"F8009-{n:06d}", f"AAA {n}", f"Artikel {n}") for n in range(10)])
+
+    index.lookups = []
+    index.build()
+
+    assert index.lookups
+    expected = values(index.suggest('k', limit=50))
+    for suggestions in index.lookups:
+        assert values(suggestions) == expected
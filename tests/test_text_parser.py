@@ -0,0 +1,34 @@
+"""Referensrader för textparsern med förväntad uppdelning i FBET/FBEN/artikel/länk"""
+
+import pytest
+
+from extract_articles import extract_articles_from_text
+
+PARSER_GOLDEN_CASES = [
+    ('F8009-123456 REP DYN 10,5MM Klätterrep dynamiskt Bruksanvisning',
+     {'fbet': 'F8009-123456', 'fben': 'REP DYN 10,5MM', 'artikel': 'Klätterrep dynamiskt', 'link': None}),
+    ('G7773-000001 KARB HMS BD Rocklock',
+     {'fbet': 'G7773-000001', 'fben': 'KARB HMS', 'artikel': 'Black Diamond Rocklock', 'link': None}),
+    ('M1234-999999 HJÄLM STD Hjälm vuxen https://example.com/hjalm.pdf',
+     {'fbet': 'M1234-999999', 'fben': 'HJÄLM STD', 'artikel': 'Hjälm vuxen https://example.com/hjalm.pdf',
+      'link': 'https://example.com/hjalm.pdf'}),
+    ('F8009-000002 SLS 120 CM 12,5',
+     {'fbet': 'F8009-000002', 'fben': 'SLS 120 CM 12,5', 'artikel': None, 'link': None}),
+    ('F8009-000003 SELE ( PPE ) Sele komplett',
+     {'fbet': 'F8009-000003', 'fben': 'SELE PPE', 'artikel': '( ) Sele komplett', 'link': None}),
+    ('F8009-000004 Repbroms utan FBEN', None),
+    ('F8009-000005 BD', None),
+    ('F8009-000006 ABCDEFGHIJ KLMNOPQRST UVWXYZÅÄÖ Lång', None),
+    ('f8009-000007 REP Fel prefix', None),
+    ('Sida 12 av 140', None),
+]
+
+@pytest.mark.parametrize('line, expected', PARSER_GOLDEN_CASES)
+def test_parser_golden_case(line, expected):
+    articles = extract_articles_from_text(line)
+    assert (articles[0] if articles else None) == expected
+
+def test_parser_reads_every_line():
+    text = '\n'.join(line for line, _ in PARSER_GOLDEN_CASES)
+    expected = [article for _, article in PARSER_GOLDEN_CASES if article]
+    assert extract_articles_from_text(text) == expected
@@ -0,0 +1,93 @@
+"""Uploading a PDF through the API and following its extraction job."""
+
+import io
+import time
+
+import pytest
+
+from benchmark import write_synthetic_pdf
+from jobs import ExtractionJobQueue
+
+TABLE_PAGES = 2
+ROWS_PER_PAGE = 5
+
+pytestmark = pytest.mark.usefixtures('patch_get_session')
+
+@pytest.fixture
+def pdf_folder(app_module, tmp_path, monkeypatch):
+    folder = tmp_path / 'pdfs'
+    folder.mkdir()
+    monkeypatch.setitem(app_module.app.config, 'PDF_FOLDER', str(folder))
+    # Jobs from these tests are not left in the app's queue
+    monkeypatch.setattr(app_module, 'extraction_jobs', ExtractionJobQueue())
+    return folder
+
+@pytest.fixture
+def client(app_module, pdf_folder):
+    return app_module.app.test_client()
+
+@pytest.fixture
+def pdf_bytes(tmp_path):
+    path = tmp_path / 'synthetic.pdf'
+    write_synthetic_pdf(path, TABLE_PAGES, ROWS_PER_PAGE, filler_pages=1)
+    return path.read_bytes()
+
+def finished_job(client, location):
+    deadline = time.monotonic() + 30
+    while True:
+        job = client.get(location).get_json()
+        if job['finished_at'] or time.monotonic() > deadline:
+            return job
+        time.sleep(0.05)
+
+def test_raw_pdf_body_is_extracted_in_the_background(client, pdf_folder, pdf_bytes):
+    response = client.post('/api/documents', query_string={'filename': 'Manual 2024.PDF'}, data=pdf_bytes,
+                           content_type='application/pdf')
+
+    assert response.status_code == 202
+    job = response.get_json()
+    assert response.headers['Location'] == f"/api/jobs/{job['id']}"
+    assert job['filename'] == 'Manual_2024.pdf'
+    assert (pdf_folder / 'Manual_2024.pdf').read_bytes() == pdf_bytes
+
+    job = finished_job(client, response.headers['Location'])
+    assert job['status'] == 'done', job['error']
+    assert job['articles_found'] == TABLE_PAGES * ROWS_PER_PAGE
+    assert job['pages_done'] == job['pages_total']
+    assert job['counts']['inserted'] == TABLE_PAGES * ROWS_PER_PAGE
+
+def test_multipart_upload_is_saved_under_its_name(client, pdf_folder, pdf_bytes):
+    response = client.post('/api/documents', data={'file': (io.BytesIO(pdf_bytes), 'manual.pdf')},
+                           content_type='multipart/form-data')
+
+    assert response.status_code == 202
+    assert (pdf_folder / 'manual.pdf').read_bytes() == pdf_bytes
+    assert finished_job(client, response.headers['Location'])['status'] == 'done'
+
+def test_unknown_job_is_not_found(client):
+    assert client.get('/api/jobs/missing').status_code == 404
+
+@pytest.mark.parametrize('filename', ['manual.txt', 'manual', '.pdf', ''])
+def test_name_without_pdf_extension_is_rejected(client, pdf_folder, pdf_bytes, filename):
+    response = client.post('/api/documents', query_string={'filename': filename}, data=pdf_bytes,
+                           content_type='application/pdf')
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Only PDF files are accepted'
+    assert list(pdf_folder.iterdir()) == []
+
+@pytest.mark.parametrize('data', [b'', b'%PD', b'<html>not a pdf</html>'])
+def test_content_that_is_not_a_pdf_is_rejected(client, pdf_folder, data):
+    response = client.post('/api/documents', data={'file': (io.BytesIO(data), 'manual.pdf')},
+                           content_type='multipart/form-data')
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'File is not a PDF'
+    # Neither the PDF nor the temporary upload file is left behind
+    assert list(pdf_folder.iterdir()) == []
+
+def test_form_without_a_file_is_rejected(client):
+    response = client.post('/api/documents', data={'other': 'value'}, content_type='multipart/form-data')
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'No PDF provided'
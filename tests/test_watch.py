@@ -0,0 +1,61 @@
+"""Bevakning av PDF-mappen: filer lämnas ut när de har slutat ändras, en gång per version"""
+
+import os
+
+import pytest
+
+from extract_articles import FolderWatcher
+
+SETTLE = 5.0
+
+@pytest.fixture
+def watcher(tmp_path):
+    return FolderWatcher(tmp_path, settle_seconds=SETTLE)
+
+def write(path, content, mtime):
+    path.write_bytes(content)
+    os.utime(path, (mtime, mtime))
+
+def test_file_still_changing_is_not_delivered(tmp_path, watcher):
+    pdf_path = tmp_path / 'manual.pdf'
+    for second in range(4):
+        # Kopieras fortfarande: storleken växer vid varje läsning av mappen
+        write(pdf_path, b'%PDF' * (second + 1), 1000 + second)
+        assert watcher.poll(now=second * SETTLE) == []
+
+def test_settled_file_is_delivered_once(tmp_path, watcher):
+    pdf_path = tmp_path / 'manual.pdf'
+    write(pdf_path, b'%PDF-1.4', 1000)
+    (tmp_path / 'notes.txt').write_text('inte en PDF')
+
+    assert watcher.poll(now=0) == []
+    assert watcher.poll(now=SETTLE - 1) == []
+    assert watcher.poll(now=SETTLE) == [pdf_path]
+    assert watcher.poll(now=2 * SETTLE) == []
+    assert watcher.poll(now=3 * SETTLE) == []
+
+def test_changed_version_is_delivered_again(tmp_path, watcher):
+    pdf_path = tmp_path / 'manual.pdf'
+    write(pdf_path, b'%PDF-1.4', 1000)
+    watcher.poll(now=0)
+    assert watcher.poll(now=SETTLE) == [pdf_path]
+
+    write(pdf_path, b'%PDF-1.4 andra upplagan', 2000)
+
+    assert watcher.poll(now=2 * SETTLE) == []
+    assert watcher.poll(now=3 * SETTLE) == [pdf_path]
+    assert watcher.poll(now=4 * SETTLE) == []
+
+def test_deleted_and_restored_file_is_delivered_again(tmp_path, watcher):
+    pdf_path = tmp_path / 'manual.pdf'
+    write(pdf_path, b'%PDF-1.4', 1000)
+    watcher.poll(now=0)
+    assert watcher.poll(now=SETTLE) == [pdf_path]
+
+    pdf_path.unlink()
+    assert watcher.poll(now=2 * SETTLE) == []
+
+    # Samma storlek och ändringstid som förut, t.ex. återställd från papperskorgen
+    write(pdf_path, b'%PDF-1.4', 1000)
+    assert watcher.poll(now=3 * SETTLE) == []
+    assert watcher.poll(now=4 * SETTLE) == [pdf_path]